@@ -1,14 +1,25 @@
+import startup_profile
+
+# Measures the imports below when STARTUP_PROFILE is set
+startup_profile.start()
+
 import streamlit as st
-import time
-from data_ingestion import data_ingestion
-from helper_function import show_overview
-from helper_function import detailed_reports
-from helper_function import employee_management
-from helper_function import settings
-from helper_function import help_and_support
+from metrics import metrics, context, start_exporter
 
 st.set_page_config(page_title="Admin Dashboard", layout="wide")
 
+# Writes the in-process metrics to METRICS_FILE, when configured
+@st.cache_resource
+def load_metrics_exporter():
+    return start_exporter("admin")
+
+# Evaluates the notification rules in the background, when NOTIFY_INTERVAL is set
+@st.cache_resource
+def load_notifier():
+    from notifications import start_notifier
+
+    return start_notifier()
+
 # Admin Login Interface
 def admin_login():
     st.title("Admin Login")
@@ -19,9 +30,6 @@ def admin_login():
     if st.button("Login"):
         if username == "admin" and password == "admin123":
             st.success("Login successful!")
-            with st.spinner("Redirecting to the Admin Dashboard..."):
-                time.sleep(5) 
-            
             st.session_state['logged_in'] = True
             st.experimental_set_query_params(logged_in="true")
             st.rerun()
@@ -39,13 +47,21 @@ if query_params.get("logged_in") == ["true"]:
 
 # Dashboard Layout
 def dashboard_layout():
-    _, attendance_df = data_ingestion()
     st.sidebar.title("Admin Navigation Bar")
     page = st.sidebar.selectbox("Go to", ["Overview", "Detailed Reports", "Employee Management", "Settings", "Help"])
+    # Time each page render and attribute its storage calls to the page
+    with context(f"page: {page}"), metrics.timer("page", page):
+        render_page(page)
+
+# The pages (and pandas, which they load) are imported on the first page
+# render, so the login form shows without waiting for them
+def render_page(page):
+    from helper_function import show_overview, detailed_reports, employee_management, settings, help_and_support
+
     if page == "Overview":
         show_overview()
     elif page == "Detailed Reports":
-        detailed_reports(attendance_df)
+        detailed_reports()
     elif page == "Employee Management":
         employee_management()
     elif page == "Settings":
@@ -58,3 +74,9 @@ if st.session_state['logged_in']:
 else:
     admin_login()
 
+# Background services start after the page has been sent
+with startup_profile.phase("admin.background_services"):
+    load_metrics_exporter()
+    load_notifier()
+
+startup_profile.finish("admin")
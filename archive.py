@@ -0,0 +1,233 @@
+import hashlib
+import logging
+import os
+import threading
+from datetime import date
+import pandas as pd
+import config
+from rollups import count_rows, KEY_COLUMNS
+from schema import concat_typed, typed_attendance, with_site
+
+logger = logging.getLogger(__name__)
+
+
+# Raised when the live rows to delete changed between the read and the delete
+class ArchiveConflictError(Exception):
+    pass
+
+
+def partition_dir(root, month):
+    return os.path.join(root, f"year={month.year:04d}", f"month={month.month:02d}")
+
+
+# Function to get the month of a partition directory name pair, e.g. ("year=2024", "month=03")
+def partition_month(year_dir, month_dir):
+    try:
+        return pd.Period(year=int(year_dir.split("=")[1]), month=int(month_dir.split("=")[1]), freq="M")
+    except (IndexError, ValueError):
+        return None
+
+
+# Function to write a frame to Parquet in one step (temporary file, then rename)
+def write_parquet(frame, path):
+    frame.to_parquet(path + ".tmp", index=False)
+    os.replace(path + ".tmp", path)
+
+
+# Cold tier of the attendance data: closed months moved out of the live sheet
+# into date-partitioned Parquet files (archive/attendance/year=YYYY/month=MM).
+# Each rollover of a month adds a part file of typed rows, named after a hash
+# of its content so a repeated rollover of the same rows rewrites the same
+# file, plus a small file of its daily counts for the overview. Readers list
+# the partitions and open only those overlapping the requested dates; loaded
+# parts are kept in memory until their file changes. In multi-site mode
+# each site has its own archive (see site_archive), whose rows carry the Site.
+class AttendanceArchive:
+
+    def __init__(self, root=config.ARCHIVE_DIR, site=None):
+        self.root = root
+        self.site = site
+        self.parts = {}
+        self.counts_cache = None
+        self.lock = threading.Lock()
+        # Held for a whole rollover, so two rollovers never delete by the same read
+        self.rollover_lock = threading.Lock()
+
+    # Function to list partitions as {month: [part files]}, oldest first
+    def partitions(self):
+        partitions = {}
+        if not os.path.isdir(self.root):
+            return partitions
+        for year_dir in sorted(os.listdir(self.root)):
+            year_path = os.path.join(self.root, year_dir)
+            if not os.path.isdir(year_path):
+                continue
+            for month_dir in sorted(os.listdir(year_path)):
+                month = partition_month(year_dir, month_dir)
+                month_path = os.path.join(year_path, month_dir)
+                if month is None or not os.path.isdir(month_path):
+                    continue
+                files = sorted(
+                    os.path.join(month_path, name) for name in os.listdir(month_path)
+                    if name.startswith("part-") and name.endswith(".parquet")
+                )
+                if files:
+                    partitions[month] = files
+        return partitions
+
+    def months(self):
+        return list(self.partitions())
+
+    # Function to list the part files of the months overlapping [start, end] (partition pruning)
+    def files(self, start=None, end=None):
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+        return [
+            path for month, paths in self.partitions().items()
+            if (start is None or month.end_time >= start) and (end is None or month.start_time <= end)
+            for path in paths
+        ]
+
+    # Function to identify the archive contents; changes on every rollover
+    def version(self, files=None):
+        files = self.files() if files is None else files
+        return tuple((path, os.path.getmtime(path)) for path in files)
+
+    def read_part(self, path):
+        mtime = os.path.getmtime(path)
+        with self.lock:
+            cached = self.parts.get(path)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+        frame = typed_attendance(pd.read_parquet(path))
+        with self.lock:
+            self.parts[path] = (mtime, frame)
+        return frame
+
+    # Function to read the typed rows of the partitions overlapping [start, end]
+    def read(self, start=None, end=None, files=None):
+        files = self.files(start, end) if files is None else files
+        frame = None
+        for path in files:
+            part = self.read_part(path)
+            frame = part if frame is None else concat_typed(frame, part)
+        if frame is None:
+            return typed_attendance(pd.DataFrame(columns=config.ATTENDANCE_COLUMNS))
+        return frame
+
+    # Function to get the daily counts of every archived row (see rollups.count_rows)
+    def counts(self):
+        files = self.files()
+        version = self.version(files)
+        with self.lock:
+            if self.counts_cache is not None and self.counts_cache[0] == version:
+                return self.counts_cache[1]
+        counts = count_rows(pd.DataFrame(columns=KEY_COLUMNS))
+        for path in files:
+            counts_path = path.replace("part-", "counts-", 1)
+            if os.path.exists(counts_path):
+                part_counts = pd.read_parquet(counts_path).set_index(KEY_COLUMNS)["count"]
+            else:
+                part_counts = count_rows(self.read_part(path))
+            counts = counts.add(part_counts, fill_value=0).astype("int64")
+        with self.lock:
+            self.counts_cache = (version, counts)
+        return counts
+
+    # Function to add rows of one month as a new part file; returns its path
+    def write_month(self, month, frame):
+        text = frame.astype(str).to_csv(index=False).encode("utf-8")
+        name = hashlib.sha1(text).hexdigest()[:16]
+        directory = partition_dir(self.root, month)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"part-{name}.parquet")
+        write_parquet(frame.reset_index(drop=True), path)
+        write_parquet(count_rows(frame).reset_index(), os.path.join(directory, f"counts-{name}.parquet"))
+        return path
+
+    # Function to move closed months out of the live sheet.
+    # Months before the last `keep_months` (the current month when 1) are
+    # closed; a month stays live for `grace_days` after it ends, so late
+    # sign-outs still find their rows. Rows are written to the archive first
+    # and deleted from the sheet afterwards, so a failure in between leaves
+    # them in both tiers and the next rollover rewrites the same part files.
+    # Before the delete the rows are read again; if any of them changed (e.g.
+    # another rollover already moved them) ArchiveConflictError is raised and
+    # nothing is deleted. Returns the number of rows moved per month.
+    def rollover(self, storage, today=None, keep_months=config.ARCHIVE_KEEP_MONTHS,
+                 grace_days=config.ARCHIVE_GRACE_DAYS):
+        with self.rollover_lock:
+            return self._rollover(storage, today, keep_months, grace_days)
+
+    def _rollover(self, storage, today, keep_months, grace_days):
+        today = pd.Timestamp(today or date.today())
+        cutoff = (today - pd.Timedelta(days=grace_days)).to_period("M") - (max(keep_months, 1) - 1)
+
+        rows = storage.get_rows(config.ATTENDANCE_SHEET, 1)
+        if len(rows) < 2:
+            return {}
+        header = rows[0]
+        values = [row[:len(header)] + [""] * (len(header) - len(row)) for row in rows[1:]]
+        raw = pd.DataFrame(values, columns=header)
+        frame = typed_attendance(with_site(raw, self.site))
+        months = frame["Date"].dt.to_period("M")
+        closed = (months < cutoff).to_numpy()
+        if not closed.any():
+            return {}
+
+        moved = {}
+        closed_rows = frame[closed]
+        for month, positions in closed_rows.groupby(months[closed].to_numpy()).indices.items():
+            month_rows = closed_rows.iloc[positions]
+            self.write_month(month, month_rows)
+            moved[str(month)] = len(month_rows)
+        # Data row i lives in sheet row i + 2
+        positions = [int(i) for i in closed.nonzero()[0]]
+        self.check_rows(storage, header, {i + 2: values[i] for i in positions})
+        storage.delete_rows(config.ATTENDANCE_SHEET, [i + 2 for i in positions])
+        logger.info("Archived %s attendance rows: %s", int(closed.sum()), moved)
+        return moved
+
+
+    # Function to raise ArchiveConflictError unless the given sheet rows still
+    # hold the values read, checked with one request. The sheet has no
+    # compare-and-swap, so a write racing within that short window can still win.
+    @staticmethod
+    def check_rows(storage, header, expected):
+        first, last = min(expected), max(expected)
+        current = storage.get_rows(config.ATTENDANCE_SHEET, first, last)
+        moved = []
+        for row, values in expected.items():
+            found = current[row - first] if row - first < len(current) else []
+            if list(map(str, found[:len(header)])) + [""] * (len(header) - len(found)) != list(map(str, values)):
+                moved.append(row)
+        if moved:
+            raise ArchiveConflictError(
+                f"{len(moved)} attendance rows changed since they were read (first row {moved[0]}); nothing deleted"
+            )
+
+
+attendance_archive = AttendanceArchive()
+
+_site_archives = {}
+_site_archives_lock = threading.Lock()
+
+
+# Function to get the archive of a site of config.SITES (under
+# ARCHIVE_DIR/site=<name>), or the default archive when site is None
+def site_archive(site=None):
+    if site is None:
+        return attendance_archive
+    with _site_archives_lock:
+        if site not in _site_archives:
+            _site_archives[site] = AttendanceArchive(os.path.join(config.ARCHIVE_DIR, f"site={site}"), site)
+        return _site_archives[site]
+
+
+# Run a rollover on its own, e.g. from cron on the first days of each month
+if __name__ == "__main__":
+    from storage import get_storage
+
+    logging.basicConfig(level=logging.INFO)
+    for site in list(config.SITES) or [None]:
+        site_archive(site).rollover(get_storage(site=site))
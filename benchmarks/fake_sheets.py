@@ -0,0 +1,169 @@
+import threading
+import time
+from collections import Counter
+from gspread.cell import Cell
+from gspread.utils import a1_range_to_grid_range, rowcol_to_a1
+from scheduler import RequestScheduler
+from storage import SheetsStorage
+
+# Simulated cost of a Sheets API request: a fixed round trip plus a cost per
+# cell transferred. Rough figures for the Sheets API v4 from a nearby region.
+REQUEST_LATENCY = 0.25
+CELL_LATENCY = 0.000002
+
+
+# Call counts and simulated latency of every fake worksheet of a spreadsheet
+class CallStats:
+
+    def __init__(self, request_latency=REQUEST_LATENCY, cell_latency=CELL_LATENCY, sleep=False):
+        self.request_latency = request_latency
+        self.cell_latency = cell_latency
+        # Really sleep for the simulated latency, e.g. to see it in page timings
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.calls = Counter()
+            self.cells = 0
+            self.latency = 0.0
+
+    def record(self, method, cells):
+        latency = self.request_latency + cells * self.cell_latency
+        with self.lock:
+            self.calls[method] += 1
+            self.cells += cells
+            self.latency += latency
+        if self.sleep:
+            time.sleep(latency)
+
+    def snapshot(self):
+        with self.lock:
+            return {"calls": sum(self.calls.values()), "by_method": dict(self.calls),
+                    "cells": self.cells, "latency": self.latency}
+
+
+def _trim(row):
+    end = len(row)
+    while end and row[end - 1] in ("", None):
+        end -= 1
+    return row[:end]
+
+
+# In-memory stand-in for a gspread Worksheet, implementing the calls the
+# storage layer makes. Values are kept as text, as the sheet shows them.
+class FakeWorksheet:
+
+    def __init__(self, title, rows, stats):
+        self.title = title
+        self.rows = [list(row) for row in rows]
+        self.stats = stats
+        self.lock = threading.Lock()
+
+    @property
+    def col_count(self):
+        return max(len(self.rows[0]), 26) if self.rows else 26
+
+    def get_all_records(self, *args, **kwargs):
+        with self.lock:
+            header, data = self.rows[0], self.rows[1:]
+            records = [dict(zip(header, row + [""] * (len(header) - len(row)))) for row in data]
+        self.stats.record("get_all_records", len(header) * len(records))
+        return records
+
+    def find(self, query, in_column=None):
+        with self.lock:
+            column = (in_column or 1) - 1
+            found = next(
+                (Cell(i + 1, column + 1, row[column]) for i, row in enumerate(self.rows)
+                 if len(row) > column and str(row[column]) == str(query)), None
+            )
+        self.stats.record("find", 1)
+        return found
+
+    def row_values(self, row):
+        with self.lock:
+            values = _trim(self.rows[row - 1]) if row <= len(self.rows) else []
+        self.stats.record("row_values", len(values))
+        return values
+
+    # Function to read a range such as "A42:K"; trailing empty cells are dropped like the API does
+    def get(self, range_name):
+        grid = a1_range_to_grid_range(range_name)
+        start = grid.get("startRowIndex", 0)
+        end = grid.get("endRowIndex")
+        first_col, last_col = grid.get("startColumnIndex", 0), grid.get("endColumnIndex")
+        with self.lock:
+            values = [_trim(row[first_col:last_col]) for row in self.rows[start:end]]
+        while values and not values[-1]:
+            values.pop()
+        self.stats.record("get", sum(len(row) for row in values))
+        return values
+
+    def append_rows(self, values, **kwargs):
+        with self.lock:
+            first_row = len(self.rows) + 1
+            self.rows.extend([list(row) for row in values])
+            last_row = len(self.rows)
+        width = max((len(row) for row in values), default=1)
+        self.stats.record("append_rows", sum(len(row) for row in values))
+        return {"updates": {
+            "updatedRange": f"'{self.title}'!A{first_row}:{rowcol_to_a1(last_row, width)}",
+            "updatedRows": len(values),
+        }}
+
+    def append_row(self, values, **kwargs):
+        return self.append_rows([values], **kwargs)
+
+    def set_cell(self, row, col, value):
+        while len(self.rows) < row:
+            self.rows.append([])
+        cells = self.rows[row - 1]
+        if len(cells) < col:
+            cells.extend([""] * (col - len(cells)))
+        cells[col - 1] = value
+
+    def update_cell(self, row, col, value):
+        with self.lock:
+            self.set_cell(row, col, value)
+        self.stats.record("update_cell", 1)
+
+    def delete_rows(self, start_index, end_index=None):
+        with self.lock:
+            del self.rows[start_index - 1:end_index or start_index]
+        self.stats.record("delete_rows", 0)
+
+    def batch_update(self, data, **kwargs):
+        cells = 0
+        with self.lock:
+            for update in data:
+                grid = a1_range_to_grid_range(update["range"])
+                for i, values in enumerate(update["values"]):
+                    for j, value in enumerate(values):
+                        self.set_cell(grid["startRowIndex"] + i + 1, grid["startColumnIndex"] + j + 1, value)
+                        cells += 1
+        self.stats.record("batch_update", cells)
+
+
+class FakeSpreadsheet:
+
+    def __init__(self, tables, stats=None):
+        self.stats = stats or CallStats()
+        self.worksheets = {title: FakeWorksheet(title, rows, self.stats) for title, rows in tables.items()}
+
+    def worksheet(self, title):
+        return self.worksheets[title]
+
+
+# SheetsStorage that talks to a FakeSpreadsheet instead of the Google API,
+# so the real Sheets code paths run without credentials. The scheduler is
+# not rate limited unless one is passed in, so timings show our own code.
+class FakeSheetsStorage(SheetsStorage):
+
+    def __init__(self, spreadsheet, scheduler=None):
+        super().__init__(spreadsheet_name="benchmark", scheduler=scheduler or RequestScheduler(requests_per_minute=0))
+        self.spreadsheet = spreadsheet
+
+    def worksheet(self, table):
+        return self.spreadsheet.worksheet(table)
@@ -0,0 +1,252 @@
+# Benchmarks for the kiosk and dashboard code paths on synthetic data.
+# Runs against an in-process fake of the Sheets API (see fake_sheets.py), so
+# no credentials are needed. Run from the repository root:
+#
+#     python -m benchmarks.run_benchmarks --sizes 1000 100000 1000000 --output bench_output.txt
+#
+# Wall times cover our own code; API calls and simulated API time show what
+# the same work would cost against Google Sheets. With --baseline, the results
+# are compared with an earlier --output file and the run exits with status 1
+# when a benchmark got slower than the tolerance allows or makes more API calls.
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+import pandas as pd
+import config
+import data_ingestion
+from benchmarks.fake_sheets import CallStats, FakeSheetsStorage, FakeSpreadsheet, REQUEST_LATENCY
+from benchmarks.synthetic_data import generate_tables
+from employee_search import get_search_index
+from export import available_formats, export_to_file
+from heatmap import heatmap_cache
+from journal import Journal, SyncWorker
+from kiosk import Kiosk, SIGN_IN_STATUSES, SIGN_OUT_STATUSES
+from pdf_report import write_pdf_report
+from report_filters import AttendanceFilter, get_filter_engine
+from storage import register_storage
+from worked_hours import worked_hours_engine
+
+BACKEND = "benchmark"
+DEFAULT_SIZES = [1000, 100000, 1000000]
+# Excel and PDF files are written cell by cell; larger tables are skipped by default
+DEFAULT_MAX_EXCEL_ROWS = 100000
+DEFAULT_MAX_PDF_ROWS = 20000
+# Slowdown against the baseline tolerated before a benchmark counts as a
+# regression (single runs vary; record the baseline on the same machine),
+# and the wall time below which differences are noise
+DEFAULT_TOLERANCE = 0.5
+MIN_REGRESSION_SECONDS = 0.05
+# Number of punches timed per kiosk benchmark
+PUNCHES = 50
+
+
+class Recorder:
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.results = []
+
+    # Function to time `func` and record the fake API calls it made
+    def time(self, size, name, func, repeat=1):
+        self.stats.reset()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            value = func()
+        elapsed = (time.perf_counter() - start) / repeat
+        api = self.stats.snapshot()
+        self.results.append({
+            "rows": size, "benchmark": name, "seconds": elapsed,
+            "api_calls": api["calls"] / repeat, "api_seconds": api["latency"] / repeat,
+        })
+        print(f"{size:>9,} rows  {name:<36} {elapsed * 1000:>10.1f} ms  "
+              f"{api['calls'] / repeat:>6.1f} calls  {api['latency'] / repeat:>7.2f} s API", flush=True)
+        return value
+
+
+# Function to drop everything the dashboard modules derived from the previous dataset
+def reset_dashboard_state():
+    data_ingestion.snapshot_cache.invalidate()
+    data_ingestion.attendance_sync.frame = None
+    heatmap_cache.grids.clear()
+    worked_hours_engine.minutes = None
+
+
+def bench_kiosk(recorder, size, storage, workdir):
+    journal = Journal(os.path.join(workdir, f"journal_{size}.db"))
+    kiosk = Kiosk(storage, journal)
+    now = datetime.now()
+
+    recorder.time(size, "kiosk: index load", lambda: (kiosk.employee_index.refresh(), kiosk.session_index.rebuild()))
+    employee_ids = list(kiosk.employee_index.employees)
+    punches = iter(employee_ids[:PUNCHES])
+    recorder.time(size, "kiosk: sign-in", lambda: kiosk.sign_in(next(punches), SIGN_IN_STATUSES[0], now),
+                  repeat=min(PUNCHES, len(employee_ids)))
+    punches = iter(employee_ids[:PUNCHES])
+    later = now + timedelta(hours=8)
+    recorder.time(size, "kiosk: sign-out", lambda: kiosk.sign_out(next(punches), SIGN_OUT_STATUSES[0], later),
+                  repeat=min(PUNCHES, len(employee_ids)))
+
+    worker = SyncWorker(journal, storage, session_index=kiosk.session_index)
+    recorder.time(size, "sync: flush journal", lambda: [worker.flush() for _ in range(2)])
+
+
+def bench_dashboard(recorder, size):
+    reset_dashboard_state()
+    attendance_df = recorder.time(size, "load: attendance (cold)", data_ingestion.attendance_snapshot)
+    data_ingestion.snapshot_cache.invalidate()
+    attendance_df = recorder.time(size, "load: attendance (incremental)", data_ingestion.attendance_snapshot)
+    employee_df = recorder.time(size, "load: employees", data_ingestion.employee_snapshot)
+
+    # show_overview: metrics, trend and department charts, heatmap of the last month
+    def overview():
+        rollup = data_ingestion.attendance_rollup()
+        rollup.count(date=pd.Timestamp.today().normalize())
+        rollup.count(status="Tardy(Late Arrival)")
+        rollup.count(status="Early")
+        return rollup.by_date(), rollup.by_department()
+    recorder.time(size, "overview: metrics and charts", overview)
+    last_month = attendance_df["Date"].max().to_period("M")
+    generation = data_ingestion.attendance_generation()
+    for by in ["Department", "Employee"]:
+        recorder.time(size, f"overview: heatmap by {by.lower()}",
+                      lambda: heatmap_cache.get_range(attendance_df, [last_month], by, generation))
+
+    # detailed_reports: filter engine, memoized filters and worked hours
+    # Built directly: get_filter_engine would return the engine cached by an earlier run
+    recorder.time(size, "reports: filter engine", lambda: AttendanceFilter(attendance_df))
+    engine = get_filter_engine(attendance_df)
+    end_date = engine.max_date()
+    start_date = end_date - timedelta(days=90)
+    departments = engine.values("Department")
+    filtered_df = recorder.time(size, "reports: filter (90 days)",
+                                lambda: engine.filter(start_date, end_date, departments[:-1], SIGN_IN_STATUSES[:-1]))
+    recorder.time(size, "reports: filter (memoized)",
+                  lambda: engine.filter(start_date, end_date, departments[:-1], SIGN_IN_STATUSES[:-1]))
+    recorder.time(size, "reports: worked hours (monthly)",
+                  lambda: worked_hours_engine.update(attendance_df).summary("Monthly", start_date, end_date))
+
+    # employee_management: search index build and queries
+    recorder.time(size, "employees: search index build", lambda: get_search_index(employee_df))
+    recorder.time(size, "employees: search", lambda: [get_search_index(employee_df).search(term)
+                                                     for term in ["sbx0", "khan", "warehouse", "a"]])
+    return attendance_df, filtered_df
+
+
+def bench_exports(recorder, size, attendance_df, max_excel_rows, max_pdf_rows):
+    for format_name in available_formats():
+        if format_name == "Excel" and len(attendance_df) > max_excel_rows:
+            continue
+        path = recorder.time(size, f"export: {format_name} (all rows)",
+                             lambda: export_to_file(attendance_df, format_name))
+        os.remove(path)
+    if len(attendance_df) <= max_pdf_rows:
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        os.close(fd)
+        recorder.time(size, "export: PDF report (all rows)", lambda: write_pdf_report(attendance_df, path))
+        os.remove(path)
+
+
+def run(sizes, max_excel_rows, max_pdf_rows, request_latency, sleep):
+    stats = CallStats(request_latency=request_latency, sleep=sleep)
+    recorder = Recorder(stats)
+    config.STORAGE_BACKEND = BACKEND
+    workdir = tempfile.mkdtemp(prefix="attendance_bench_")
+    try:
+        for size in sizes:
+            start = time.perf_counter()
+            tables = generate_tables(size)
+            print(f"Generated {size:,} attendance rows in {time.perf_counter() - start:.1f} s", flush=True)
+            storage = FakeSheetsStorage(FakeSpreadsheet(tables, stats))
+            register_storage(BACKEND, storage)
+
+            attendance_df, _ = bench_dashboard(recorder, size)
+            bench_exports(recorder, size, attendance_df, max_excel_rows, max_pdf_rows)
+            bench_kiosk(recorder, size, storage, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return recorder.results
+
+
+def format_results(results):
+    lines = [f"{'rows':>9}  {'benchmark':<36} {'ms':>10}  {'calls':>6}  {'API s':>7}"]
+    for result in results:
+        lines.append(f"{result['rows']:>9}  {result['benchmark']:<36} {result['seconds'] * 1000:>10.1f}  "
+                     f"{result['api_calls']:>6.1f}  {result['api_seconds']:>7.2f}")
+    return "\n".join(lines)
+
+
+# Function to read a results table written with --output
+def read_results(path):
+    results = []
+    with open(path) as results_file:
+        for line in results_file.read().splitlines()[1:]:
+            fields = line.split()
+            if len(fields) < 5:
+                continue
+            results.append({
+                "rows": int(fields[0]), "benchmark": " ".join(fields[1:-3]), "seconds": float(fields[-3]) / 1000,
+                "api_calls": float(fields[-2]), "api_seconds": float(fields[-1]),
+            })
+    return results
+
+
+# Function to list the benchmarks that got slower or make more API calls than in `baseline`
+def find_regressions(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    previous = {(result["rows"], result["benchmark"]): result for result in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get((result["rows"], result["benchmark"]))
+        if before is None:
+            continue
+        slower = result["seconds"] - before["seconds"]
+        if slower > MIN_REGRESSION_SECONDS and result["seconds"] > before["seconds"] * (1 + tolerance):
+            regressions.append(f"{result['rows']:>9,} rows  {result['benchmark']:<36} "
+                               f"{before['seconds'] * 1000:.1f} ms -> {result['seconds'] * 1000:.1f} ms")
+        if result["api_calls"] > before["api_calls"]:
+            regressions.append(f"{result['rows']:>9,} rows  {result['benchmark']:<36} "
+                               f"{before['api_calls']:.1f} -> {result['api_calls']:.1f} API calls")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the attendance app on synthetic data")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Attendance rows per run")
+    parser.add_argument("--max-excel-rows", type=int, default=DEFAULT_MAX_EXCEL_ROWS,
+                        help="Largest table exported to Excel")
+    parser.add_argument("--max-pdf-rows", type=int, default=DEFAULT_MAX_PDF_ROWS,
+                        help="Largest table rendered as a PDF report")
+    parser.add_argument("--latency", type=float, default=REQUEST_LATENCY,
+                        help="Simulated seconds per Sheets API request")
+    parser.add_argument("--sleep", action="store_true", help="Really wait for the simulated latency")
+    parser.add_argument("--output", help="Also write the results table to this file")
+    parser.add_argument("--baseline", help="Results table of an earlier run (--output) to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Slowdown against the baseline allowed before failing (0.5 = 50%%)")
+    args = parser.parse_args(argv)
+
+    # Read first, so a missing baseline fails before the benchmarks run
+    baseline = read_results(args.baseline) if args.baseline else None
+    results = run(args.sizes, args.max_excel_rows, args.max_pdf_rows, args.latency, args.sleep)
+    table = format_results(results)
+    print()
+    print(table)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(table + "\n")
+    if baseline is not None:
+        regressions = find_regressions(results, baseline, args.tolerance)
+        print()
+        if regressions:
+            print(f"{len(regressions)} regression(s) against {args.baseline}:")
+            print("\n".join(regressions))
+            return 1
+        print(f"No regressions against {args.baseline}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+from datetime import date, timedelta
+import numpy as np
+import config
+from kiosk import SIGN_IN_STATUSES, SIGN_OUT_STATUSES, BREAK_START, BREAK_END
+
+DEPARTMENTS = ["Operations", "Warehouse", "Logistics", "Finance", "Human Resources", "Sales", "IT", "Security"]
+JOB_TITLES = ["Associate", "Senior Associate", "Team Lead", "Supervisor", "Manager", "Technician", "Driver", "Analyst"]
+FIRST_NAMES = ["Aarav", "Maya", "Omar", "Lina", "Kofi", "Sara", "Tomas", "Priya", "Jonas", "Amina",
+               "Leo", "Nadia", "Ravi", "Elena", "Yusuf", "Hana", "Marco", "Zara", "Ivan", "Chen"]
+LAST_NAMES = ["Khan", "Silva", "Okafor", "Novak", "Haddad", "Tanaka", "Mensah", "Costa", "Weber", "Ali",
+              "Rossi", "Patel", "Moreau", "Kim", "Adeyemi", "Larsen", "Sato", "Garcia", "Ahmed", "Nowak"]
+SHIFT_DAYS = ["Mon-Fri", "Mon-Sat", "Sun-Thu"]
+
+# Relative frequency of each sign-in and sign-out status
+SIGN_IN_WEIGHTS = [0.55, 0.05, 0.03, 0.08, 0.07, 0.04, 0.18]
+SIGN_OUT_WEIGHTS = [0.75, 0.18, 0.07]
+
+# Kiosk IDs are "sbx" plus three digits
+MAX_EMPLOYEES = 1000
+
+
+# Function to pick a workforce size for a table of `rows` attendance rows:
+# small tables cover a few weeks, large ones several years
+def employees_for(rows):
+    return min(MAX_EMPLOYEES, max(50, rows // 250))
+
+
+def employee_id(number):
+    return f"sbx{number:03d}"
+
+
+# Function to format minutes after midnight like the kiosk ("%I:%M %p")
+def clock_text(minutes):
+    hour, minute = divmod(int(minutes), 60)
+    return f"{(hour - 1) % 12 + 1:02d}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+
+
+# Function to generate Employee Master Data rows (without the header)
+def generate_employees(count, seed=0):
+    if count > MAX_EMPLOYEES:
+        raise ValueError(f"At most {MAX_EMPLOYEES} employees fit the sbxXXX ID format")
+    rng = np.random.default_rng(seed)
+    rows = []
+    for number in range(count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        joined = date(2015, 1, 1) + timedelta(days=int(rng.integers(0, 3000)))
+        rows.append([
+            employee_id(number), f"{first} {last}", f"+1555{number:07d}",
+            f"{first.lower()}.{last.lower()}{number}@example.com", str(rng.choice(JOB_TITLES)),
+            str(rng.choice(DEPARTMENTS)), joined.isoformat(), str(rng.choice(SHIFT_DAYS)),
+            f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", f"{number + 1} Example Street",
+        ])
+    return rows
+
+
+# Function to generate Attendance Data rows (without the header) for the
+# given employees: one row per employee per weekday, oldest first, ending on
+# `end_date`. Rows of the last day have no sign-out yet. Repeated values are
+# shared string objects, like the values gspread returns for a real sheet.
+def generate_attendance(employee_rows, rows, end_date=None, seed=0):
+    if not rows:
+        return []
+    rng = np.random.default_rng(seed)
+    end_date = end_date or date.today() - timedelta(days=1)
+    per_day = len(employee_rows)
+
+    # Enough weekdays, counted back from end_date
+    days = []
+    current = end_date
+    while len(days) * per_day < rows:
+        if current.weekday() < 5:
+            days.append(current)
+        current -= timedelta(days=1)
+    days.reverse()
+    date_texts = [(day.isoformat(), day.strftime("%A")) for day in days]
+
+    people = [(row[0], row[1], row[5]) for row in employee_rows]
+    day_index = np.arange(rows) // per_day
+    person_index = np.arange(rows) % per_day
+    status_in = rng.choice(len(SIGN_IN_STATUSES), size=rows, p=SIGN_IN_WEIGHTS)
+    status_out = rng.choice(len(SIGN_OUT_STATUSES), size=rows, p=SIGN_OUT_WEIGHTS)
+
+    # Arrivals from 08:00 to 10:30 and departures from 16:00 to 19:00, in 5 minute steps
+    in_minutes = 480 + 5 * rng.integers(0, 31, size=rows)
+    out_minutes = 960 + 5 * rng.integers(0, 37, size=rows)
+    times = {minutes: clock_text(minutes) for minutes in range(0, 24 * 60, 5)}
+    open_from = (len(days) - 1) * per_day
+
+    result = []
+    for i, (day, person, s_in, s_out, t_in, t_out) in enumerate(zip(
+            day_index.tolist(), person_index.tolist(), status_in.tolist(), status_out.tolist(),
+            in_minutes.tolist(), out_minutes.tolist())):
+        emp_id, name, department = people[person]
+        date_text, weekday = date_texts[day]
+        signed_out = i < open_from
+        result.append([
+            emp_id, name, department, date_text, weekday, times[t_in], SIGN_IN_STATUSES[s_in],
+            BREAK_START, BREAK_END, times[t_out] if signed_out else "",
+            SIGN_OUT_STATUSES[s_out] if signed_out else "",
+        ])
+    return result
+
+
+# Function to generate both tables as sheet values, header row included
+def generate_tables(rows, employees=None, end_date=None, seed=0):
+    employee_rows = generate_employees(employees or employees_for(rows), seed)
+    attendance_rows = generate_attendance(employee_rows, rows, end_date, seed)
+    return {
+        config.EMPLOYEE_SHEET: [list(config.EMPLOYEE_COLUMNS)] + employee_rows,
+        config.ATTENDANCE_SHEET: [list(config.ATTENDANCE_COLUMNS)] + attendance_rows,
+    }
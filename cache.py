@@ -0,0 +1,124 @@
+import threading
+import time
+from collections import OrderedDict
+import config
+
+
+# Function to estimate the memory held by a cached value
+def value_size(value):
+    return sum(value_frames(value).values())
+
+
+# Function to get the size of every frame in a cached value, by id, so a
+# frame held by several entries is counted once
+def value_frames(value):
+    if hasattr(value, "memory_usage"):
+        return {id(value): int(value.memory_usage(index=True, deep=True).sum())}
+    frames = {}
+    if isinstance(value, (tuple, list)):
+        for item in value:
+            frames.update(value_frames(item))
+    return frames
+
+
+# Process-wide cache of DataFrame snapshots, shared by every Streamlit
+# session. Entries expire after `ttl` seconds, can be invalidated explicitly
+# after a write, and the least recently used entries are evicted once the
+# total size goes over `max_bytes`. Frames kept elsewhere (e.g. by the
+# incremental loaders) are put with `expires=False`, so they never expire but
+# count towards `max_bytes`; their `on_evict` callback is called when they
+# are evicted or invalidated, so the holder can let go of them.
+class SnapshotCache:
+
+    def __init__(self, ttl=config.CACHE_TTL, max_bytes=config.CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.load_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _fresh(self, key):
+        entry = self.entries.get(key)
+        if entry is None or self._expired(entry, time.monotonic()):
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    # Function to get a cached value, calling `loader` on a miss. Concurrent
+    # misses for the same key wait for a single load.
+    def get(self, key, loader):
+        with self.lock:
+            entry = self._fresh(key)
+            if entry is not None:
+                self.hits += 1
+                return entry["value"]
+            load_lock = self.load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            with self.lock:
+                entry = self._fresh(key)
+                if entry is not None:
+                    self.hits += 1
+                    return entry["value"]
+                self.misses += 1
+            value = loader()
+            self.put(key, value)
+        return value
+
+    def _expired(self, entry, now):
+        return entry["ttl"] is not None and now - entry["loaded_at"] > entry["ttl"]
+
+    def put(self, key, value, expires=True, on_evict=None):
+        evicted = []
+        with self.lock:
+            now = time.monotonic()
+            self.entries.pop(key, None)
+            # Expired entries would still hold their frames until evicted
+            for stale in [name for name, entry in self.entries.items() if self._expired(entry, now)]:
+                evicted.append(self.entries.pop(stale))
+            self.entries[key] = {
+                "value": value, "loaded_at": now, "ttl": self.ttl if expires else None,
+                "frames": value_frames(value), "on_evict": on_evict,
+            }
+            while len(self.entries) > 1 and self.size() > self.max_bytes:
+                evicted.append(self.entries.popitem(last=False)[1])
+                self.evictions += 1
+        # Called outside the lock, so a callback can use the cache too
+        self._release(evicted)
+
+    # Function to drop one entry, or every entry when no key is given
+    def invalidate(self, key=None):
+        with self.lock:
+            if key is None:
+                evicted = list(self.entries.values())
+                self.entries.clear()
+            else:
+                evicted = [entry for entry in [self.entries.pop(key, None)] if entry is not None]
+        self._release(evicted)
+
+    @staticmethod
+    def _release(entries):
+        for entry in entries:
+            if entry["on_evict"] is not None:
+                entry["on_evict"](entry["value"])
+
+    def size(self):
+        frames = {}
+        for entry in self.entries.values():
+            frames.update(entry["frames"])
+        return sum(frames.values())
+
+    def stats(self):
+        with self.lock:
+            requests = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size(),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "evictions": self.evictions,
+            }
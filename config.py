@@ -0,0 +1,131 @@
+import os
+from dotenv import load_dotenv
+
+# Load settings from the .env file (environment variables take precedence)
+load_dotenv()
+
+# Google Sheets setup
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
+CREDENTIALS_FILE = os.getenv("CREDENTIALS_FILE", "credentials2.json")
+TOKEN_FILE = os.getenv("TOKEN_FILE", "token.pickle")
+SPREADSHEET_NAME = os.getenv("SPREADSHEET_NAME", "SafeBox_Standard_Attendance_Sheet")
+
+# Multi-site mode: the dashboard merges the sheets of every site listed in
+# SITES, e.g. "Main=SafeBox_Standard_Attendance_Sheet;North=SafeBox North Attendance".
+# Empty means one site (SPREADSHEET_NAME). Sites are fetched concurrently
+# by up to SITE_FETCH_WORKERS threads.
+SITES = dict(
+    (name.strip(), spreadsheet.strip())
+    for name, _, spreadsheet in (entry.partition("=") for entry in os.getenv("SITES", "").split(";"))
+    if name.strip() and spreadsheet.strip()
+)
+SITE_FETCH_WORKERS = int(os.getenv("SITE_FETCH_WORKERS", "8"))
+
+# Worksheet names, also used as table names by the storage backends
+EMPLOYEE_SHEET = "Employee Master Data"
+ATTENDANCE_SHEET = "Attendance Data"
+
+# Storage backend: "sheets" (Google Sheets) or "sqlite" (local database file)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sheets")
+SQLITE_PATH = os.getenv("SQLITE_PATH", "attendance.db")
+
+# Column layout of both worksheets, in sheet order
+EMPLOYEE_COLUMNS = [
+    "Employee ID", "Employee Name", "Phone Number", "E-mail Address", "Job Title",
+    "Department", "Joining Date", "Shift Days", "Supervisor Name", "Address"
+]
+ATTENDANCE_COLUMNS = [
+    "Employee ID", "Employee Name", "Department", "Date", "Day", "In-Time",
+    "Attendance Status In", "Break Start", "Break End", "Out-Time", "Attendance Status Out"
+]
+
+# Seconds before the kiosk reloads its in-memory employee index
+EMPLOYEE_INDEX_TTL = int(os.getenv("EMPLOYEE_INDEX_TTL", "300"))
+
+# Seconds before the kiosk rebuilds its sign-in/sign-out session index from storage
+SESSION_INDEX_TTL = int(os.getenv("SESSION_INDEX_TTL", "60"))
+
+# Local write-ahead journal for kiosk punches and its background sync.
+# Synced entries are kept JOURNAL_KEEP_DAYS days; the sync worker deletes
+# older ones at most every JOURNAL_PRUNE_INTERVAL seconds.
+JOURNAL_PATH = os.getenv("JOURNAL_PATH", "journal.db")
+SYNC_INTERVAL = float(os.getenv("SYNC_INTERVAL", "2"))
+SYNC_BATCH_SIZE = int(os.getenv("SYNC_BATCH_SIZE", "50"))
+JOURNAL_KEEP_DAYS = int(os.getenv("JOURNAL_KEEP_DAYS", "30"))
+JOURNAL_PRUNE_INTERVAL = float(os.getenv("JOURNAL_PRUNE_INTERVAL", "3600"))
+
+# Dashboard snapshot cache: seconds before a worksheet is downloaded again,
+# and the memory cap for all cached snapshots
+CACHE_TTL = int(os.getenv("CACHE_TTL", "60"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_MB", "512")) * 1024 * 1024
+
+# Attendance refresh mode: "incremental" fetches only new and recent rows,
+# "full" downloads the whole sheet every time. Incremental refreshes re-fetch
+# at least the last SYNC_WINDOW_ROWS rows and every row that can still get a
+# sign-out (dated today, or open and at most SYNC_OPEN_DAYS days old), and
+# reload the whole sheet every SYNC_FULL_RELOAD_SECONDS to pick up other edits.
+ATTENDANCE_SYNC = os.getenv("ATTENDANCE_SYNC", "incremental")
+SYNC_WINDOW_ROWS = int(os.getenv("SYNC_WINDOW_ROWS", "500"))
+SYNC_OPEN_DAYS = int(os.getenv("SYNC_OPEN_DAYS", "2"))
+SYNC_FULL_RELOAD_SECONDS = float(os.getenv("SYNC_FULL_RELOAD_SECONDS", "600"))
+
+# Scheduled working hours, used for lateness and overtime. These are the
+# defaults; hours saved from the Settings page go to WORK_HOURS_FILE.
+WORK_START = os.getenv("WORK_START", "09:00")
+WORK_END = os.getenv("WORK_END", "17:00")
+WORK_HOURS_FILE = os.getenv("WORK_HOURS_FILE", "work_hours.json")
+
+# Attendance archive: closed months are moved from the live sheet into
+# Parquet files under ARCHIVE_DIR. The last ARCHIVE_KEEP_MONTHS months stay
+# live, and a month is closed ARCHIVE_GRACE_DAYS days after it ends.
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", os.path.join("archive", "attendance"))
+ARCHIVE_KEEP_MONTHS = int(os.getenv("ARCHIVE_KEEP_MONTHS", "1"))
+ARCHIVE_GRACE_DAYS = int(os.getenv("ARCHIVE_GRACE_DAYS", "3"))
+
+# Sheets API request scheduler: sustained requests per minute (the project's
+# per-user quota), requests allowed in a burst, and retries on 429/5xx.
+# SHEETS_REQUESTS_PER_MINUTE=0 disables the limit.
+SHEETS_REQUESTS_PER_MINUTE = float(os.getenv("SHEETS_REQUESTS_PER_MINUTE", "60"))
+SHEETS_BURST = int(os.getenv("SHEETS_BURST", "10"))
+SHEETS_MAX_RETRIES = int(os.getenv("SHEETS_MAX_RETRIES", "5"))
+
+# In-process metrics: seconds of samples kept for percentiles and rates, and
+# the samples kept per metric. METRICS_FILE (".prom" for Prometheus text,
+# JSON otherwise, e.g. "metrics_{app}.prom" with {app} = kiosk or admin) is
+# rewritten every METRICS_EXPORT_INTERVAL seconds when set.
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", "3600"))
+METRICS_MAX_SAMPLES = int(os.getenv("METRICS_MAX_SAMPLES", "10000"))
+METRICS_FILE = os.getenv("METRICS_FILE", "")
+METRICS_EXPORT_INTERVAL = float(os.getenv("METRICS_EXPORT_INTERVAL", "30"))
+
+# Notifications for the events chosen on the Settings page (saved to
+# NOTIFY_SETTINGS_FILE): rules run every NOTIFY_INTERVAL seconds (off unless
+# set, e.g. 30) and employees due who have not signed in by NOTIFY_ABSENCE_CUTOFF
+# are reported absent. Email goes through SMTP when NOTIFY_EMAIL_SENDER is
+# "smtp"; otherwise, and for SMS, messages are appended to NOTIFY_OUTBOX_FILE.
+# The alerts already sent today are kept in NOTIFY_STATE_FILE across restarts.
+NOTIFY_INTERVAL = float(os.getenv("NOTIFY_INTERVAL") or "0")
+NOTIFY_SETTINGS_FILE = os.getenv("NOTIFY_SETTINGS_FILE", "notification_settings.json")
+NOTIFY_OUTBOX_FILE = os.getenv("NOTIFY_OUTBOX_FILE", "notifications_outbox.jsonl")
+NOTIFY_STATE_FILE = os.getenv("NOTIFY_STATE_FILE", "notifications_state.json")
+NOTIFY_ABSENCE_CUTOFF = os.getenv("NOTIFY_ABSENCE_CUTOFF", "10:00")
+NOTIFY_EMAIL_SENDER = os.getenv("NOTIFY_EMAIL_SENDER", "file")
+NOTIFY_FROM = os.getenv("NOTIFY_FROM", "attendance@localhost")
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "1025"))
+SMTP_USERNAME = os.getenv("SMTP_USERNAME", "")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
+
+# Pre-rendered reports (report_worker.py): artifacts and their manifest are
+# written to REPORT_DIR every REPORT_INTERVAL seconds by REPORT_WORKERS
+# processes (0 = one per core), for the last REPORT_MONTHS months
+REPORT_DIR = os.getenv("REPORT_DIR", "report_artifacts")
+REPORT_INTERVAL = float(os.getenv("REPORT_INTERVAL", "3600"))
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "0"))
+REPORT_MONTHS = int(os.getenv("REPORT_MONTHS", "2"))
+REPORT_FORMATS = [name.strip() for name in os.getenv("REPORT_FORMATS", "CSV,PDF").split(",") if name.strip()]
+
+# Startup profiling: when set, the kiosk and the dashboard report the import
+# time of each module and of their initialization on stderr (and in the
+# metrics) after rendering their first page
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "")
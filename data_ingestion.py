@@ -1,46 +1,334 @@
-import gspread
-import os
-import pickle
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
+import contextvars
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import reduce
+import numpy as np
 import pandas as pd
+import config
+from archive import site_archive
+from cache import SnapshotCache
+from metrics import timed
+from rollups import DailyRollup
+from schema import SITE_COLUMN, concat_typed, first_open_row, typed_attendance, with_site
+from storage import TABLES, get_storage, on_change
+from sync_window import refresh_start
 
-# Define the scope
-SCOPES = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
+# Snapshots of both worksheets, shared by every dashboard session.
+# Our own writes through the storage layer drop the affected snapshot.
+snapshot_cache = SnapshotCache()
+on_change(config.EMPLOYEE_SHEET, lambda: snapshot_cache.invalidate(config.EMPLOYEE_SHEET))
+on_change(config.ATTENDANCE_SHEET, lambda: snapshot_cache.invalidate(config.ATTENDANCE_SHEET))
 
-def data_ingestion():
-    # Load credentials from file
-    creds = None
+# Build a DataFrame from records, keeping the expected columns when the table is empty
+def records_to_frame(records, columns):
+    if not records:
+        return pd.DataFrame(columns=columns)
+    return pd.DataFrame(records)
 
-    # Token file stores the user's access and refresh tokens
-    if os.path.exists('token.pickle'):
-        with open('token.pickle', 'rb') as token:
-            creds = pickle.load(token)
+# Build a DataFrame from raw rows, padding rows the API returned without trailing empty cells
+def rows_to_frame(rows, header):
+    return pd.DataFrame([row[:len(header)] + [""] * (len(header) - len(row)) for row in rows], columns=header)
 
-    # If no valid credentials are available, let the user log in
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file('credentials2.json', SCOPES)
-            creds = flow.run_local_server(port=0)
+# Function to load a table from the storage backend selected in the config
+@timed("data_ingestion.load_table")
+def load_table(table, columns, site=None):
+    storage = get_storage(site=site)
+    return records_to_frame(storage.get_all_records(table), columns)
+
+
+# Sites whose sheets are loaded: every site of config.SITES, or only the
+# default spreadsheet (None)
+def site_names():
+    return list(config.SITES) or [None]
+
+# Bounded pool fetching the sheets of several sites at once; the scheduler
+# still spaces the requests to the project quota
+_site_pool = ThreadPoolExecutor(max_workers=max(config.SITE_FETCH_WORKERS, 1), thread_name_prefix="site-fetch")
+
+# Function to call `load(site)` for every site, concurrently when there are
+# several; returns the results in site order
+def map_sites(load):
+    names = site_names()
+    if len(names) == 1:
+        return [load(names[0])]
+    # Each task runs in a copy of the caller's context, so its storage calls
+    # are attributed to the page that asked for them
+    futures = [_site_pool.submit(contextvars.copy_context().run, load, site) for site in names]
+    return [future.result() for future in futures]
+
+
+# Function to checksum the key columns of each row of a frame
+def key_checksums(df, key_columns):
+    return pd.util.hash_pandas_object(df[key_columns].astype(str), index=False).to_numpy()
+
+
+# Incremental loader for an append-mostly table such as Attendance Data.
+# After the first full load only the rows after the last synced row are
+# fetched, plus the rows that can still be updated (sign-out fills in
+# Out-Time): the last `window` rows and every row from the first one that is
+# dated today or still open (see schema.first_open_row). The key columns of
+# every re-fetched row we already hold must be unchanged; otherwise (e.g.
+# rows were deleted) the table is loaded in full again, as it is every
+# `full_reload_seconds` to pick up edits to older rows.
+# `convert` is applied to every fetched block and `concat` joins blocks, so
+# only the new rows are converted on each refresh. Every load gets a version
+# and the position of the first row each refresh replaced is kept, so
+# dependents update only the rows changed since the version they last saw
+# (see last_changes). When a `cache` is given, the frame is put in it under
+# `cache_key` to count towards its memory cap; once evicted from it, the
+# frame is dropped and the next refresh loads the table in full.
+class IncrementalTable:
+
+    # Columns that are written once on sign-in and used to check that rows have not shifted
+    KEY_COLUMNS = ["Employee ID", "Date", "In-Time"]
+
+    def __init__(self, table, window=config.SYNC_WINDOW_ROWS, convert=None, concat=None, site=None,
+                 open_days=config.SYNC_OPEN_DAYS, full_reload_seconds=config.SYNC_FULL_RELOAD_SECONDS, cache=None):
+        self.table = table
+        self.site = site
+        self.convert = convert or (lambda frame: frame)
+        self.concat = concat or (lambda head, tail: pd.concat([head, tail], ignore_index=True))
+        self.window = window
+        self.open_days = open_days
+        self.full_reload_seconds = full_reload_seconds
+        self.cache = cache
+        self.cache_key = ("sync", table, site)
+        self.header = None
+        self.frame = None
+        self.lock = threading.Lock()
+        # Position of the first row that can still be updated
+        self.open_from = 0
+        self.loaded_at = None
+        # Incremented on every full load, so dependents know to rebuild
+        self.generation = 0
+        # Incremented on every load; the refreshes since the last full load
+        # map to the position of the first row they replaced
+        self.version = 0
+        self.changes = {}
+
+    def full_load(self):
+        rows = get_storage(site=self.site).get_rows(self.table, 1)
+        self.header = rows[0] if rows else list(TABLES[self.table][1])
+        self.frame = self.convert(rows_to_frame(rows[1:], self.header))
+        self.open_from = first_open_row(self.frame, self.open_days)
+        self.loaded_at = time.monotonic()
+        self.generation += 1
+        self.version += 1
+        self.changes = {}
+        return self.frame
+
+    def refresh(self):
+        with self.lock:
+            # Read once: an eviction from the cache may drop the frame meanwhile
+            frame = self.frame
+            if frame is None or time.monotonic() - self.loaded_at >= self.full_reload_seconds:
+                frame = self.full_load()
+            else:
+                start = refresh_start(self.open_from, len(frame), self.window)
+                # Data row i lives in sheet row i + 2
+                rows = get_storage(site=self.site).get_rows(self.table, start + 2)
+                tail = self.convert(rows_to_frame(rows, self.header))
+                if self.same_rows(frame, start, tail):
+                    frame = self.frame = self.concat(frame.iloc[:start], tail)
+                    self.open_from = start + first_open_row(tail, self.open_days)
+                    self.version += 1
+                    self.changes[self.version] = start
+                else:
+                    frame = self.full_load()
+        if self.cache is not None:
+            self.cache.put(self.cache_key, frame, expires=False, on_evict=self.release)
+        return frame
+
+    # Function to check that every re-fetched row we already hold is still
+    # the same row, by comparing checksums of their key columns
+    def same_rows(self, frame, start, tail):
+        held = frame.iloc[start:]
+        if len(tail) < len(held):
+            return False
+        key_columns = [column for column in self.KEY_COLUMNS if column in self.header]
+        return np.array_equal(key_checksums(held, key_columns), key_checksums(tail.iloc[:len(held)], key_columns))
+
+    # Function to drop the frame once the cache has evicted it. It does not
+    # wait for the lock, as a refresh holding it may be evicting another table.
+    def release(self, frame):
+        if self.frame is frame:
+            self.frame = None
+
+    # Function to get the position of the first row of `frame` added or
+    # updated by the loads after `version`, and the version of `frame`. The
+    # position is None when the table was loaded in full since, so every row
+    # is to be taken as new; both are None when `frame` is not the current frame.
+    def last_changes(self, frame, version=None):
+        with self.lock:
+            if frame is None or frame is not self.frame:
+                return None, None
+            if version is None or not self.version - len(self.changes) <= version <= self.version:
+                return None, self.version
+            starts = [self.changes[load] for load in range(version + 1, self.version + 1)]
+            return min(starts, default=len(frame)), self.version
 
-        # Save the credentials for the next run
-        with open('token.pickle', 'wb') as token:
-            pickle.dump(creds, token)
 
-    # Google Sheets API setup
-    client = gspread.authorize(creds)
+attendance_sync = IncrementalTable(
+    config.ATTENDANCE_SHEET, convert=typed_attendance, concat=concat_typed, cache=snapshot_cache
+)
 
-    sheet = client.open("SafeBox_Standard_Attendance_Sheet")
-    employee_data = sheet.worksheet("Employee Master Data")
-    attendance_data = sheet.worksheet("Attendance Data")
+# Daily counts kept up to date with every attendance load
+daily_rollup = DailyRollup()
+
+# Incremental loaders and rollups of the sites in multi-site mode, one per
+# site so each keeps appending to its own rows
+site_syncs = {}
+site_rollups = {}
+_sites_lock = threading.Lock()
+
+# Number of attendance frames built from scratch: full loads when
+# ATTENDANCE_SYNC is "full", and merges of the sites' frames otherwise
+full_loads = 0
+
+def site_sync(site):
+    if site is None:
+        return attendance_sync
+    with _sites_lock:
+        if site not in site_syncs:
+            site_syncs[site] = IncrementalTable(
+                config.ATTENDANCE_SHEET, convert=lambda frame: typed_attendance(with_site(frame, site)),
+                concat=concat_typed, site=site, cache=snapshot_cache
+            )
+        return site_syncs[site]
+
+def site_rollup(site):
+    if site is None:
+        return daily_rollup
+    with _sites_lock:
+        return site_rollups.setdefault(site, DailyRollup())
+
+# Function to load the attendance rows of one site, keeping its rollup up to date
+def load_site_attendance(site):
+    if config.ATTENDANCE_SYNC == "incremental":
+        sync = site_sync(site)
+        attendance_df = sync.refresh()
+        site_rollup(site).update(attendance_df, sync.generation)
+    else:
+        frame = load_table(config.ATTENDANCE_SHEET, config.ATTENDANCE_COLUMNS, site)
+        attendance_df = typed_attendance(with_site(frame, site))
+        site_rollup(site).rebuild(attendance_df)
+    return attendance_df
+
+# Function to load the attendance frame in its typed layout (see schema.py).
+# In multi-site mode the sites are fetched concurrently and their rows
+# merged, tagged with their Site.
+@timed("data_ingestion.load_attendance")
+def load_attendance():
+    global full_loads
+    frames = map_sites(load_site_attendance)
+    if len(frames) == 1 and config.ATTENDANCE_SYNC == "incremental":
+        return frames[0]
+    # Rows of one site added since the last merge shift the rows of the
+    # sites after it, so the merged frame is never a pure append
+    full_loads += 1
+    return reduce(concat_typed, frames)
+
+# Changes whenever the attendance frame has been reloaded from scratch, so
+# results derived from older rows must be recomputed
+def attendance_generation():
+    if config.ATTENDANCE_SYNC == "incremental" and not config.SITES:
+        return attendance_sync.generation
+    return full_loads
+
+# Function to load the employee table of every site, tagged with their Site
+@timed("data_ingestion.load_employees")
+def load_employees():
+    frames = map_sites(
+        lambda site: with_site(load_table(config.EMPLOYEE_SHEET, config.EMPLOYEE_COLUMNS, site), site)
+    )
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+# Cached snapshots, for read-only use (data_ingestion hands out copies)
+@timed("data_ingestion.employee_snapshot")
+def employee_snapshot():
+    return snapshot_cache.get(config.EMPLOYEE_SHEET, load_employees)
+
+@timed("data_ingestion.attendance_snapshot")
+def attendance_snapshot():
+    return snapshot_cache.get(config.ATTENDANCE_SHEET, load_attendance)
+
+# Function to get the daily rollup of the live rows and the archived months
+# of one site, or of every site, refreshing attendance first if it is stale
+def attendance_rollup(site=None):
+    attendance_snapshot()
+    names = site_names() if site is None else [site]
+    rollup = site_rollup(names[0]).with_counts(site_archive(names[0]).counts())
+    for name in names[1:]:
+        rollup = rollup.with_counts(site_rollup(name).with_counts(site_archive(name).counts()).counts)
+    return rollup
+
+# Frames of both tiers (archived months + live rows) are kept in the
+# snapshot cache, keyed by the archive files they include. Each one is
+# recorded here as id -> (frame, live frame, archived rows before the live
+# rows), through weak references, so attendance_changes can relate it to
+# the live rows
+_history_sources = {}
+
+# Function to get the attendance rows of both tiers for a date range, of
+# one site or of every site. Only the archived months overlapping
+# [start, end] are read (all months when no range is given); live rows are
+# always included. Returns the frame and a generation that changes whenever
+# the frame was rebuilt rather than appended to, for the engines that
+# update incrementally.
+def attendance_history(start=None, end=None, site=None):
+    live = attendance_snapshot()
+    archives = [site_archive(name) for name in (site_names() if site is None else [site])]
+    files = [archive.files(start, end) for archive in archives]
+    version = tuple(archive.version(part) for archive, part in zip(archives, files))
+    generation = (version, attendance_generation())
+    if site is None and not any(files):
+        return live, generation
+
+    def build():
+        if site is not None:
+            live_rows = live[live[SITE_COLUMN] == site].reset_index(drop=True)
+        else:
+            live_rows = live
+        parts = [archive.read(files=part) for archive, part in zip(archives, files) if part]
+        history = reduce(concat_typed, parts + [live_rows])
+        _history_sources[id(history)] = (weakref.ref(history), weakref.ref(live_rows), len(history) - len(live_rows))
+        weakref.finalize(history, _history_sources.pop, id(history), None)
+        return live, history
 
-    # Fetch all records
-    employee_records = employee_data.get_all_records()
-    attendance_records = attendance_data.get_all_records()
+    key = ("history", site, version)
+    cached = snapshot_cache.get(key, build)
+    if cached[0] is not live:
+        # Built from live rows loaded before the current ones
+        cached = build()
+        snapshot_cache.put(key, cached)
+    return cached[1], generation
 
-    employee_df = pd.DataFrame(employee_records)
-    attendance_df = pd.DataFrame(attendance_records)
+# Function to find the rows of an attendance frame (from attendance_snapshot
+# or attendance_history) added or updated since a dependent last saw it,
+# from the refreshes the incremental loader recorded. `seen` is what the
+# previous call returned to that dependent. Returns (position of the first
+# such row, `seen` for the next call); the position is 0 when the rows
+# cannot be related to the ones seen (first call, full reload, sites merged).
+def attendance_changes(frame, seen=None):
+    live, offset = frame, 0
+    source = _history_sources.get(id(frame))
+    if source is not None and source[0]() is frame:
+        live, offset = source[1](), source[2]
+    start, version = None, None
+    if config.ATTENDANCE_SYNC == "incremental" and not config.SITES:
+        start, version = attendance_sync.last_changes(live, seen[1] if seen and seen[2] == offset else None)
+    if version is None:
+        # Rebuilt on every load: unchanged only while it is the same frame
+        unchanged = seen is not None and seen[1] is None and seen[0]() is frame
+        return (len(frame) if unchanged else 0), (weakref.ref(frame), None, offset)
+    return (0 if start is None else offset + start), (weakref.ref(frame), version, offset)
 
-    return  employee_df, attendance_df
+# Function to get the first and last attendance date across both tiers
+def attendance_date_range():
+    dates = attendance_snapshot()["Date"].dropna()
+    months = sorted(month for name in site_names() for month in site_archive(name).months())
+    first = months[0].start_time if months else (dates.min() if len(dates) else pd.Timestamp.today())
+    last = dates.max() if len(dates) else (months[-1].end_time.normalize() if months else pd.Timestamp.today())
+    return first.normalize(), last.normalize()
@@ -0,0 +1,59 @@
+import threading
+import time
+import config
+from storage import on_change
+
+# Minimum seconds between reloads triggered by an unknown Employee ID
+MISS_REFRESH_INTERVAL = 30
+
+
+# In-memory index of the Employee Master Data keyed by Employee ID.
+# The index is reloaded when it is older than `max_age` seconds, when the
+# employee table is written through the storage layer, and (rate limited)
+# when an unknown ID is looked up, so newly added employees can sign in.
+class EmployeeIndex:
+
+    def __init__(self, storage, max_age=config.EMPLOYEE_INDEX_TTL):
+        self.storage = storage
+        self.max_age = max_age
+        self.employees = {}
+        self.loaded_at = None
+        self.lock = threading.Lock()
+        on_change(config.EMPLOYEE_SHEET, self.invalidate)
+
+    def invalidate(self):
+        self.loaded_at = None
+
+    def refresh(self):
+        records = self.storage.get_all_records(config.EMPLOYEE_SHEET)
+        employees = {}
+        for i, record in enumerate(records):
+            # Keep the first row for an ID, like a sheet lookup would
+            employees.setdefault(str(record["Employee ID"]), {
+                "name": record.get("Employee Name", ""),
+                "department": record.get("Department", ""),
+                "row": i + 2,
+            })
+        with self.lock:
+            self.employees = employees
+            self.loaded_at = time.monotonic()
+
+    def age(self):
+        if self.loaded_at is None:
+            return None
+        return time.monotonic() - self.loaded_at
+
+    # Function to get name, department and row of an employee, or None if unknown
+    def get(self, employee_id):
+        age = self.age()
+        if age is None or age > self.max_age:
+            self.refresh()
+            age = 0
+        employee = self.employees.get(employee_id)
+        if employee is None and age > MISS_REFRESH_INTERVAL:
+            self.refresh()
+            employee = self.employees.get(employee_id)
+        return employee
+
+    def exists(self, employee_id):
+        return self.get(employee_id) is not None
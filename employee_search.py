@@ -0,0 +1,67 @@
+import threading
+import numpy as np
+import pandas as pd
+
+# Columns covered by the employee search box
+SEARCH_COLUMNS = ["Employee ID", "Employee Name", "Department", "Supervisor Name", "Job Title"]
+
+# Separator between fields, so that a match cannot span two columns
+SEPARATOR = "\x1f"
+
+
+# Search index over the employee table.
+# Each row is stored as one lowercased string of its searchable fields, and
+# a trigram index maps every 3-character sequence to the rows containing it.
+# Queries of 3+ characters only check the rows that contain all of their
+# trigrams; shorter queries use a vectorized substring scan.
+class EmployeeSearchIndex:
+
+    def __init__(self, employee_df):
+        columns = [column for column in SEARCH_COLUMNS if column in employee_df]
+        if columns and len(employee_df):
+            text = employee_df[columns].astype(str).agg(SEPARATOR.join, axis=1).str.lower()
+        else:
+            text = pd.Series([""] * len(employee_df), dtype=object)
+        self.text = text.reset_index(drop=True)
+
+        postings = {}
+        for position, value in enumerate(self.text):
+            for trigram in {value[i:i + 3] for i in range(len(value) - 2)}:
+                postings.setdefault(trigram, []).append(position)
+        self.postings = {trigram: np.array(rows) for trigram, rows in postings.items()}
+
+    # Function to get the positions of the rows containing `term` (case-insensitive)
+    def search(self, term):
+        term = term.strip().lower()
+        if not term:
+            return np.arange(len(self.text))
+
+        if len(term) < 3:
+            candidates = self.text
+        else:
+            trigrams = {term[i:i + 3] for i in range(len(term) - 2)}
+            if any(trigram not in self.postings for trigram in trigrams):
+                return np.array([], dtype=int)
+            lists = sorted((self.postings[trigram] for trigram in trigrams), key=len)
+            positions = lists[0]
+            for rows in lists[1:]:
+                positions = np.intersect1d(positions, rows, assume_unique=True)
+            candidates = self.text.iloc[positions]
+
+        matches = candidates.str.contains(term, regex=False)
+        return candidates.index[matches.to_numpy()].to_numpy()
+
+
+# The index is rebuilt only when a new employee snapshot is passed in
+_index = None
+_source = None
+_lock = threading.Lock()
+
+
+def get_search_index(employee_df):
+    global _index, _source
+    with _lock:
+        if employee_df is not _source:
+            _index = EmployeeSearchIndex(employee_df)
+            _source = employee_df
+        return _index
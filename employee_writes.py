@@ -0,0 +1,134 @@
+import hashlib
+import config
+from schema import SITE_COLUMN
+
+TABLE = config.EMPLOYEE_SHEET
+COLUMNS = config.EMPLOYEE_COLUMNS
+
+
+# Raised when employee rows changed in storage since they were read
+class EmployeeConflictError(Exception):
+
+    def __init__(self, employee_ids):
+        self.employee_ids = list(employee_ids)
+        super().__init__(
+            "Changed by someone else since it was loaded: " + ", ".join(self.employee_ids)
+            + ". Reload the page and try again."
+        )
+
+
+def cell_text(value):
+    return "" if value is None else str(value)
+
+
+# Function to fingerprint a row by its values (as sheet text), to detect concurrent changes
+def row_checksum(values):
+    values = [cell_text(value) for value in values][:len(COLUMNS)]
+    values += [""] * (len(COLUMNS) - len(values))
+    return hashlib.sha1("\x1f".join(values).encode("utf-8")).hexdigest()
+
+
+# Function to record the version of employee rows as read: for each Employee
+# ID its site, sheet row, values and their checksum. The frame must come
+# straight from the employee table (position i lives in sheet row i + 2),
+# or from the merged tables of the sites, each site's rows in sheet order.
+def read_versions(employee_df, employee_ids=None):
+    wanted = None if employee_ids is None else {str(employee_id) for employee_id in employee_ids}
+    sites = employee_df[SITE_COLUMN].tolist() if SITE_COLUMN in employee_df else [None] * len(employee_df)
+    rows = {}
+    versions = {}
+    for site, record in zip(sites, employee_df.reindex(columns=COLUMNS).itertuples(index=False)):
+        rows[site] = rows.get(site, 1) + 1
+        employee_id = cell_text(record[0])
+        if (wanted is None or employee_id in wanted) and employee_id not in versions:
+            values = [cell_text(value) for value in record]
+            versions[employee_id] = {
+                "site": site, "row": rows[site], "values": values, "checksum": row_checksum(values)
+            }
+    return versions
+
+
+# Write path for the Employee Master Data.
+# Edits are compared with the version the admin read and only the cells that
+# differ are sent, as one batched update for any number of employees. Before
+# writing, the affected rows are read back in one request and their checksums
+# compared with the read version, so a change made by another admin (or a
+# row shifted by a deletion) is reported instead of overwritten. The sheet has
+# no compare-and-swap, so a write racing within that short window can still
+# win; the check catches edits made while the form was open.
+class EmployeeWriter:
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    # Function to read the current values of the given rows with one request
+    def current_rows(self, rows):
+        if not rows:
+            return {}
+        first, last = min(rows), max(rows)
+        values = self.storage.get_rows(TABLE, first, last)
+        return {first + i: row for i, row in enumerate(values)}
+
+    # Function to raise EmployeeConflictError for versions that no longer match storage
+    def check(self, versions):
+        current = self.current_rows([version["row"] for version in versions.values()])
+        conflicts = [
+            employee_id for employee_id, version in versions.items()
+            if row_checksum(current.get(version["row"], [])) != version["checksum"]
+        ]
+        if conflicts:
+            raise EmployeeConflictError(conflicts)
+
+    # Function to compute the cells to write: (row, col, value) for every
+    # column whose new value differs from the read version
+    @staticmethod
+    def diff(versions, changes):
+        updates = []
+        for employee_id, fields in changes.items():
+            version = versions[employee_id]
+            for column, value in fields.items():
+                col = COLUMNS.index(column) + 1
+                if cell_text(value) != version["values"][col - 1]:
+                    updates.append((version["row"], col, cell_text(value)))
+        return updates
+
+    # Function to apply edits to many employees at once. `versions` comes from
+    # read_versions; `changes` maps Employee ID -> {column: new value}.
+    # Returns the number of cells written.
+    def update_employees(self, versions, changes):
+        unknown = [column for fields in changes.values() for column in fields if column not in COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown employee columns: {', '.join(sorted(set(unknown)))}")
+        missing = [employee_id for employee_id in changes if employee_id not in versions]
+        if missing:
+            raise ValueError(f"Unknown Employee IDs: {', '.join(missing)}")
+
+        updates = self.diff(versions, changes)
+        if not updates:
+            return 0
+        touched = {employee_id: versions[employee_id] for employee_id in changes}
+        self.check(touched)
+        self.storage.update_cells(TABLE, updates, value_input_option="RAW")
+        return len(updates)
+
+    # Function to append new employees in one request; records are dicts keyed
+    # by column name. IDs already in storage are rejected.
+    def add_employees(self, records):
+        new_ids = [cell_text(record.get("Employee ID")).strip() for record in records]
+        if not all(new_ids):
+            raise ValueError("Employee ID is required.")
+        if len(set(new_ids)) != len(new_ids):
+            raise ValueError("Duplicate Employee IDs in the new employees.")
+        existing = {cell_text(row[0]) for row in self.storage.get_rows(TABLE, 2) if row}
+        taken = [employee_id for employee_id in new_ids if employee_id in existing]
+        if taken:
+            raise ValueError(f"Employee ID already exists: {', '.join(taken)}")
+        rows = [[cell_text(record.get(column, "")) for column in COLUMNS] for record in records]
+        return self.storage.append_rows(TABLE, rows)
+
+    # Function to delete employees by their read versions
+    def remove_employees(self, versions):
+        if not versions:
+            return
+        self.check(versions)
+        self.storage.delete_rows(TABLE, [version["row"] for version in versions.values()])
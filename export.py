@@ -0,0 +1,79 @@
+import importlib.util
+import os
+import tempfile
+from schema import attendance_as_text
+
+# Rows converted and written at a time
+CHUNK_SIZE = 50000
+
+FORMATS = {
+    "CSV": {"suffix": ".csv", "mime": "text/csv"},
+    "Excel": {"suffix": ".xlsx", "mime": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"},
+    "Parquet": {"suffix": ".parquet", "mime": "application/vnd.apache.parquet"},
+}
+
+
+# Parquet export needs pyarrow (listed in requirements.txt, which the
+# attendance archive needs too); the format is not offered without it
+def parquet_available():
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def available_formats():
+    return [name for name in FORMATS if name != "Parquet" or parquet_available()]
+
+
+# Function to write CSV in chunks, converting typed columns back to sheet text
+def export_csv(df, path, chunk_size=CHUNK_SIZE):
+    with open(path, "w", newline="", encoding="utf-8") as output:
+        if df.empty:
+            df.to_csv(output, index=False)
+        for start in range(0, len(df), chunk_size):
+            chunk = attendance_as_text(df.iloc[start:start + chunk_size])
+            chunk.to_csv(output, index=False, header=start == 0)
+
+
+# Function to write XLSX with xlsxwriter's constant-memory mode, which flushes
+# each row to disk once the next one is started
+def export_excel(df, path, chunk_size=CHUNK_SIZE, sheet_name="Attendance"):
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+    worksheet = workbook.add_worksheet(sheet_name)
+    worksheet.write_row(0, 0, [str(column) for column in df.columns])
+    row_number = 1
+    for start in range(0, len(df), chunk_size):
+        chunk = attendance_as_text(df.iloc[start:start + chunk_size]).astype(object)
+        chunk = chunk.where(chunk.notna(), "")
+        for row in chunk.itertuples(index=False):
+            worksheet.write_row(row_number, 0, [str(value) for value in row])
+            row_number += 1
+    workbook.close()
+
+
+# Function to write Parquet, keeping the typed columns (dates, categoricals)
+def export_parquet(df, path):
+    df.to_parquet(path, index=False)
+
+
+EXPORTERS = {"CSV": export_csv, "Excel": export_excel, "Parquet": export_parquet}
+
+
+# Function to export a frame to a new temporary file; returns its path.
+# The caller serves the download from the file and removes it (remove_file)
+# once it is replaced, so sessions do not hold the export in memory.
+def export_to_file(df, format_name):
+    fd, path = tempfile.mkstemp(prefix="attendance_export_", suffix=FORMATS[format_name]["suffix"])
+    os.close(fd)
+    try:
+        EXPORTERS[format_name](df, path)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+# Function to remove a temporary export or report file, if it still exists
+def remove_file(path):
+    if path is not None and os.path.exists(path):
+        os.remove(path)
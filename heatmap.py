@@ -0,0 +1,71 @@
+import threading
+import pandas as pd
+from report_filters import get_filter_engine
+
+# Sign-in statuses that count as present at work
+PRESENT_STATUSES = ["Early", "Late(On Official Duty)", "Tardy(Late Arrival)", "Site Work", "Work from Home"]
+NO_RECORD = "No Record"
+
+
+# Function to build the heatmap grid of one month as a long frame with one
+# row per (employee or department, day) of the calendar month.
+# by="Employee": the sign-in status of each employee per day ("No Record" if none).
+# by="Department": the number of employees present per department per day.
+def build_month_grid(month_rows, month, by="Employee"):
+    days = pd.RangeIndex(1, month.days_in_month + 1, name="Day")
+    day = month_rows["Date"].dt.day
+
+    if by == "Employee":
+        labels = month_rows["Employee ID"].astype(str) + " - " + month_rows["Employee Name"].astype(str)
+        cells = pd.DataFrame({by: labels, "Day": day, "Status": month_rows["Attendance Status In"].astype(str)})
+        wide = cells.drop_duplicates([by, "Day"], keep="last").pivot(index=by, columns="Day", values="Status")
+        wide = wide.reindex(columns=days).fillna(NO_RECORD)
+        value_name = "Status"
+    else:
+        present = month_rows[month_rows["Attendance Status In"].isin(PRESENT_STATUSES)]
+        cells = pd.DataFrame({
+            by: present["Department"].astype(str), "Day": present["Date"].dt.day,
+            "Employee ID": present["Employee ID"].astype(str),
+        })
+        wide = cells.groupby([by, "Day"])["Employee ID"].nunique().unstack("Day")
+        wide = wide.reindex(columns=days).fillna(0).astype(int)
+        value_name = "Present"
+
+    grid = wide.reset_index().melt(id_vars=by, var_name="Day", value_name=value_name)
+    grid["Date"] = month.start_time + pd.to_timedelta(grid["Day"].astype(int) - 1, unit="D")
+    return grid
+
+
+# Per-month heatmap grids. A grid for a past month is kept until the
+# attendance data is reloaded from scratch; the current month's grid is
+# also rebuilt when rows have been added.
+class HeatmapCache:
+
+    def __init__(self):
+        self.grids = {}
+        self.lock = threading.Lock()
+
+    def get(self, attendance_df, month, by, generation):
+        current_month = month == pd.Timestamp.today().to_period("M")
+        version = (generation, len(attendance_df)) if current_month else generation
+        key = (month, by)
+        with self.lock:
+            cached = self.grids.get(key)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+
+        month_rows = get_filter_engine(attendance_df).filter(month.start_time, month.end_time.normalize())
+        grid = build_month_grid(month_rows, month, by)
+        with self.lock:
+            self.grids[key] = (version, grid)
+        return grid
+
+    # Function to get the grids of several months as one frame
+    def get_range(self, attendance_df, months, by, generation):
+        grids = [self.get(attendance_df, month, by, generation) for month in months]
+        return pd.concat(grids, ignore_index=True) if grids else build_month_grid(
+            attendance_df.iloc[:0], pd.Timestamp.today().to_period("M"), by
+        )
+
+
+heatmap_cache = HeatmapCache()
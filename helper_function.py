@@ -1,25 +1,50 @@
 import streamlit as st
-from data_ingestion import data_ingestion
-import time 
-import altair as alt
+from data_ingestion import (
+    snapshot_cache, employee_snapshot, attendance_rollup, attendance_history, attendance_date_range
+)
+from archive import ArchiveConflictError, site_archive
+from heatmap import heatmap_cache
+from worked_hours import FREQUENCIES as WORK_FREQUENCIES, load_work_hours, save_work_hours, worked_hours_engine
+from employee_search import get_search_index
+from report_filters import get_filter_engine
+from report_worker import (
+    REPORT_KINDS, STATUS_OPTIONS, fingerprint, kind_statuses, report_artifacts, report_subtitle
+)
+from export import FORMATS as EXPORT_FORMATS, available_formats, export_to_file, remove_file
+from metrics import metrics
+from notifications import EVENTS as NOTIFY_EVENTS, load_settings as load_notify_settings, save_settings as save_notify_settings
+from config import EMPLOYEE_COLUMNS, EMPLOYEE_SHEET, SITES
+from schema import SITE_COLUMN
+from storage import get_storage
+from employee_writes import EmployeeConflictError, EmployeeWriter, read_versions
 import pandas as pd 
-import matplotlib.pyplot as plt
-import seaborn as sns
-import io
-import base64
-from fpdf import FPDF
+
+# Sidebar filter for one site in multi-site mode; returns None for all sites
+def select_site():
+    if not SITES:
+        return None
+    site = st.sidebar.selectbox("Site", ["All Sites"] + list(SITES))
+    return None if site == "All Sites" else site
 
 def show_overview():
+    # Charting libraries are imported by the pages that draw charts, not on every rerun
+    import altair as alt
+
     st.title("Overview")
 
-    employee_df, attendance_df = data_ingestion()
+    # Metrics and charts read the maintained daily rollup, not the raw rows
+    site = select_site()
+    employee_df = employee_snapshot()
+    if site is not None:
+        employee_df = employee_df[employee_df[SITE_COLUMN] == site]
+    rollup = attendance_rollup(site)
 
     # Calculate metrics
     total_employees = len(employee_df)
-    present_today = sum(attendance_df['Date'] == time.strftime("%Y-%m-%d"))
+    present_today = rollup.count(date=pd.Timestamp.today().normalize())
     absent_today = total_employees - present_today
-    late_arrivals = sum(attendance_df['Attendance Status In'] == "Tardy(Late Arrival)")
-    early_arrivals = sum(attendance_df['Attendance Status In'] == 'Early')
+    late_arrivals = rollup.count(status="Tardy(Late Arrival)")
+    early_arrivals = rollup.count(status='Early')
 
     col1, col2, col3, col4, col5 = st.columns(5)
     col1.metric("Total Employees", total_employees)
@@ -30,8 +55,7 @@ def show_overview():
 
     # Attendance Trends
     st.subheader("Attendance Trends Over Time")
-    attendance_df['Date'] = pd.to_datetime(attendance_df['Date'])
-    attendance_trends = attendance_df.groupby('Date').size().reset_index(name='Total Present')
+    attendance_trends = rollup.by_date(name='Total Present')
     attendance_trend_chart = alt.Chart(attendance_trends).mark_line().encode(
         x='Date:T',
         y='Total Present:Q'
@@ -40,7 +64,7 @@ def show_overview():
 
     # Department-wise Attendance
     st.subheader("Department-wise Attendance")
-    dept_attendance = attendance_df.groupby('Department').size().reset_index(name='Attendance Count')
+    dept_attendance = rollup.by_department(name='Attendance Count')
     dept_chart = alt.Chart(dept_attendance).mark_bar().encode(
         x='Department:N',
         y='Attendance Count:Q',
@@ -49,129 +73,240 @@ def show_overview():
     st.altair_chart(dept_chart, use_container_width=True)
 
     st.subheader("Monthly Attendance Heatmap")
+    months = sorted(rollup.by_date()['Date'].dt.to_period('M').unique())
+    if not months:
+        st.info("No attendance records yet.")
+        return
+    heatmap_by = st.radio("Heatmap Rows", ["Department", "Employee"], horizontal=True)
+    first_month, last_month = st.select_slider(
+        "Months", options=months, value=(months[-1], months[-1]), format_func=lambda month: month.strftime('%b %Y')
+    )
+    selected_months = [month for month in months if first_month <= month <= last_month]
+    # Only the archived months in the selected range are read
+    history, generation = attendance_history(first_month.start_time, last_month.end_time, site)
+    heatmap = heatmap_cache.get_range(history, selected_months, heatmap_by, (generation, site))
+
+    if heatmap_by == "Employee":
+        color = alt.Color('Status:N', scale=alt.Scale(scheme='tableau10'))
+        tooltip = ['Employee:N', 'Date:T', 'Status:N']
+    else:
+        color = alt.Color('Present:Q', scale=alt.Scale(scheme='greens'))
+        tooltip = ['Department:N', 'Date:T', 'Present:Q']
+    heatmap_chart = alt.Chart(heatmap).mark_rect().encode(
+        x=alt.X('yearmonthdate(Date):O', title='Day'),
+        y=alt.Y(f'{heatmap_by}:N', title=heatmap_by),
+        color=color,
+        tooltip=tooltip
+    ).properties(height=max(200, 14 * heatmap[heatmap_by].nunique()))
+    st.altair_chart(heatmap_chart, use_container_width=True)
 
 
-def detailed_reports(attendance_df):
-    st.title("Detailed Attendance Reports")
+def detailed_reports():
+    from pdf_report import submit_pdf_report
 
-    # Ensure the 'Date' column is in datetime format
-    attendance_df['Date'] = pd.to_datetime(attendance_df['Date'], errors='coerce')
+    st.title("Detailed Attendance Reports")
 
     # Filters
     st.sidebar.subheader("Filters")
     
+    site = select_site()
+
     # Date Range Filter
-    start_date = st.sidebar.date_input("Start Date", value=pd.to_datetime(attendance_df['Date']).min())
-    end_date = st.sidebar.date_input("End Date", value=pd.to_datetime(attendance_df['Date']).max())
+    first_date, last_date = attendance_date_range()
+    start_date = st.sidebar.date_input("Start Date", value=first_date)
+    end_date = st.sidebar.date_input("End Date", value=last_date)
+
+    # Live rows plus the archived months in the date range, and the filter
+    # engine for them (sorted by date, memoized results)
+    attendance_df, _ = attendance_history(start_date, end_date, site)
+    engine = get_filter_engine(attendance_df)
     
     # Department Filter
-    departments = attendance_df['Department'].unique().tolist()
+    departments = engine.values('Department')
     selected_department = st.sidebar.multiselect("Select Department", options=departments, default=departments)
     
     # Attendance Status Filter
-    status_options = ['Early', 'Leave', "Holiday", "Work from Home", "Site Work", 
-                      'Late(On Official Duty)', "Tardy(Late Arrival)"]
+    status_options = STATUS_OPTIONS
     selected_status = st.sidebar.multiselect("Select Attendance Status", options=status_options, default=status_options)
     
     # Filtering data based on selections
-    filtered_df = attendance_df[
-        (attendance_df['Date'] >= pd.to_datetime(start_date)) &
-        (attendance_df['Date'] <= pd.to_datetime(end_date)) &
-        (attendance_df['Department'].isin(selected_department)) &
-        (attendance_df['Attendance Status In'].isin(selected_status))
-    ]
+    filtered_df = engine.filter(start_date, end_date, selected_department, selected_status)
 
     # Reports
     st.subheader("Employee Attendance Report")
     
     # Displaying the filtered DataFrame
     st.dataframe(filtered_df)
+    # Fingerprint of the rows, to find reports pre-rendered by the report worker
+    source = fingerprint(filtered_df) if report_artifacts.entries() else None
     
     # Late Comers & Early Leavers
     st.subheader("Late Comers & Early Leavers Report")
-    late_early_df = filtered_df[(filtered_df['Attendance Status In'] == 'Tardy(Late Arrival)') | (filtered_df['Attendance Status In'] == 'Left Early')]
+    late_early_status = kind_statuses("late_early", selected_status)
+    late_early_df = engine.filter(start_date, end_date, selected_department, late_early_status)
     st.dataframe(late_early_df)
+    prerendered_downloads(late_early_df, "late_early", start_date, end_date)
 
     # Absenteeism Report
     st.subheader("Absenteeism Report")
-    absenteeism_df = filtered_df[filtered_df['Attendance Status In'] == 'Site Work']
+    absenteeism_status = kind_statuses("absenteeism", selected_status)
+    absenteeism_df = engine.filter(start_date, end_date, selected_department, absenteeism_status)
     st.dataframe(absenteeism_df)
+    prerendered_downloads(absenteeism_df, "absenteeism", start_date, end_date)
+
+    # Worked Hours & Overtime (per employee, from In/Out-Time and the break)
+    st.subheader("Worked Hours & Overtime")
+    hours_frequency = st.radio("Summarize by", list(WORK_FREQUENCIES), index=1, horizontal=True)
+    worked_hours_engine.set_hours(*load_work_hours())
+    worked_hours_engine.update(attendance_df)
+    worked_hours_df = worked_hours_engine.summary(hours_frequency, start_date, end_date)
+    st.dataframe(worked_hours_df[worked_hours_df['Department'].isin(selected_department)])
 
     # Export Options
     st.subheader("Export Options")
     
-    # CSV/Excel Export
-    def convert_df_to_csv(df):
-        return df.to_csv(index=False).encode('utf-8')
-    
-    csv = convert_df_to_csv(filtered_df)
-     
-    st.download_button(
-        label="Export to CSV",
-        data=csv,
-        file_name='filtered_attendance.csv',
-        mime='text/csv',
-    )
-
-    # def convert_df_to_excel(df):
-    #     output = io.BytesIO()
-    #     with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-    #         df.to_excel(writer, index=False, sheet_name='Sheet1')
-    #         writer.save()
-    #     processed_data = output.getvalue()
-    #     return processed_data
-    
-    # excel = convert_df_to_excel(filtered_df)
-    
-    # st.download_button(
-    #     label="Export to Excel",
-    #     data=excel,
-    #     file_name='filtered_attendance.xlsx',
-    #     mime='application/vnd.ms-excel',
-    # )
+    # CSV/Excel/Parquet Export, written in chunks to a temporary file
+    export_format = st.selectbox("Export Format", available_formats())
+    export_key = (str(start_date), str(end_date), tuple(selected_department), tuple(selected_status), export_format)
+
+    # A pre-rendered file of the same rows is served as is
+    prerendered_export = report_artifacts.find(source, export_format)
+    if prerendered_export is not None:
+        download_artifact(
+            prerendered_export, f"Download {export_format}",
+            'filtered_attendance' + EXPORT_FORMATS[export_format]['suffix'], EXPORT_FORMATS[export_format]['mime']
+        )
+    elif st.button("Prepare Export"):
+        # Only the file's path is kept in the session; the file it replaces is removed
+        previous_export = st.session_state.pop('export', None)
+        if previous_export is not None:
+            remove_file(previous_export['path'])
+        with st.spinner(f"Writing {export_format} file..."):
+            st.session_state['export'] = {'key': export_key, 'path': export_to_file(filtered_df, export_format)}
+
+    prepared_export = st.session_state.get('export')
+    if prerendered_export is None and prepared_export is not None and prepared_export['key'] == export_key:
+        with open(prepared_export['path'], 'rb') as export_file:
+            st.download_button(
+                label=f"Download {export_format}",
+                data=export_file,
+                file_name='filtered_attendance' + EXPORT_FORMATS[export_format]['suffix'],
+                mime=EXPORT_FORMATS[export_format]['mime'],
+            )
 
     # PDF Report Generation
     st.subheader("Generate PDF Report")
     
-    def generate_pdf_report(df):
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", size=12)
-        
-        # Adding title
-        pdf.cell(200, 10, txt="Attendance Report", ln=True, align='C')
-        
-        # Adding data
-        for i, row in df.iterrows():
-            pdf.cell(200, 10, txt=str(row.values), ln=True)
-        
-        return pdf.output(dest='S').encode('latin1')
-    
-    if st.button("Generate PDF"):
-        pdf = generate_pdf_report(filtered_df)
-        
-        b64 = base64.b64encode(pdf).decode()
-        href = f'<a href="data:application/octet-stream;base64,{b64}" download="attendance_report.pdf">Download PDF Report</a>'
-        st.markdown(href, unsafe_allow_html=True)
-
-# Helper function to add a new employee
-def add_employee(df, new_employee):
-    # Convert the new employee dictionary to a DataFrame and concatenate it
-    new_employee_df = pd.DataFrame([new_employee])
-    return pd.concat([df, new_employee_df], ignore_index=True)
-
-# Helper function to remove an employee by ID
-def remove_employee(df, employee_id):
-    return df[df['Employee ID'] != employee_id]
-
-# Helper function to edit an employee's information
-def edit_employee(df, employee_id, updated_info):
-    df.loc[df['Employee ID'] == employee_id, list(updated_info.keys())] = list(updated_info.values())
-    return df
+    # A pre-rendered report of the same rows is served as is; otherwise the
+    # report is rendered in a background thread into a temporary file
+    pdf_subtitle = report_subtitle(start_date, end_date, len(filtered_df))
+    prerendered_pdf = report_artifacts.find(source, "PDF", subtitle=pdf_subtitle)
+    if prerendered_pdf is not None:
+        download_artifact(prerendered_pdf, "Download PDF Report", 'attendance_report.pdf', 'application/pdf')
+    elif st.button("Generate PDF"):
+        previous_job = st.session_state.get('pdf_job')
+        if previous_job is not None:
+            # The replaced report's file is removed, now or once it is finished
+            previous_job.add_done_callback(lambda job: job.exception() is None and remove_file(job.result()))
+        st.session_state['pdf_job'] = submit_pdf_report(filtered_df, subtitle=pdf_subtitle)
+
+    pdf_job = st.session_state.get('pdf_job')
+    if pdf_job is not None and prerendered_pdf is None:
+        if not pdf_job.done():
+            pdf_job_progress()
+        elif pdf_job.exception():
+            st.error(f"PDF report failed: {pdf_job.exception()}")
+        else:
+            with open(pdf_job.result(), 'rb') as pdf_file:
+                st.download_button(
+                    label="Download PDF Report",
+                    data=pdf_file,
+                    file_name='attendance_report.pdf',
+                    mime='application/pdf',
+                )
+
+# Status of the PDF report rendering in the background. Only this fragment
+# reruns while the report renders; once it is done, one full rerun shows the
+# download with the rest of the page and stops the polling.
+@st.fragment(run_every=1)
+def pdf_job_progress():
+    pdf_job = st.session_state.get('pdf_job')
+    if pdf_job is None or pdf_job.done():
+        st.rerun()
+    st.info("Generating PDF report...")
+
+# Function to offer a pre-rendered report file for download
+def download_artifact(entry, label, file_name, mime):
+    st.caption(f"Pre-rendered at {entry['rendered_at']}")
+    with open(entry['path'], 'rb') as artifact:
+        st.download_button(label=label, data=artifact, file_name=file_name, mime=mime, key=entry['path'])
+
+# Function to offer the pre-rendered files of a report, if the report worker has rendered these rows
+def prerendered_downloads(df, kind, start_date, end_date):
+    if not report_artifacts.entries():
+        return
+    source = fingerprint(df)
+    title = REPORT_KINDS[kind][0]
+    for format_name, suffix, mime in [("CSV", ".csv", "text/csv"), ("PDF", ".pdf", "application/pdf")]:
+        subtitle = report_subtitle(start_date, end_date, len(df))
+        entry = report_artifacts.find(source, format_name, title, subtitle)
+        if entry is not None:
+            download_artifact(entry, f"Download {format_name}", f"{kind}_report{suffix}", mime)
+
+# Function to split employee versions by the site whose sheet holds them
+def versions_by_site(versions):
+    by_site = {}
+    for employee_id, version in versions.items():
+        by_site.setdefault(version.get("site"), {})[employee_id] = version
+    return by_site
+
+# Helper function to add a new employee to a site's sheet (the default sheet when site is None)
+def add_employee(new_employee, site=None):
+    return EmployeeWriter(get_storage(site=site)).add_employees([new_employee])
+
+# Helper function to remove employees by their versions as loaded
+def remove_employee(versions):
+    for site, site_versions in versions_by_site(versions).items():
+        EmployeeWriter(get_storage(site=site)).remove_employees(site_versions)
+
+# Helper function to edit employees' information; only the changed cells are
+# written, with one batched update per site
+def edit_employee(versions, changes):
+    unknown = [employee_id for employee_id in changes if employee_id not in versions]
+    if unknown:
+        raise ValueError(f"Unknown Employee IDs: {', '.join(unknown)}")
+    cells = 0
+    for site, site_versions in versions_by_site(versions).items():
+        site_changes = {employee_id: fields for employee_id, fields in changes.items() if employee_id in site_versions}
+        if site_changes:
+            cells += EmployeeWriter(get_storage(site=site)).update_employees(site_versions, site_changes)
+    return cells
+
+# Function to get the versions of employees in the snapshot the page shows,
+# so edits are checked against what the admin was looking at. Versions are
+# read again from every new snapshot (after a write or once it was stale).
+def loaded_versions(snapshot, employee_ids):
+    loaded = st.session_state.get('employee_versions')
+    if loaded is None or loaded['snapshot'] is not snapshot:
+        loaded = st.session_state['employee_versions'] = {'snapshot': snapshot, 'versions': {}}
+    versions = loaded['versions']
+    missing = [employee_id for employee_id in employee_ids if employee_id not in versions]
+    if missing:
+        versions.update(read_versions(snapshot, missing))
+    return {employee_id: versions[employee_id] for employee_id in employee_ids if employee_id in versions}
+
+# Function to reload the employee snapshot after a write or a conflict and
+# load the versions of the given employees from it; returns the new snapshot
+def refresh_versions(employee_ids):
+    snapshot_cache.invalidate(EMPLOYEE_SHEET)
+    snapshot = employee_snapshot()
+    loaded_versions(snapshot, employee_ids)
+    return snapshot
 
  # Employee Management Layout
 def employee_management():
-    employee_df, _ = data_ingestion()
+    snapshot = employee_snapshot()
+    employee_df = snapshot.copy()
     
     st.title("Employee Management")
 
@@ -179,22 +314,38 @@ def employee_management():
     st.subheader("Search & Filter Employees")
     search_term = st.text_input("Search by Employee ID, Name, or Department")
     
-    # Apply filter to the employee data
+    # Apply filter to the employee data (substring match on ID, name, department,
+    # supervisor and job title; the index is rebuilt only when the data changes)
     if search_term:
-        filtered_data = employee_df[
-            employee_df.apply(lambda row: search_term.lower() in row.astype(str).str.lower().values, axis=1)
-        ]
+        filtered_data = employee_df.iloc[get_search_index(snapshot).search(search_term)]
     else:
         filtered_data = employee_df
     
-    # Display filtered data
-    st.dataframe(filtered_data)
+    # Display filtered data; cells can be edited and saved for many employees at once
+    edited_data = st.data_editor(filtered_data, disabled=['Employee ID', SITE_COLUMN], key='employee_table')
+    table_versions = loaded_versions(snapshot, filtered_data['Employee ID'].astype(str).tolist())
+    if st.button("Save Table Edits"):
+        changed = edited_data.astype(str).ne(filtered_data.astype(str))
+        changes = {}
+        for position in changed.index[changed.any(axis=1)]:
+            columns = changed.columns[changed.loc[position]]
+            changes[str(filtered_data.at[position, 'Employee ID'])] = edited_data.loc[position, columns].to_dict()
+        try:
+            cells = edit_employee(table_versions, changes)
+            refresh_versions(list(changes))
+            st.success(f"Saved {cells} changed cells for {len(changes)} employees.")
+        except EmployeeConflictError as error:
+            refresh_versions(error.employee_ids)
+            st.error(str(error))
+        except ValueError as error:
+            st.error(str(error))
 
 #     # Edit Employee Info
     st.subheader("Edit Employee Info")
     if not filtered_data.empty:
         edit_id = st.selectbox("Select Employee ID to Edit", filtered_data['Employee ID'].unique())
-        employee_to_edit = filtered_data[filtered_data['Employee ID'] == edit_id].iloc[0]
+        version = loaded_versions(snapshot, [str(edit_id)]).get(str(edit_id))
+        employee_to_edit = dict(zip(EMPLOYEE_COLUMNS, version['values']))
         st.write(f"Editing Employee: {employee_to_edit['Employee Name']}")
 
         employee_name = st.text_input("Employee Name", value=employee_to_edit['Employee Name'])
@@ -211,7 +362,7 @@ def employee_management():
             updated_info = {
                 'Employee Name': employee_name,
                 "Phone Number": phone_number,
-                "Email Address": email_address,
+                "E-mail Address": email_address,
                 'Department': department,
                 'Job Title': job_title,
                 "Joining Date": joining_date,
@@ -220,9 +371,14 @@ def employee_management():
                 "Address": Address
                        }
     
-            employee_data = edit_employee(employee_data, edit_id, updated_info)
-            st.success(f"Updated Employee: {edit_id}")
-            st.rerun()
+            try:
+                edit_employee({str(edit_id): version}, {str(edit_id): updated_info})
+                refresh_versions([str(edit_id)])
+                st.success(f"Updated Employee: {edit_id}")
+                st.rerun()
+            except EmployeeConflictError as error:
+                refresh_versions([str(edit_id)])
+                st.error(str(error))
     else:
         st.warning("No employees found for the search criteria.")
 
@@ -239,67 +395,109 @@ def employee_management():
         new_shift_days = st.text_input("Shift Days")
         new_supervisor_name = st.text_input("Supervisor Name")
         new_address = st.text_area("Address")
+        new_site = st.selectbox("Site", list(SITES)) if SITES else None
 
         if st.form_submit_button("Add Employee"):
             if not new_employee_id or not new_name:
                 st.error("Employee ID and Name are required fields.")
+            elif new_site and new_employee_id.strip() in set(snapshot['Employee ID'].astype(str)):
+                # Each site's sheet only checks its own IDs, and IDs must be unique across sites
+                st.error(f"Employee ID already exists: {new_employee_id.strip()}")
             else:
                 new_employee = {
-                    'Employee ID': new_employee_id,
-                    'Name': new_name,
+                    'Employee ID': new_employee_id.strip(),
+                    'Employee Name': new_name,
                     'Phone Number': new_phone_number,
                     'E-mail Address': new_email,
                     'Job Title': new_job_title,
                     'Department': new_department,
-                    'Joining Date': new_joining_date,
+                    'Joining Date': new_joining_date.strftime('%Y-%m-%d'),
                     'Shift Days': new_shift_days,
                     'Supervisor Name': new_supervisor_name,
                     'Address': new_address
                 }
         
-                employee_data = add_employee(employee_df, new_employee)
-                st.success(f"Added New Employee: {new_name}")
-                st.rerun()
+                try:
+                    add_employee(new_employee, new_site)
+                    refresh_versions([new_employee['Employee ID']])
+                    st.success(f"Added New Employee: {new_name}")
+                    st.rerun()
+                except ValueError as error:
+                    st.error(str(error))
 
     # Remove Employee
     st.subheader("Remove Employee")
-    employee_df, _ = data_ingestion()
-    remove_id = st.selectbox("Select Employee ID to Remove", employee_df['Employee ID'].unique())
-
-# # A checkbox as a confirmation dialog replacement
-    if st.button("Remove Employee"):
-        if st.checkbox("Are you sure you want to remove this employee?"):
-            employee_data = remove_employee(employee_df, remove_id)
-            st.success(f"Removed Employee: {remove_id}")
-            st.experimental_rerun()
+    remove_ids = st.multiselect("Select Employee IDs to Remove", employee_df['Employee ID'].unique())
+
+    # A checkbox as a confirmation dialog replacement
+    confirm_remove = st.checkbox("Are you sure you want to remove the selected employees?")
+    if st.button("Remove Employee", disabled=not (remove_ids and confirm_remove)):
+        remove_ids = [str(employee_id) for employee_id in remove_ids]
+        try:
+            remove_employee(read_versions(snapshot, remove_ids))
+            # Rows below the removed ones have moved up
+            refresh_versions([])
+            st.success(f"Removed Employee: {', '.join(remove_ids)}")
+            st.rerun()
+        except EmployeeConflictError as error:
+            refresh_versions([])
+            st.error(str(error))
 
 import streamlit as st
 
 def settings():
     st.title("Settings")
 
-    # Notification Settings
+    # Notification Settings (saved to a file the notification worker reads on every run)
     st.subheader("Notification Settings")
-    email_notifications = st.checkbox("Enable Email Notifications")
-    sms_notifications = st.checkbox("Enable SMS Notifications")
+    notify_settings = load_notify_settings()
+    email_notifications = st.checkbox("Enable Email Notifications", value=notify_settings["email_enabled"])
+    sms_notifications = st.checkbox("Enable SMS Notifications", value=notify_settings["sms_enabled"])
 
+    notification_email = notify_settings["email"]
+    notification_phone = notify_settings["phone"]
     if email_notifications:
-        st.text_input("Enter Email for Notifications", placeholder="admin@example.com")
+        notification_email = st.text_input(
+            "Enter Email for Notifications", value=notification_email, placeholder="admin@example.com"
+        )
     if sms_notifications:
-        st.text_input("Enter Phone Number for SMS Notifications", placeholder="+1234567890")
+        notification_phone = st.text_input(
+            "Enter Phone Number for SMS Notifications", value=notification_phone, placeholder="+1234567890"
+        )
     
     notification_events = st.multiselect(
         "Select Events for Notifications",
-        ["Late Arrival", "Early Leave", "Absenteeism", "Daily Summary"],
-        default=["Late Arrival", "Early Leave"]
+        NOTIFY_EVENTS,
+        default=[event for event in notify_settings["events"] if event in NOTIFY_EVENTS]
+    )
+    absence_cutoff = st.time_input(
+        "Report Absences At", value=pd.to_datetime(notify_settings["absence_cutoff"]).time()
     )
+    summary_time = st.time_input("Send Daily Summary At", value=pd.to_datetime(notify_settings["summary_time"]).time())
+    if st.button("Save Notification Settings"):
+        save_notify_settings({
+            "email_enabled": email_notifications,
+            "email": notification_email.strip(),
+            "sms_enabled": sms_notifications,
+            "phone": notification_phone.strip(),
+            "events": notification_events,
+            "absence_cutoff": absence_cutoff.strftime("%H:%M"),
+            "summary_time": summary_time.strftime("%H:%M"),
+        })
+        st.success("Notification settings saved.")
     
-    # Working Hours
+    # Working Hours (saved to a file the worked-hours report reads; breaks
+    # are taken from the recorded Break Start/End of each row)
     st.subheader("Working Hours")
-    working_hours_start = st.time_input("Start Time", value=pd.to_datetime("09:00:00").time())
-    working_hours_end = st.time_input("End Time", value=pd.to_datetime("17:00:00").time())
-    break_start = st.time_input("Break Start Time", value=pd.to_datetime("12:00:00").time())
-    break_end = st.time_input("Break End Time", value=pd.to_datetime("13:00:00").time())
+    work_start, work_end = load_work_hours()
+    working_hours_start = st.time_input("Start Time", value=pd.to_datetime(work_start).time())
+    working_hours_end = st.time_input("End Time", value=pd.to_datetime(work_end).time())
+    if st.button("Save Working Hours"):
+        if working_hours_end <= working_hours_start:
+            st.error("End Time must be after Start Time.")
+        else:
+            save_work_hours(working_hours_start.strftime("%H:%M"), working_hours_end.strftime("%H:%M"))
+            st.success("Working hours saved.")
     
     # Permissions Management
     st.subheader("Permissions")
@@ -316,6 +514,68 @@ def settings():
     st.write(f"Permissions for {selected_role}:")
     st.write(", ".join(permissions[selected_role]))
 
+    # Data Cache
+    st.subheader("Data Cache")
+    cache_stats = snapshot_cache.stats()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Cached Sheets", cache_stats["entries"])
+    col2.metric("Cache Size (MB)", f"{cache_stats['bytes'] / (1024 * 1024):.1f}")
+    col3.metric("Hit Rate", f"{cache_stats['hit_rate']:.0%}")
+    col4.metric("Evictions", cache_stats["evictions"])
+    if st.button("Refresh Data Now"):
+        snapshot_cache.invalidate()
+        st.success("Cached data cleared. The next page load downloads fresh data.")
+
+    # Attendance Archive (closed months moved out of the live sheet, per site)
+    st.subheader("Attendance Archive")
+    archives = [site_archive(site) for site in (list(SITES) or [None])]
+    archived_months = sorted({month for archive in archives for month in archive.months()})
+    col1, col2 = st.columns(2)
+    col1.metric("Archived Months", len(archived_months))
+    col2.metric("Archived Rows", sum(int(archive.counts().sum()) for archive in archives))
+    if archived_months:
+        st.caption(f"Archive covers {archived_months[0].strftime('%b %Y')} to {archived_months[-1].strftime('%b %Y')}.")
+    if st.button("Archive Closed Months Now"):
+        with st.spinner("Moving closed months to the archive..."):
+            moved = {}
+            try:
+                for archive in archives:
+                    for month, rows in archive.rollover(get_storage(site=archive.site)).items():
+                        moved[f"{archive.site} {month}" if archive.site else month] = rows
+            except ArchiveConflictError as error:
+                st.error(f"{error}. Try again.")
+        if moved:
+            st.success("Archived " + ", ".join(f"{month}: {rows} rows" for month, rows in moved.items()))
+        else:
+            st.info("No closed months to archive.")
+
+    # Performance & API Usage (this process only, since it started or was reset)
+    st.subheader("Performance & API Usage")
+    metric_rows = pd.DataFrame(metrics.summary())
+    if metric_rows.empty:
+        st.info("No calls recorded yet.")
+    else:
+        storage_rows = metric_rows[metric_rows['name'].str.startswith('storage.')]
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Storage Calls (last min)", int(storage_rows['last_min_calls'].sum()))
+        col2.metric("Storage Calls / min", f"{storage_rows['calls_per_min'].sum():.1f}")
+        col3.metric("Data Transferred (MB)", f"{storage_rows['bytes'].sum() / (1024 * 1024):.1f}")
+        st.dataframe(metric_rows.rename(columns={
+            'name': 'Metric', 'label': 'Table / Page', 'calls': 'Calls', 'errors': 'Errors', 'bytes': 'Bytes',
+            'calls_per_min': 'Calls / min', 'last_min_calls': 'Calls (last min)', 'p50_ms': 'p50 (ms)',
+            'p95_ms': 'p95 (ms)', 'window_bytes': 'Bytes (window)',
+        }))
+        st.write("Storage calls by page or action:")
+        st.dataframe(pd.DataFrame(metrics.by_context()).rename(columns={
+            'context': 'Page / Action', 'name': 'Call', 'calls': 'Calls', 'seconds': 'Seconds', 'bytes': 'Bytes',
+        }))
+        col1, col2, col3 = st.columns(3)
+        col1.download_button("Download JSON", metrics.to_json(), file_name='metrics.json', mime='application/json')
+        col2.download_button("Download Prometheus", metrics.to_prometheus(), file_name='metrics.prom', mime='text/plain')
+        if col3.button("Reset Metrics"):
+            metrics.reset()
+            st.rerun()
+
     if st.button("Save Settings"):
         st.success("Settings updated successfully!")
 
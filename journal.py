@@ -0,0 +1,295 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime
+import config
+from metrics import timed
+from session_index import SessionIndex, OUT_TIME_COL, STATUS_OUT_COL
+from write_batcher import WriteBatcher
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+SYNCED = "synced"
+FAILED = "failed"
+
+
+# Durable local write-ahead journal for kiosk sign-ins and sign-outs.
+# Entries are committed to a local SQLite file (WAL, fsync on commit) before
+# the kiosk reports success, and a SyncWorker copies them to storage later.
+class Journal:
+
+    def __init__(self, path=config.JOURNAL_PATH):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS journal (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    op TEXT NOT NULL,
+                    employee_id TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT DEFAULT '',
+                    row_num INTEGER,
+                    created_at TEXT NOT NULL,
+                    synced_at TEXT
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_journal_status ON journal (status, id)")
+
+    # Function to record an operation; returns the journal entry id
+    def append(self, op, employee_id, date, payload):
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO journal (op, employee_id, date, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                (op, employee_id, date, json.dumps(payload), datetime.now().isoformat(timespec="seconds"))
+            )
+        return cursor.lastrowid
+
+    # Oldest pending entries first, so operations are replayed in order
+    def pending(self, limit=None):
+        query = "SELECT id, op, employee_id, date, payload, attempts FROM journal WHERE status = ? ORDER BY id"
+        params = [PENDING]
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+        return [
+            {"id": row[0], "op": row[1], "employee_id": row[2], "date": row[3],
+             "payload": json.loads(row[4]), "attempts": row[5]}
+            for row in rows
+        ]
+
+    def mark_synced(self, entry_id, row_num=None):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE journal SET status = ?, row_num = ?, synced_at = ? WHERE id = ?",
+                (SYNCED, row_num, datetime.now().isoformat(timespec="seconds"), entry_id)
+            )
+
+    # A failed attempt keeps the entry pending so it is retried
+    def mark_retry(self, entry_id, error):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE journal SET attempts = attempts + 1, last_error = ? WHERE id = ?", (str(error), entry_id)
+            )
+
+    # Entries that can never be applied (e.g. a sign-out without a sign-in)
+    def mark_failed(self, entry_id, error):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE journal SET status = ?, attempts = attempts + 1, last_error = ? WHERE id = ?",
+                (FAILED, str(error), entry_id)
+            )
+
+    # Function to report the sync status of the journal
+    def stats(self):
+        with self.lock:
+            counts = dict(self.conn.execute("SELECT status, COUNT(*) FROM journal GROUP BY status").fetchall())
+            oldest = self.conn.execute(
+                "SELECT MIN(created_at) FROM journal WHERE status = ?", (PENDING,)
+            ).fetchone()[0]
+            last_error = self.conn.execute(
+                "SELECT last_error FROM journal WHERE last_error != '' ORDER BY id DESC LIMIT 1"
+            ).fetchone()
+        return {
+            "pending": counts.get(PENDING, 0),
+            "synced": counts.get(SYNCED, 0),
+            "failed": counts.get(FAILED, 0),
+            "oldest_pending": oldest,
+            "last_error": last_error[0] if last_error else "",
+        }
+
+    # Function to apply pending entries to a session index, so that a rebuilt
+    # index still sees punches that have not reached storage yet
+    def replay(self, session_index, entries=None):
+        for entry in entries if entries is not None else self.pending():
+            if entry["op"] == "sign_in":
+                session_index.record_sign_in(entry["employee_id"], entry["date"], None)
+            elif entry["op"] == "sign_out":
+                session_index.record_sign_out(
+                    entry["employee_id"], entry["payload"]["out_time"], entry["payload"]["status"]
+                )
+
+    # Function to delete synced entries older than the given number of days
+    def prune(self, days=config.JOURNAL_KEEP_DAYS):
+        cutoff = datetime.fromtimestamp(time.time() - days * 86400).isoformat(timespec="seconds")
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM journal WHERE status = ? AND synced_at < ?", (SYNCED, cutoff))
+
+
+# Background worker that copies pending journal entries to storage.
+# Each batch is written with one append_rows and one batched cell update;
+# on an error the batch stops and is retried after an increasing delay.
+# Retries are idempotent: before re-applying a batch the worker rebuilds the
+# session index and skips work already done. The index is shared with the
+# kiosk when one is passed in, so storage is only read once for both.
+# After a successful flush, synced entries older than `keep_days` days are
+# deleted, at most once every `prune_interval` seconds.
+class SyncWorker(threading.Thread):
+
+    def __init__(self, journal, storage, interval=config.SYNC_INTERVAL, batch_size=config.SYNC_BATCH_SIZE,
+                 session_index=None, keep_days=config.JOURNAL_KEEP_DAYS,
+                 prune_interval=config.JOURNAL_PRUNE_INTERVAL):
+        super().__init__(daemon=True, name="journal-sync")
+        self.journal = journal
+        self.storage = storage
+        self.interval = interval
+        self.batch_size = batch_size
+        self.index = session_index or SessionIndex(storage, journal=journal)
+        self.keep_days = keep_days
+        self.prune_interval = prune_interval
+        self.last_prune = None
+        self.stop_event = threading.Event()
+        self.last_sync = None
+        self.last_error = ""
+
+    def run(self):
+        delay = self.interval
+        while not self.stop_event.is_set():
+            try:
+                synced = self.flush()
+                self.last_error = ""
+                delay = self.interval if synced < self.batch_size else 0
+            except Exception as error:
+                logger.warning("Journal sync failed: %s", error)
+                self.last_error = str(error)
+                delay = min(delay * 2 if delay else self.interval, 300)
+            self.stop_event.wait(delay)
+
+    def stop(self):
+        self.stop_event.set()
+
+    # Function to sync one batch; returns the number of entries processed
+    @timed("journal.flush")
+    def flush(self):
+        entries = self.journal.pending(self.batch_size)
+        if not entries:
+            self.prune()
+            return 0
+        if any(entry["attempts"] for entry in entries):
+            # A previous attempt may have reached storage before failing
+            self.index.rebuild()
+        else:
+            self.index.ensure_fresh()
+
+        # Split the batch where an employee signs in again after a sign-out in
+        # the same batch, so that the sign-out is resolved against the right row
+        segment = []
+        signed_out = set()
+        for entry in entries:
+            if entry["op"] == "sign_in" and entry["employee_id"] in signed_out:
+                self.flush_segment(segment)
+                segment, signed_out = [], set()
+            segment.append(entry)
+            if entry["op"] == "sign_out":
+                signed_out.add(entry["employee_id"])
+        self.flush_segment(segment)
+
+        self.last_sync = datetime.now()
+        self.prune()
+        return len(entries)
+
+    # Function to delete old synced entries unless that was done less than
+    # `prune_interval` seconds ago
+    def prune(self):
+        now = time.monotonic()
+        if self.last_prune is not None and now - self.last_prune < self.prune_interval:
+            return
+        self.journal.prune(self.keep_days)
+        self.last_prune = now
+
+    # Function to write a run of entries with one append_rows and one
+    # batched cell update request
+    def flush_segment(self, entries):
+        batcher = WriteBatcher(self.storage)
+
+        # Sign-ins: one append for every entry not already in storage
+        sign_ins = []
+        for entry in entries:
+            if entry["op"] != "sign_in":
+                continue
+            row_num = self.index.stored_row(entry["employee_id"], entry["date"])
+            if row_num is not None:
+                self.journal.mark_synced(entry["id"], row_num)
+            else:
+                batcher.append_row(config.ATTENDANCE_SHEET, entry["payload"]["row"])
+                sign_ins.append(entry)
+        self.write(batcher, sign_ins)
+
+        # Sign-outs: resolved to the open rows, which may have just been
+        # appended, all checked with one read
+        open_rows = self.resolve_open_rows(entries)
+        sign_outs = []
+        for entry in entries:
+            if entry["op"] == "sign_in":
+                continue
+            if entry["op"] != "sign_out":
+                self.journal.mark_failed(entry["id"], f"Unknown operation: {entry['op']}")
+                continue
+            # A second sign-out of the same session finds it already closed
+            row_num = open_rows.pop(entry["employee_id"], None)
+            if row_num is None:
+                if self.index.is_stored_signed_out(entry["employee_id"], entry["date"]):
+                    self.journal.mark_synced(entry["id"])
+                else:
+                    self.journal.mark_failed(entry["id"], "No open sign-in found")
+                continue
+            out_time, status = entry["payload"]["out_time"], entry["payload"]["status"]
+            batcher.update_cell(config.ATTENDANCE_SHEET, row_num, OUT_TIME_COL, out_time)
+            batcher.update_cell(config.ATTENDANCE_SHEET, row_num, STATUS_OUT_COL, status)
+            self.index.record_stored_sign_out(entry["employee_id"], out_time, status)
+            sign_outs.append((entry, row_num))
+        self.write(batcher, [entry for entry, _ in sign_outs])
+        for entry, row_num in sign_outs:
+            self.journal.mark_synced(entry["id"], row_num)
+
+    # Function to flush the batcher and mark the entries it carried; on an
+    # error every entry is kept pending for a retry
+    def write(self, batcher, entries):
+        if not entries:
+            return
+        try:
+            appended = batcher.flush()
+        except Exception as error:
+            for entry in entries:
+                self.journal.mark_retry(entry["id"], error)
+            raise
+        for entry, row_num in zip(entries, appended.get(config.ATTENDANCE_SHEET, [])):
+            self.index.record_stored_sign_in(entry["employee_id"], entry["date"], row_num)
+            self.journal.mark_synced(entry["id"], row_num)
+
+    # Function to find the open row of every employee signing out in the
+    # entries: {employee_id: row or None}
+    def resolve_open_rows(self, entries):
+        employee_ids = list(dict.fromkeys(entry["employee_id"] for entry in entries if entry["op"] == "sign_out"))
+        if not employee_ids:
+            return {}
+        open_rows = self.index.open_rows(employee_ids)
+        missing = [employee_id for employee_id, row_num in open_rows.items() if row_num is None]
+        # The sign-ins may come from another kiosk since the last rebuild;
+        # a batch with retried entries was rebuilt before it started
+        if missing and not any(entry["attempts"] for entry in entries):
+            self.index.rebuild()
+            open_rows.update(self.index.open_rows(missing))
+        return open_rows
+
+
+# Run the sync worker on its own, e.g. to drain the journal while the kiosk is stopped
+if __name__ == "__main__":
+    from storage import get_storage
+
+    logging.basicConfig(level=logging.INFO)
+    worker = SyncWorker(Journal(), get_storage())
+    worker.start()
+    while worker.is_alive():
+        time.sleep(60)
+        logger.info("Journal status: %s", worker.journal.stats())
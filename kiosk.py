@@ -0,0 +1,84 @@
+import re
+from datetime import datetime
+from employee_index import EmployeeIndex
+from metrics import timed
+from session_index import SessionIndex
+
+# Status options offered by the kiosk
+SIGN_IN_STATUSES = ["Early", "Leave", "Holiday", "Work from Home", "Site Work",
+                    "Late(On Official Duty)", "Tardy(Late Arrival)"]
+SIGN_OUT_STATUSES = ["On Time", "Left Early", "Early(On Official Duty)"]
+
+# Fixed Break Duration
+BREAK_START = "12:00 PM"
+BREAK_END = "12:40 PM"
+
+
+# Sign-in and sign-out logic of the kiosk, without the Streamlit UI.
+# Punches are written to the local journal and synced to storage by the
+# journal's SyncWorker, which can share the session index. Both methods
+# return (success, message).
+class Kiosk:
+
+    def __init__(self, storage, journal, session_index=None):
+        self.journal = journal
+        self.employee_index = EmployeeIndex(storage)
+        self.session_index = session_index or SessionIndex(storage, journal=journal)
+
+    # Function to validate Worker ID format
+    @staticmethod
+    def validate_employee_id_format(employee_id):
+        return re.match(r'^sbx\d{3}$', employee_id) is not None
+
+    # Function to check the ID before a punch; returns an error message or None
+    def check_employee_id(self, employee_id):
+        if not employee_id:
+            return "Please enter a Worker ID."
+        if not self.validate_employee_id_format(employee_id):
+            return "ID format not supported. Please enter an ID in the format sbxXXX."
+        if not self.employee_index.exists(employee_id):
+            return "Worker ID not found in Employee Master Data."
+        return None
+
+    @timed("kiosk.sign_in")
+    def sign_in(self, employee_id, status, now=None):
+        error = self.check_employee_id(employee_id)
+        if error:
+            return False, error
+
+        now = now or datetime.now()
+        date_value = now.strftime("%Y-%m-%d")
+        if self.session_index.is_signed_in(employee_id, date_value):
+            return False, "ID already registered for today."
+
+        # Get employee details
+        employee = self.employee_index.get(employee_id)
+        row = [
+            employee_id, employee["name"], employee["department"], date_value, now.strftime("%A"),
+            now.strftime("%I:%M %p"), status, BREAK_START, BREAK_END, "", ""
+        ]
+
+        # Record the row in the local journal; the sync worker appends it to the Attendance sheet
+        self.journal.append("sign_in", employee_id, date_value, {"row": row})
+        self.session_index.record_sign_in(employee_id, date_value, None)
+        return True, "Sign-In recorded successfully!"
+
+    @timed("kiosk.sign_out")
+    def sign_out(self, employee_id, status, now=None):
+        error = self.check_employee_id(employee_id)
+        if error:
+            return False, error
+
+        now = now or datetime.now()
+        date_value = now.strftime("%Y-%m-%d")
+        if self.session_index.is_signed_out(employee_id, date_value):
+            return False, "You have already signed out today."
+        if not self.session_index.has_open_session(employee_id):
+            return False, "Sign-In record not found for today."
+
+        # Record the sign-out in the local journal; the sync worker updates
+        # the "Out-Time" and "Attendance Status Out" columns of the open row
+        out_time = now.strftime("%I:%M %p")
+        self.journal.append("sign_out", employee_id, date_value, {"out_time": out_time, "status": status})
+        self.session_index.record_sign_out(employee_id, out_time, status)
+        return True, "Sign-Out recorded successfully!"
@@ -0,0 +1,244 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+import config
+
+logger = logging.getLogger(__name__)
+
+# Page or action the current thread is working for (e.g. "page: Overview",
+# "kiosk: sign-in"), so storage calls can be attributed to it
+_context = contextvars.ContextVar("metrics_context", default="")
+
+# Items measured exactly before the size of a long list is extrapolated
+SIZE_SAMPLE = 100
+
+
+# Function to estimate the bytes of a storage payload (records, rows, cell
+# values) from its text length. Long lists are estimated from their first items.
+def payload_size(value):
+    if value is None:
+        return 0
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(len(str(key)) + payload_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        if len(value) <= SIZE_SAMPLE:
+            return sum(payload_size(item) for item in value)
+        sampled = sum(payload_size(item) for item in value[:SIZE_SAMPLE])
+        return int(sampled * len(value) / SIZE_SAMPLE)
+    return len(str(value))
+
+
+# In-process timings of storage calls, data loads and page renders.
+# Each metric is keyed by (name, label), e.g. ("storage.get_all_records",
+# "Attendance Data") or ("page", "Overview"), and keeps its samples of the
+# last `window` seconds (at most `max_samples` each) for percentiles and rates.
+class Metrics:
+
+    def __init__(self, window=config.METRICS_WINDOW, max_samples=config.METRICS_MAX_SAMPLES):
+        self.window = window
+        self.max_samples = max_samples
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.samples = {}
+        self.totals = {}
+
+    def record(self, name, label, seconds, nbytes=0, error=False):
+        now = time.time()
+        key = (name, label)
+        with self.lock:
+            if key not in self.samples:
+                self.samples[key] = deque(maxlen=self.max_samples)
+                self.totals[key] = {"calls": 0, "errors": 0, "bytes": 0}
+            self.samples[key].append((now, seconds, nbytes, error, _context.get()))
+            totals = self.totals[key]
+            totals["calls"] += 1
+            totals["errors"] += int(error)
+            totals["bytes"] += nbytes
+
+    # Context manager timing a block; set `sample["bytes"]` inside it to record a payload size
+    @contextmanager
+    def timer(self, name, label=""):
+        sample = {"bytes": 0}
+        error = False
+        start = time.perf_counter()
+        try:
+            yield sample
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.record(name, label, time.perf_counter() - start, sample["bytes"], error)
+
+    def recent(self, key, now):
+        cutoff = now - self.window
+        return [sample for sample in self.samples[key] if sample[0] >= cutoff]
+
+    # Function to summarize every metric: totals since start, and latency
+    # percentiles, rate and bytes over the window
+    def summary(self):
+        import numpy as np
+
+        now = time.time()
+        rows = []
+        with self.lock:
+            keys = sorted(self.samples)
+            recent = {key: self.recent(key, now) for key in keys}
+            totals = {key: dict(self.totals[key]) for key in keys}
+        minutes = max(min(self.window, now - self.started_at) / 60, 1 / 60)
+        for key in keys:
+            samples = recent[key]
+            latencies = np.array([sample[1] for sample in samples]) * 1000
+            rows.append({
+                "name": key[0],
+                "label": key[1],
+                "calls": totals[key]["calls"],
+                "errors": totals[key]["errors"],
+                "bytes": totals[key]["bytes"],
+                "calls_per_min": round(len(samples) / minutes, 2),
+                "last_min_calls": sum(1 for sample in samples if sample[0] >= now - 60),
+                "p50_ms": round(float(np.percentile(latencies, 50)), 2) if len(latencies) else None,
+                "p95_ms": round(float(np.percentile(latencies, 95)), 2) if len(latencies) else None,
+                "window_bytes": sum(sample[2] for sample in samples),
+            })
+        return rows
+
+    # Function to count the calls of metrics starting with `prefix` per
+    # context (page or action) over the window
+    def by_context(self, prefix="storage."):
+        now = time.time()
+        counts = {}
+        with self.lock:
+            keys = [key for key in self.samples if key[0].startswith(prefix)]
+            recent = {key: self.recent(key, now) for key in keys}
+        for key, samples in recent.items():
+            for sample in samples:
+                entry = counts.setdefault((sample[4] or "(background)", key[0]), {"calls": 0, "seconds": 0.0, "bytes": 0})
+                entry["calls"] += 1
+                entry["seconds"] += sample[1]
+                entry["bytes"] += sample[2]
+        return [
+            {"context": context, "name": name, "calls": entry["calls"],
+             "seconds": round(entry["seconds"], 3), "bytes": entry["bytes"]}
+            for (context, name), entry in sorted(counts.items(), key=lambda item: -item[1]["calls"])
+        ]
+
+    def reset(self):
+        with self.lock:
+            self.samples.clear()
+            self.totals.clear()
+            self.started_at = time.time()
+
+    def to_json(self):
+        return json.dumps({
+            "generated_at": time.time(), "window_seconds": self.window,
+            "metrics": self.summary(), "by_context": self.by_context(),
+        }, indent=2)
+
+    # Function to render the metrics in the Prometheus text format, e.g. for
+    # the node_exporter textfile collector
+    def to_prometheus(self):
+        lines = []
+        fields = [
+            ("calls", "attendance_calls_total", "counter"),
+            ("errors", "attendance_errors_total", "counter"),
+            ("bytes", "attendance_bytes_total", "counter"),
+            ("calls_per_min", "attendance_calls_per_minute", "gauge"),
+            ("p50_ms", "attendance_latency_p50_ms", "gauge"),
+            ("p95_ms", "attendance_latency_p95_ms", "gauge"),
+        ]
+        rows = self.summary()
+        for field, metric, kind in fields:
+            lines.append(f"# TYPE {metric} {kind}")
+            for row in rows:
+                if row[field] is None:
+                    continue
+                label = row["label"].replace("\\", "\\\\").replace('"', '\\"')
+                lines.append(f'{metric}{{name="{row["name"]}",label="{label}"}} {row[field]}')
+        return "\n".join(lines) + "\n"
+
+    # Function to write the metrics to a file: Prometheus text for ".prom", JSON otherwise
+    def write(self, path):
+        content = self.to_prometheus() if path.endswith(".prom") else self.to_json()
+        with open(path + ".tmp", "w") as output:
+            output.write(content)
+        # Replace in one step so readers never see a partial file
+        os.replace(path + ".tmp", path)
+
+
+metrics = Metrics()
+
+
+# Context manager attributing the storage calls made inside it to a page or action
+@contextmanager
+def context(name):
+    token = _context.set(name)
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+# Decorator timing every call of a function under the given metric name.
+# Storage calls made by the function are attributed to it unless they
+# already run inside a page or action context.
+def timed(name, label=""):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with metrics.timer(name, label), context(_context.get() or name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Decorator for storage methods taking the table as first argument: times
+# the call per table and records the size of the data sent and received
+def measured(func):
+    name = f"storage.{func.__name__}"
+
+    @functools.wraps(func)
+    def wrapper(self, table, *args, **kwargs):
+        with metrics.timer(name, table) as sample:
+            result = func(self, table, *args, **kwargs)
+            sample["bytes"] = payload_size(args) + payload_size(result)
+        return result
+    return wrapper
+
+
+# Background thread writing the metrics to a file at a fixed interval
+class MetricsExporter(threading.Thread):
+
+    def __init__(self, path, interval=config.METRICS_EXPORT_INTERVAL):
+        super().__init__(daemon=True, name="metrics-export")
+        self.path = path
+        self.interval = interval
+        self.stop_event = threading.Event()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                metrics.write(self.path)
+            except OSError as error:
+                logger.warning("Could not write metrics to %s: %s", self.path, error)
+
+    def stop(self):
+        self.stop_event.set()
+
+
+# Function to start the file exporter when METRICS_FILE is set; returns it or None.
+# "{app}" in the file name is replaced by `app_name`, so the kiosk and the
+# dashboard processes write separate files.
+def start_exporter(app_name):
+    if not config.METRICS_FILE:
+        return None
+    exporter = MetricsExporter(config.METRICS_FILE.replace("{app}", app_name))
+    exporter.start()
+    return exporter
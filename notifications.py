@@ -0,0 +1,351 @@
+import json
+import logging
+import os
+import smtplib
+import threading
+from datetime import datetime
+from email.message import EmailMessage
+import pandas as pd
+import config
+from data_ingestion import attendance_changes, attendance_snapshot, employee_snapshot
+from metrics import metrics, timed
+
+logger = logging.getLogger(__name__)
+
+EVENTS = ["Late Arrival", "Early Leave", "Absenteeism", "Daily Summary"]
+LATE_STATUS = "Tardy(Late Arrival)"
+EARLY_LEAVE_STATUS = "Left Early"
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+DEFAULT_SETTINGS = {
+    "email_enabled": False,
+    "email": "",
+    "sms_enabled": False,
+    "phone": "",
+    "events": ["Late Arrival", "Early Leave"],
+    "absence_cutoff": config.NOTIFY_ABSENCE_CUTOFF,
+    "summary_time": config.WORK_END,
+}
+
+
+# Function to read the notification settings saved from the Settings page
+def load_settings(path=config.NOTIFY_SETTINGS_FILE):
+    settings = dict(DEFAULT_SETTINGS)
+    try:
+        with open(path) as settings_file:
+            settings.update(json.load(settings_file))
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as error:
+        logger.warning("Could not read notification settings from %s: %s", path, error)
+    return settings
+
+
+def save_settings(settings, path=config.NOTIFY_SETTINGS_FILE):
+    with open(path + ".tmp", "w") as settings_file:
+        json.dump({key: settings.get(key, value) for key, value in DEFAULT_SETTINGS.items()}, settings_file, indent=2)
+    # Replace in one step so the worker never reads a partial file
+    os.replace(path + ".tmp", path)
+
+
+# Function to check whether a "Shift Days" value ("Mon-Fri", "Sun-Thu",
+# "Mon, Wed, Fri") includes a date; unknown values mean Monday to Friday
+def works_on(shift_days, day):
+    weekday = day.weekday()
+    for part in str(shift_days).replace(" ", "").split(","):
+        first, _, last = part.partition("-")
+        first, last = first[:3].title(), (last or first)[:3].title()
+        if first not in WEEKDAYS or last not in WEEKDAYS:
+            return weekday < 5
+        start, end = WEEKDAYS.index(first), WEEKDAYS.index(last)
+        if (weekday - start) % 7 <= (end - start) % 7:
+            return True
+    return False
+
+
+def clock_time(clock):
+    return datetime.strptime(clock if clock.count(":") == 2 else clock + ":00", "%H:%M:%S").time()
+
+
+# Stand-in sender for testing and for channels without a provider (SMS):
+# every message is appended to a JSON-lines file
+class FileSender:
+
+    def __init__(self, path=config.NOTIFY_OUTBOX_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def send(self, channel, recipient, subject, body):
+        line = json.dumps({
+            "sent_at": datetime.now().isoformat(timespec="seconds"), "channel": channel,
+            "recipient": recipient, "subject": subject, "body": body,
+        })
+        with self.lock, open(self.path, "a") as outbox:
+            outbox.write(line + "\n")
+
+
+# Email sender for an SMTP server, e.g. a local debugging server
+# (python -m aiosmtpd -n -l localhost:1025) when testing
+class SMTPSender:
+
+    def __init__(self, host=config.SMTP_HOST, port=config.SMTP_PORT, sender=config.NOTIFY_FROM,
+                 username=config.SMTP_USERNAME, password=config.SMTP_PASSWORD):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.username = username
+        self.password = password
+
+    def send(self, channel, recipient, subject, body):
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = recipient
+        message["Subject"] = subject
+        message.set_content(body)
+        with smtplib.SMTP(self.host, self.port, timeout=30) as smtp:
+            if self.username:
+                smtp.starttls()
+                smtp.login(self.username, self.password)
+            smtp.send_message(message)
+
+
+# Senders per channel; replace an entry to plug in another provider
+senders = {
+    "email": SMTPSender() if config.NOTIFY_EMAIL_SENDER == "smtp" else FileSender(),
+    "sms": FileSender(),
+}
+
+
+# Rule engine for the notification events of the Settings page.
+# It is fed the attendance frame on every tick and only looks at the rows
+# the incremental loader added or updated since the previous tick (see
+# data_ingestion.attendance_changes). State is
+# kept per employee for the current day: who has signed in and which events
+# were already reported, so an updated row never alerts twice. Absences are
+# detected once, at the cutoff time, from the employees due today; the daily
+# summary is sent once at its time. The reported events are saved to
+# `state_path`, so a restart on the same day does not alert again. Alerts are
+# queued per recipient and sent as one message per recipient and tick.
+class NotificationEngine:
+
+    def __init__(self, state_path=config.NOTIFY_STATE_FILE):
+        self.state_path = state_path
+        # What attendance_changes returned for the last frame
+        self.seen = None
+        self.day = None
+        self.outbox = {}
+        self.lock = threading.Lock()
+
+    def start_day(self, day):
+        self.day = day
+        self.present = set()
+        self.late = set()
+        self.left_early = set()
+        self.absent = None
+        self.summary_sent = False
+        state = self.load_state()
+        if state.get("day") == day.isoformat():
+            self.late.update(state["late"])
+            self.left_early.update(state["left_early"])
+            self.absent = state["absent"]
+            self.summary_sent = state["summary_sent"]
+
+    # Function to read the events reported earlier today by any run of the engine
+    def load_state(self):
+        if not self.state_path:
+            return {}
+        try:
+            with open(self.state_path) as state_file:
+                return json.load(state_file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as error:
+            logger.warning("Could not read notification state from %s: %s", self.state_path, error)
+            return {}
+
+    def save_state(self):
+        if not self.state_path:
+            return
+        state = {
+            "day": self.day.isoformat(), "late": sorted(self.late), "left_early": sorted(self.left_early),
+            "absent": self.absent, "summary_sent": self.summary_sent,
+        }
+        with open(self.state_path + ".tmp", "w") as state_file:
+            json.dump(state, state_file)
+        # Replace in one step so a restart never reads a partial file
+        os.replace(self.state_path + ".tmp", self.state_path)
+
+    # Function to get the rows to look at: the new and recently updated rows,
+    # or every row when the frame was reloaded from scratch
+    def changed_rows(self, attendance_df):
+        start, self.seen = attendance_changes(attendance_df, self.seen)
+        return attendance_df.iloc[start:]
+
+    # Function to update the day's state from the rows changed since the last
+    # call; returns the alerts as (event, text) pairs
+    def process_rows(self, rows):
+        today = rows[rows["Date"] == pd.Timestamp(self.day)]
+        if today.empty:
+            return []
+        ids = today["Employee ID"].astype(str)
+        self.present.update(ids)
+        alerts = []
+        for event, status_column, status, reported in [
+            ("Late Arrival", "Attendance Status In", LATE_STATUS, self.late),
+            ("Early Leave", "Attendance Status Out", EARLY_LEAVE_STATUS, self.left_early),
+        ]:
+            matches = today[(today[status_column].astype(str) == status).to_numpy()]
+            time_column = "In-Time" if event == "Late Arrival" else "Out-Time"
+            for employee_id, name, department, time in zip(
+                    matches["Employee ID"].astype(str), matches["Employee Name"].astype(str),
+                    matches["Department"].astype(str), matches[time_column]):
+                if employee_id in reported:
+                    continue
+                reported.add(employee_id)
+                at = time.strftime("%I:%M %p") if isinstance(time, pd.Timestamp) else str(time)
+                alerts.append((event, f"{name} ({employee_id}, {department}) at {at}"))
+        return alerts
+
+    # Function to find the employees due today who have not signed in by the cutoff
+    def absences(self, employee_df):
+        due = employee_df[[works_on(shift, self.day) for shift in employee_df["Shift Days"]]]
+        return [
+            f"{name} ({employee_id}, {department})"
+            for employee_id, name, department in zip(
+                due["Employee ID"].astype(str), due["Employee Name"].astype(str), due["Department"].astype(str))
+            if employee_id not in self.present
+        ]
+
+    def summary(self, employee_df):
+        due = sum(works_on(shift, self.day) for shift in employee_df["Shift Days"])
+        return (
+            f"signed in: {len(self.present)} of {due} employees due; late arrivals: {len(self.late)}; "
+            f"early leaves: {len(self.left_early)}; "
+            f"absent at cutoff: {len(self.absent) if self.absent is not None else 'not checked'}"
+        )
+
+    # Function to run the rules on the current attendance and employee
+    # frames and queue the enabled alerts for the configured recipients
+    def evaluate(self, attendance_df, employee_df, settings, now=None):
+        now = now or datetime.now()
+        with self.lock:
+            if now.date() != self.day:
+                self.start_day(now.date())
+                # Rows of earlier days are of no interest, but today's may be anywhere
+                self.seen = None
+            events = set(settings["events"])
+            alerts = self.process_rows(self.changed_rows(attendance_df))
+
+            checked = False
+            if self.absent is None and now.time() >= clock_time(settings["absence_cutoff"]):
+                self.absent = self.absences(employee_df)
+                alerts.extend(("Absenteeism", text) for text in self.absent)
+                checked = True
+            if not self.summary_sent and now.time() >= clock_time(settings["summary_time"]):
+                self.summary_sent = True
+                alerts.append(("Daily Summary", self.summary(employee_df)))
+
+            if alerts or checked:
+                self.save_state()
+            alerts = [alert for alert in alerts if alert[0] in events]
+            for recipient in recipients(settings):
+                self.outbox.setdefault(recipient, []).extend(alerts)
+            return len(alerts)
+
+    # Function to send the queued alerts, one message per recipient. Alerts
+    # of a recipient whose send fails stay queued for the next attempt.
+    def dispatch(self):
+        with self.lock:
+            outbox, self.outbox = self.outbox, {}
+        sent = 0
+        for (channel, recipient), alerts in outbox.items():
+            if not alerts:
+                continue
+            subject, body = compose(self.day, alerts)
+            try:
+                with metrics.timer("notifications.send", channel):
+                    senders[channel].send(channel, recipient, subject, body)
+                sent += 1
+            except Exception as error:
+                logger.warning("Could not send notifications to %s: %s", recipient, error)
+                with self.lock:
+                    self.outbox.setdefault((channel, recipient), [])[:0] = alerts
+        return sent
+
+
+# Function to list the (channel, recipient) pairs enabled in the settings
+def recipients(settings):
+    result = []
+    if settings["email_enabled"] and settings["email"]:
+        result.append(("email", settings["email"]))
+    if settings["sms_enabled"] and settings["phone"]:
+        result.append(("sms", settings["phone"]))
+    return result
+
+
+# Function to build one message from a batch of alerts, grouped by event
+def compose(day, alerts):
+    by_event = {}
+    for event, text in alerts:
+        by_event.setdefault(event, []).append(text)
+    counts = ", ".join(f"{len(texts)} {event}" for event, texts in by_event.items())
+    sections = [f"{event}:\n" + "\n".join(f"- {text}" for text in texts) for event, texts in by_event.items()]
+    return f"Attendance alerts for {day}: {counts}", "\n\n".join(sections)
+
+
+# Background thread evaluating the rules every `interval` seconds on the
+# shared attendance snapshot (reloaded incrementally when stale)
+class NotificationWorker(threading.Thread):
+
+    def __init__(self, engine=None, interval=config.NOTIFY_INTERVAL):
+        super().__init__(daemon=True, name="notifications")
+        self.engine = engine or NotificationEngine()
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.last_run = None
+        self.last_error = ""
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.tick()
+                self.last_error = ""
+            except Exception as error:
+                logger.warning("Notification rules failed: %s", error)
+                self.last_error = str(error)
+
+    # Nothing is loaded or evaluated while no recipient or no event is enabled
+    @timed("notifications.tick")
+    def tick(self, now=None):
+        settings = load_settings()
+        if not recipients(settings) or not settings["events"]:
+            self.last_run = datetime.now()
+            return 0
+        attendance_df = attendance_snapshot()
+        self.engine.evaluate(attendance_df, employee_snapshot(), settings, now)
+        sent = self.engine.dispatch()
+        self.last_run = datetime.now()
+        return sent
+
+    def stop(self):
+        self.stop_event.set()
+
+
+# Function to start the notification worker when NOTIFY_INTERVAL is set
+# (notifications are opt-in); returns it or None
+def start_notifier():
+    if not config.NOTIFY_INTERVAL:
+        return None
+    worker = NotificationWorker()
+    worker.start()
+    return worker
+
+
+# Run the rules on their own, outside the dashboard process
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    notifier = start_notifier()
+    if notifier is None:
+        logger.info("Notifications are off; set NOTIFY_INTERVAL to the seconds between runs")
+    else:
+        notifier.join()
@@ -0,0 +1,106 @@
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from fpdf import FPDF
+from schema import attendance_as_text
+
+# Report columns and their widths in mm (A4 landscape, 277 mm between margins)
+REPORT_COLUMNS = [
+    ("Employee ID", 22), ("Employee Name", 45), ("Department", 32), ("Date", 22), ("Day", 22),
+    ("In-Time", 20), ("Attendance Status In", 42), ("Out-Time", 20), ("Attendance Status Out", 42),
+]
+ROW_HEIGHT = 6
+FONT_SIZE = 8
+# Rows converted to text at a time, so the whole report is never held as text
+CHUNK_SIZE = 1000
+
+# Reports are rendered off the Streamlit script thread
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pdf-report")
+
+
+# Function to make a value printable with the core PDF fonts and fit a column
+def cell_text(value, width):
+    text = "" if value is None else str(value)
+    if text in ("nan", "NaT"):
+        text = ""
+    max_chars = int(width / 1.8)
+    if len(text) > max_chars:
+        text = text[:max_chars - 1] + "~"
+    return text.encode("latin-1", "replace").decode("latin-1")
+
+
+# PDF with the report title, the current department and the column header
+# repeated at the top of every page
+class AttendancePDF(FPDF):
+
+    def __init__(self, title, subtitle=""):
+        super().__init__(orientation="L", unit="mm", format="A4")
+        self.title = title
+        self.subtitle = subtitle
+        self.section = ""
+        self.set_auto_page_break(True, margin=15)
+
+    def header(self):
+        self.set_font("Arial", "B", 12)
+        self.cell(0, 8, cell_text(self.title, 400), ln=True, align="C")
+        self.set_font("Arial", "", 9)
+        if self.subtitle:
+            self.cell(0, 5, cell_text(self.subtitle, 400), ln=True, align="C")
+        if self.section:
+            self.set_font("Arial", "B", 10)
+            self.cell(0, 7, cell_text(self.section, 400), ln=True)
+        self.set_font("Arial", "B", FONT_SIZE)
+        self.set_fill_color(220, 220, 220)
+        for column, width in REPORT_COLUMNS:
+            self.cell(width, ROW_HEIGHT, cell_text(column, width), border=1, fill=True)
+        self.ln()
+        self.set_font("Arial", "", FONT_SIZE)
+
+    def footer(self):
+        self.set_y(-12)
+        self.set_font("Arial", "I", 8)
+        self.cell(0, 8, f"Page {self.page_no()}", align="C")
+
+
+# Function to write a tabular attendance report with one section per
+# department to `path`. Rows are converted and written in chunks.
+def write_pdf_report(df, path, title="Attendance Report", subtitle=""):
+    pdf = AttendancePDF(title, subtitle)
+    columns = [column for column, _ in REPORT_COLUMNS]
+    widths = [width for _, width in REPORT_COLUMNS]
+
+    if df.empty:
+        pdf.add_page()
+        pdf.cell(0, ROW_HEIGHT, "No attendance records match the selected filters.", ln=True)
+    else:
+        sections = df.groupby("Department", observed=True, sort=True).indices
+        for department, positions in sections.items():
+            pdf.section = f"Department: {department} ({len(positions)} records)"
+            pdf.add_page()
+            for start in range(0, len(positions), CHUNK_SIZE):
+                chunk = attendance_as_text(df.iloc[positions[start:start + CHUNK_SIZE]]).reindex(columns=columns)
+                for row in chunk.itertuples(index=False):
+                    for value, width in zip(row, widths):
+                        pdf.cell(width, ROW_HEIGHT, cell_text(value, width), border=1)
+                    pdf.ln()
+
+    pdf.output(path, "F")
+    return path
+
+
+# Function to render a report into a new temporary file; returns its path.
+# The file is removed if rendering fails.
+def write_temp_pdf_report(df, title="Attendance Report", subtitle=""):
+    fd, path = tempfile.mkstemp(prefix="attendance_report_", suffix=".pdf")
+    os.close(fd)
+    try:
+        return write_pdf_report(df, path, title, subtitle)
+    except Exception:
+        os.remove(path)
+        raise
+
+
+# Function to start rendering a report in the background; returns a Future
+# whose result is the path of the finished PDF file
+def submit_pdf_report(df, title="Attendance Report", subtitle=""):
+    return _executor.submit(write_temp_pdf_report, df, title, subtitle)
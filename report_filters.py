@@ -0,0 +1,110 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# Number of filter results kept per engine
+MAX_CACHED_RESULTS = 32
+
+
+# Filter engine for the detailed reports.
+# The attendance frame is sorted by Date once, so a date range resolves to
+# a slice by binary search. Row positions (in sorted order) are precomputed
+# per department and per status, and results are memoized per combination
+# of filters, so changing one sidebar filter does not rescan the frame.
+class AttendanceFilter:
+
+    def __init__(self, attendance_df, date_column="Date"):
+        self.frame = attendance_df.sort_values(date_column, kind="mergesort", na_position="last")
+        self.frame = self.frame.reset_index(drop=True)
+        dates = self.frame[date_column].to_numpy(dtype="datetime64[ns]")
+        # Rows without a valid date sort last and are never part of a range
+        self.dates = dates[:int(self.frame[date_column].notna().sum())]
+        self.positions = {
+            column: self.group_positions(column)
+            for column in ["Department", "Attendance Status In"] if column in self.frame
+        }
+        self.results = OrderedDict()
+        self.lock = threading.Lock()
+
+    def group_positions(self, column):
+        groups = self.frame.groupby(column, observed=True, sort=False).indices
+        return {str(value): np.sort(positions) for value, positions in groups.items()}
+
+    def min_date(self):
+        return pd.Timestamp(self.dates[0]) if len(self.dates) else None
+
+    def max_date(self):
+        return pd.Timestamp(self.dates[-1]) if len(self.dates) else None
+
+    def values(self, column):
+        return list(self.positions.get(column, {}).keys())
+
+    # Function to get the positions of rows in [start, stop) having one of `values` in `column`
+    def positions_in(self, column, values, start, stop):
+        groups = self.positions.get(column, {})
+        parts = []
+        for value in values:
+            positions = groups.get(str(value))
+            if positions is not None:
+                parts.append(positions[np.searchsorted(positions, start):np.searchsorted(positions, stop)])
+        return np.sort(np.concatenate(parts)) if parts else np.array([], dtype=int)
+
+    # Function to get row positions for a date range (inclusive) and optional
+    # department and status selections; None means no filter on that column
+    def positions_for(self, start_date=None, end_date=None, departments=None, statuses=None):
+        key = (
+            start_date, end_date,
+            None if departments is None else frozenset(map(str, departments)),
+            None if statuses is None else frozenset(map(str, statuses)),
+        )
+        with self.lock:
+            if key in self.results:
+                self.results.move_to_end(key)
+                return self.results[key]
+
+        start = 0 if start_date is None else np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start_date)), "left")
+        stop = len(self.dates) if end_date is None else np.searchsorted(
+            self.dates, np.datetime64(pd.Timestamp(end_date)), "right"
+        )
+        positions = np.arange(start, stop)
+        for column, selected in [("Department", key[2]), ("Attendance Status In", key[3])]:
+            # A selection covering every value present is no filter at all
+            if selected is None or selected.issuperset(self.positions.get(column, {})):
+                continue
+            positions = np.intersect1d(positions, self.positions_in(column, selected, start, stop), assume_unique=True)
+
+        with self.lock:
+            self.results[key] = positions
+            if len(self.results) > MAX_CACHED_RESULTS:
+                self.results.popitem(last=False)
+        return positions
+
+    def filter(self, start_date=None, end_date=None, departments=None, statuses=None):
+        return self.frame.iloc[self.positions_for(start_date, end_date, departments, statuses)]
+
+
+# Engines are kept per attendance frame (by identity), least recently used
+# first out, so the pages filtering different frames (e.g. the heatmap on
+# the live snapshot and the detailed reports on live plus archived rows) do
+# not evict each other. An engine is rebuilt only for a frame not seen before.
+MAX_CACHED_ENGINES = 4
+_engines = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_filter_engine(attendance_df):
+    key = id(attendance_df)
+    with _lock:
+        cached = _engines.get(key)
+        # The frame is kept with its engine, so its id cannot be reused meanwhile
+        if cached is not None and cached[0] is attendance_df:
+            _engines.move_to_end(key)
+            return cached[1]
+    engine = AttendanceFilter(attendance_df)
+    with _lock:
+        _engines[key] = (attendance_df, engine)
+        _engines.move_to_end(key)
+        while len(_engines) > MAX_CACHED_ENGINES:
+            _engines.popitem(last=False)
+    return engine
@@ -0,0 +1,259 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import pandas as pd
+import config
+from data_ingestion import attendance_date_range, attendance_history
+from export import EXPORTERS, FORMATS
+from metrics import timed
+from report_filters import AttendanceFilter
+
+logger = logging.getLogger(__name__)
+
+# Attendance statuses offered by the detailed reports filter
+STATUS_OPTIONS = ['Early', 'Leave', "Holiday", "Work from Home", "Site Work",
+                  'Late(On Official Duty)', "Tardy(Late Arrival)"]
+
+# Reports of the detailed reports page: title and the statuses each keeps
+# out of the selected ones (None keeps them all)
+REPORT_KINDS = {
+    "attendance": ("Attendance Report", None),
+    "late_early": ("Late Comers & Early Leavers Report", ('Tardy(Late Arrival)', 'Left Early')),
+    "absenteeism": ("Absenteeism Report", ('Site Work',)),
+}
+
+
+# Function to get the statuses a report filters on, given the selected statuses
+def kind_statuses(kind, selected_statuses):
+    wanted = REPORT_KINDS[kind][1]
+    return list(selected_statuses) if wanted is None else [status for status in selected_statuses if status in wanted]
+
+
+def report_subtitle(start_date, end_date, rows):
+    return f"{start_date} to {end_date} - {rows} records"
+
+
+# Function to fingerprint the rows of a report (values, order and columns),
+# so a pre-rendered artifact is only served for exactly the same rows
+def fingerprint(df):
+    digest = hashlib.sha256("\x1f".join(map(str, df.columns)).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def artifact_key(source, format_name, title, subtitle=""):
+    return "|".join([source, format_name, title, subtitle if format_name == "PDF" else ""])
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as artifact:
+        for block in iter(lambda: artifact.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def format_suffix(format_name):
+    return ".pdf" if format_name == "PDF" else FORMATS[format_name]["suffix"]
+
+
+# Function to render one artifact into `directory`, named after the SHA-256
+# of its content; returns (path, sha256). Runs in a worker process.
+def render_artifact(df, format_name, title, subtitle, directory):
+    from pdf_report import write_pdf_report
+
+    suffix = format_suffix(format_name)
+    fd, path = tempfile.mkstemp(dir=directory, prefix=".render-", suffix=suffix)
+    os.close(fd)
+    try:
+        if format_name == "PDF":
+            write_pdf_report(df, path, title=title, subtitle=subtitle)
+        else:
+            EXPORTERS[format_name](df, path)
+        sha256 = file_sha256(path)
+        final_path = os.path.join(directory, sha256 + suffix)
+        os.replace(path, final_path)
+    except Exception:
+        os.remove(path)
+        raise
+    return final_path, sha256
+
+
+# Pre-rendered report files and their manifest (REPORT_DIR/manifest.json).
+# The manifest maps the fingerprint of a report's rows, its format, title
+# and (for PDFs) subtitle to the artifact, so the dashboard can serve any
+# filter combination that yields the same rows.
+class ReportArtifacts:
+
+    def __init__(self, root=config.REPORT_DIR):
+        self.root = root
+        self.manifest_path = os.path.join(root, "manifest.json")
+        self.cached = (None, {})
+        self.lock = threading.Lock()
+
+    # Function to read the manifest, again only when the file changed
+    def entries(self):
+        try:
+            mtime = os.path.getmtime(self.manifest_path)
+        except OSError:
+            return {}
+        with self.lock:
+            if self.cached[0] == mtime:
+                return self.cached[1]
+        try:
+            with open(self.manifest_path) as manifest:
+                entries = json.load(manifest)["artifacts"]
+        except (OSError, ValueError, KeyError) as error:
+            logger.warning("Could not read report manifest %s: %s", self.manifest_path, error)
+            return {}
+        with self.lock:
+            self.cached = (mtime, entries)
+        return entries
+
+    # Function to find the artifact for a report of the rows with the given
+    # fingerprint; returns its manifest entry or None when it has not been rendered
+    def find(self, source, format_name, title=REPORT_KINDS["attendance"][0], subtitle=""):
+        if source is None:
+            return None
+        entry = self.entries().get(artifact_key(source, format_name, title, subtitle))
+        if entry is None or not os.path.exists(entry["path"]):
+            return None
+        return entry
+
+    def save(self, entries):
+        os.makedirs(self.root, exist_ok=True)
+        path = self.manifest_path
+        with open(path + ".tmp", "w") as manifest:
+            json.dump({"generated_at": datetime.now().isoformat(timespec="seconds"), "artifacts": entries}, manifest)
+        # Replace in one step so readers never see a partial manifest
+        os.replace(path + ".tmp", path)
+
+    # Function to delete artifact files no longer listed in the manifest
+    def prune(self, entries):
+        keep = {os.path.abspath(entry["path"]) for entry in entries.values()}
+        for name in os.listdir(self.root):
+            path = os.path.abspath(os.path.join(self.root, name))
+            if name != "manifest.json" and not name.endswith(".tmp") and path not in keep:
+                os.remove(path)
+
+
+report_artifacts = ReportArtifacts()
+
+
+# Function to list the date ranges of the standard report sets: for every
+# site (all sites first), the dashboard's default date range and each of the
+# last `months` months. Yields (site, start_date, end_date).
+def standard_reports(months=config.REPORT_MONTHS):
+    first_date, last_date = attendance_date_range()
+    last_month = last_date.to_period("M")
+    periods = [(first_date.date(), last_date.date())] + [
+        ((last_month - back).start_time.date(), (last_month - back).end_time.date()) for back in range(months)
+    ]
+    for site in [None] + list(config.SITES):
+        for start_date, end_date in periods:
+            yield site, start_date, end_date
+
+
+# Background report renderer. Each run loads the attendance once and
+# filters the standard report sets (every date range of standard_reports,
+# for all departments and each department alone, every report kind) exactly
+# as the detailed reports page does. Reports whose rows were already
+# rendered are skipped, the others are rendered in parallel on a process
+# pool, and the manifest is rewritten. Artifacts of reports that are no
+# longer current are deleted.
+class ReportWorker:
+
+    def __init__(self, artifacts=report_artifacts, workers=config.REPORT_WORKERS,
+                 formats=config.REPORT_FORMATS, months=config.REPORT_MONTHS):
+        self.artifacts = artifacts
+        self.workers = workers or os.cpu_count()
+        self.formats = formats
+        self.months = months
+
+    # Function to build the reports to render: {key: (frame, format, title, subtitle, description)}
+    def plan(self):
+        reports = {}
+        engines = {}
+        for site, start_date, end_date in standard_reports(self.months):
+            if site not in engines:
+                engines[site] = AttendanceFilter(attendance_history(site=site)[0])
+            engine = engines[site]
+            all_departments = engine.values("Department")
+            for department in [None] + all_departments:
+                departments = all_departments if department is None else [department]
+                for kind, (title, _) in REPORT_KINDS.items():
+                    frame = engine.filter(start_date, end_date, departments, kind_statuses(kind, STATUS_OPTIONS))
+                    subtitle = report_subtitle(start_date, end_date, len(frame))
+                    source = fingerprint(frame)
+                    description = {
+                        "site": site, "start": str(start_date), "end": str(end_date),
+                        "department": department, "kind": kind, "rows": len(frame),
+                    }
+                    for format_name in self.formats:
+                        key = artifact_key(source, format_name, title, subtitle)
+                        reports.setdefault(key, (frame, format_name, title, subtitle, description))
+        return reports
+
+    # Function to bring the artifacts up to date; returns the number rendered
+    @timed("report_worker.run")
+    def run_once(self):
+        os.makedirs(self.artifacts.root, exist_ok=True)
+        reports = self.plan()
+        existing = self.artifacts.entries()
+        entries = {
+            key: existing[key] for key in reports
+            if key in existing and os.path.exists(existing[key]["path"])
+        }
+        todo = {key: report for key, report in reports.items() if key not in entries}
+
+        if todo:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                futures = {
+                    key: pool.submit(render_artifact, frame, format_name, title, subtitle, self.artifacts.root)
+                    for key, (frame, format_name, title, subtitle, _) in todo.items()
+                }
+                for key, future in futures.items():
+                    try:
+                        path, sha256 = future.result()
+                    except Exception as error:
+                        logger.warning("Could not render report %s: %s", todo[key][4], error)
+                        continue
+                    _, format_name, title, subtitle, description = todo[key]
+                    entries[key] = dict(description, format=format_name, title=title, subtitle=subtitle,
+                                        path=path, sha256=sha256,
+                                        rendered_at=datetime.now().isoformat(timespec="seconds"))
+
+        self.artifacts.save(entries)
+        self.artifacts.prune(entries)
+        logger.info("Reports: %s current, %s rendered", len(entries), len(todo))
+        return len(todo)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-render the standard attendance reports.")
+    parser.add_argument("--once", action="store_true", help="render once and exit (e.g. from cron)")
+    parser.add_argument("--interval", type=float, default=config.REPORT_INTERVAL,
+                        help="seconds between runs when not --once")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    worker = ReportWorker()
+    while True:
+        try:
+            worker.run_once()
+        except Exception:
+            logger.exception("Report run failed")
+        if args.once:
+            return
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import threading
+import pandas as pd
+
+KEY_COLUMNS = ["Date", "Department", "Attendance Status In"]
+
+
+# Function to count typed attendance rows per (date, department, status)
+def count_rows(frame):
+    if frame.empty:
+        return pd.Series(dtype="int64", index=pd.MultiIndex.from_arrays([[], [], []], names=KEY_COLUMNS))
+    counts = frame.groupby(KEY_COLUMNS, observed=True).size().reset_index(name="count")
+    # Plain text keys, so that counts from blocks with different categories line up
+    counts["Department"] = counts["Department"].astype(str)
+    counts["Attendance Status In"] = counts["Attendance Status In"].astype(str)
+    return counts.set_index(KEY_COLUMNS)["count"]
+
+
+# Attendance counts per (date, department, status in), maintained as rows
+# arrive. Date, Department and Attendance Status In are written once on
+# sign-in, so only rows past the last counted position need to be added;
+# the table is rebuilt when the attendance frame was reloaded from scratch.
+# Its size depends on the number of days, not on the number of rows.
+class DailyRollup:
+
+    def __init__(self):
+        self.counts = count_rows(pd.DataFrame(columns=KEY_COLUMNS))
+        self.rows_seen = 0
+        self.generation = None
+        self.lock = threading.Lock()
+
+    def rebuild(self, frame, generation=None):
+        counts = count_rows(frame)
+        with self.lock:
+            self.counts = counts
+            self.rows_seen = len(frame)
+            self.generation = generation
+
+    # Function to bring the rollup up to date with an attendance frame
+    def update(self, frame, generation=None):
+        if generation is None or generation != self.generation or len(frame) < self.rows_seen:
+            self.rebuild(frame, generation)
+            return
+        new_rows = frame.iloc[self.rows_seen:]
+        if new_rows.empty:
+            return
+        counts = self.counts.add(count_rows(new_rows), fill_value=0).astype("int64")
+        with self.lock:
+            self.counts = counts
+            self.rows_seen = len(frame)
+
+    # Function to get a rollup that also includes `counts` (e.g. of archived
+    # rows), leaving this one unchanged
+    def with_counts(self, counts):
+        combined = DailyRollup()
+        with self.lock:
+            combined.counts = self.counts.add(counts, fill_value=0).astype("int64") if len(counts) else self.counts
+            combined.rows_seen = self.rows_seen
+            combined.generation = self.generation
+        return combined
+
+    # Function to count rows matching an optional date, department and status
+    def count(self, date=None, department=None, status=None):
+        counts = self.counts
+        if date is not None:
+            counts = counts[counts.index.get_level_values("Date") == pd.Timestamp(date)]
+        if department is not None:
+            counts = counts[counts.index.get_level_values("Department") == department]
+        if status is not None:
+            counts = counts[counts.index.get_level_values("Attendance Status In") == status]
+        return int(counts.sum())
+
+    # Rows per date, e.g. for the attendance trend chart
+    def by_date(self, name="count"):
+        return self.counts.groupby(level="Date").sum().reset_index(name=name)
+
+    # Rows per department, e.g. for the department chart
+    def by_department(self, name="count"):
+        return self.counts.groupby(level="Department").sum().reset_index(name=name)
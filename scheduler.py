@@ -0,0 +1,138 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future
+import config
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Status codes that are worth retrying: rate limited, or a transient server error
+RATE_LIMITED = 429
+SERVER_ERRORS = {500, 502, 503, 504}
+READ_RETRY_CODES = SERVER_ERRORS | {RATE_LIMITED}
+WRITE_RETRY_CODES = {RATE_LIMITED}
+
+
+# Token bucket: `rate` tokens per second, at most `capacity` saved up.
+# A rate of 0 disables the limit.
+class TokenBucket:
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    # Function to take one token, waiting for it if needed; returns the seconds waited
+    def acquire(self):
+        if not self.rate:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+def status_code(error):
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) or getattr(error, "code", None)
+
+
+def retry_after(error):
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After", ""))
+    except ValueError:
+        return None
+
+
+# Shared scheduler for Sheets API requests.
+# Every request waits for a token of the bucket, which is sized to the
+# project quota. Concurrent reads with the same key (e.g. every session
+# reloading the Attendance sheet at once) share one in-flight request; a read
+# never joins a request that was started before the last write to the same
+# scope (worksheet) completed, so readers still see their own writes. Failed
+# requests are retried with exponential backoff and full jitter: reads on 429
+# and 5xx; writes only on 429, since a write that failed with a 5xx may
+# still have been applied and is retried idempotently by the journal sync.
+class RequestScheduler:
+
+    def __init__(self, requests_per_minute=config.SHEETS_REQUESTS_PER_MINUTE, burst=config.SHEETS_BURST,
+                 max_retries=config.SHEETS_MAX_RETRIES, base_delay=1.0, max_delay=64.0):
+        self.bucket = TokenBucket(requests_per_minute / 60, burst)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.inflight = {}
+        # Completed writes per scope
+        self.writes = {}
+        self.lock = threading.Lock()
+
+    # Function to run a read, sharing the result with concurrent reads of the same key
+    def read(self, scope, key, request):
+        with self.lock:
+            key = (scope, self.writes.get(scope, 0), key)
+            future = self.inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self.inflight[key] = Future()
+        if not leader:
+            metrics.record("scheduler.coalesced", str(scope), 0)
+            return future.result()
+
+        try:
+            future.set_result(self.call(request, READ_RETRY_CODES))
+        except BaseException as error:
+            future.set_exception(error)
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+        return future.result()
+
+    def write(self, scope, request):
+        try:
+            return self.call(request, WRITE_RETRY_CODES)
+        finally:
+            with self.lock:
+                self.writes[scope] = self.writes.get(scope, 0) + 1
+
+    def call(self, request, retry_codes):
+        from gspread.exceptions import APIError
+
+        attempt = 0
+        while True:
+            waited = self.bucket.acquire()
+            if waited:
+                metrics.record("scheduler.throttled", "", waited)
+            try:
+                return request()
+            except APIError as error:
+                code = status_code(error)
+                if code not in retry_codes or attempt >= self.max_retries:
+                    raise
+                delay = self.backoff(attempt, retry_after(error))
+                logger.warning("Sheets request failed with %s, retrying in %.1f s", code, delay)
+                metrics.record("scheduler.retry", str(code), delay)
+                time.sleep(delay)
+                attempt += 1
+
+    # Full jitter: a random delay up to base * 2^attempt, capped; Retry-After is a lower bound
+    def backoff(self, attempt, minimum=None):
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(delay, minimum or 0)
+
+
+# One scheduler for every Sheets storage of the process
+sheets_scheduler = RequestScheduler()
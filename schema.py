@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+# Typed layout of the Attendance Data frame.
+# Date is parsed once into datetime64, and In-Time/Out-Time ("%I:%M %p") into
+# timestamps on that date. Low-cardinality text columns, Employee ID
+# included, are stored as categoricals (small integer codes plus one copy of
+# each distinct value). Site is only present in multi-site mode.
+DATE_COLUMN = "Date"
+TIME_COLUMNS = ["In-Time", "Out-Time"]
+SITE_COLUMN = "Site"
+CATEGORY_COLUMNS = [
+    "Employee ID", "Employee Name", "Department", "Day",
+    "Attendance Status In", "Attendance Status Out", "Break Start", "Break End", SITE_COLUMN
+]
+DATE_FORMAT = "%Y-%m-%d"
+TIME_FORMAT = "%I:%M %p"
+
+
+# Function to parse "%I:%M %p" strings into timestamps on the given dates
+def parse_times(times, dates, time_format=TIME_FORMAT):
+    parsed = pd.to_datetime(times.astype(str), format=time_format, errors="coerce")
+    return dates + (parsed - parsed.dt.normalize())
+
+
+# Function to convert a raw attendance frame (text columns) into the typed layout.
+# Frames that are already typed are returned unchanged.
+def typed_attendance(df):
+    df = df.copy()
+    if DATE_COLUMN in df and not pd.api.types.is_datetime64_any_dtype(df[DATE_COLUMN]):
+        df[DATE_COLUMN] = pd.to_datetime(df[DATE_COLUMN].astype(str), format=DATE_FORMAT, errors="coerce")
+    for column in TIME_COLUMNS:
+        if column in df and not pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = parse_times(df[column], df[DATE_COLUMN])
+    for column in CATEGORY_COLUMNS:
+        if column in df and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(str).astype("category")
+    return df
+
+
+# Function to append typed frames while keeping categorical columns categorical
+# (plain pd.concat falls back to object when the categories differ)
+def concat_typed(head, tail):
+    head = head.copy()
+    tail = tail.copy()
+    for column in CATEGORY_COLUMNS:
+        if column in head and column in tail:
+            # Only new values are added, so the codes of the (large) head stay as they are
+            new_categories = tail[column].cat.categories.difference(head[column].cat.categories)
+            if len(new_categories):
+                head[column] = head[column].cat.add_categories(new_categories)
+            tail[column] = tail[column].cat.set_categories(head[column].cat.categories)
+    return pd.concat([head, tail], ignore_index=True)
+
+
+# Function to find the position of the first row that can still change: one
+# dated today (or later), or one without an Out-Time dated within the last
+# `open_days` days, since a sign-out can come the next day. Works on typed and
+# on raw text frames; returns len(df) when no row is open.
+def first_open_row(df, open_days, today=None):
+    if DATE_COLUMN not in df or "Out-Time" not in df or df.empty:
+        return len(df)
+    today = pd.Timestamp(today or pd.Timestamp.today()).normalize()
+    dates = df[DATE_COLUMN]
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates.astype(str), format=DATE_FORMAT, errors="coerce")
+    out_times = df["Out-Time"]
+    missing = out_times.isna()
+    if not pd.api.types.is_datetime64_any_dtype(out_times):
+        missing |= out_times.astype(str).str.strip().isin(["", "nan", "None"])
+    open_rows = (dates >= today) | (missing & (dates >= today - pd.Timedelta(days=open_days)))
+    positions = np.flatnonzero(open_rows.to_numpy())
+    return int(positions[0]) if len(positions) else len(df)
+
+
+# Function to tag the rows of a site with its name, for the merged frames of
+# multi-site mode (rows of the default spreadsheet are left as they are)
+def with_site(df, site):
+    if site is None:
+        return df
+    return df.assign(**{SITE_COLUMN: site})
+
+
+# Function to turn a typed frame back into the sheet's text format (e.g. for exports)
+def attendance_as_text(df):
+    df = df.copy()
+    if DATE_COLUMN in df and pd.api.types.is_datetime64_any_dtype(df[DATE_COLUMN]):
+        df[DATE_COLUMN] = df[DATE_COLUMN].dt.strftime(DATE_FORMAT).fillna("")
+    for column in TIME_COLUMNS:
+        if column in df and pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = df[column].dt.strftime(TIME_FORMAT).fillna("")
+    return df
@@ -0,0 +1,240 @@
+import threading
+import time
+from datetime import date, timedelta
+import config
+from sync_window import refresh_start
+
+# Column positions (1-based) in the Attendance Data sheet
+EMPLOYEE_ID_COL = config.ATTENDANCE_COLUMNS.index("Employee ID") + 1
+DATE_COL = config.ATTENDANCE_COLUMNS.index("Date") + 1
+OUT_TIME_COL = config.ATTENDANCE_COLUMNS.index("Out-Time") + 1
+STATUS_OUT_COL = config.ATTENDANCE_COLUMNS.index("Attendance Status Out") + 1
+
+
+# Function to get the (Employee ID, Date) key of a row of values
+def row_key(values):
+    values = list(values) + [""] * (DATE_COL - len(values))
+    return str(values[EMPLOYEE_ID_COL - 1]), str(values[DATE_COL - 1])
+
+
+# Index of attendance sessions keyed by (Employee ID, Date), shared by the
+# kiosk and its sync worker.
+# Each entry holds the sheet row plus the sign-out state of that row:
+# `out_time`/`status_out` as the kiosk sees it, journal included, and
+# `stored_out` as storage holds it. `open_sessions` points at each employee's
+# most recent entry without an Out-Time and `stored_open` at the one whose
+# row in storage has no Out-Time yet, which is the row a sign-out updates.
+# The index is built from storage once (and again when rows have shifted);
+# after `max_age` seconds only the recent rows are read again: the last
+# `window` rows and the rows of sessions still open in storage within
+# `open_days` days, so that writes made by other kiosks are picked up. The
+# kiosk and the sync worker update it in place after their own writes. When
+# a journal is given, its pending (not yet synced) entries are applied on
+# top after every read; their sessions have no row until the sync worker
+# writes them.
+class SessionIndex:
+
+    def __init__(self, storage, max_age=config.SESSION_INDEX_TTL, journal=None,
+                 window=config.SYNC_WINDOW_ROWS, open_days=config.SYNC_OPEN_DAYS):
+        self.storage = storage
+        self.journal = journal
+        self.max_age = max_age
+        self.window = window
+        self.open_days = open_days
+        self.sessions = {}
+        self.open_sessions = {}
+        self.stored_open = {}
+        # Key of every row read from storage, in row order
+        self.row_keys = []
+        self.loaded_at = None
+        self.lock = threading.Lock()
+        # Serializes reads from storage between the kiosk and the sync worker
+        self.load_lock = threading.Lock()
+
+    # Function to build the index from every row in storage
+    def rebuild(self):
+        with self.load_lock:
+            # Read the journal first: an entry synced in between is then in storage
+            pending = self.journal.pending() if self.journal else []
+            rows = self.storage.get_rows(config.ATTENDANCE_SHEET, 2)
+            with self.lock:
+                self.sessions = {}
+                self.open_sessions = {}
+                self.stored_open = {}
+                self.row_keys = []
+                self.apply_rows(rows, 0)
+                self.loaded_at = time.monotonic()
+            if pending:
+                self.journal.replay(self, pending)
+
+    # Function to read the recent rows again; the index is rebuilt when the
+    # rows we hold at those positions are not the same rows any more
+    def refresh(self):
+        with self.load_lock:
+            pending = self.journal.pending() if self.journal else []
+            start = self.refresh_start()
+            rows = self.storage.get_rows(config.ATTENDANCE_SHEET, start + 2)
+            held = self.row_keys[start:]
+            if len(rows) < len(held) or [row_key(values) for values in rows[:len(held)]] != held:
+                stale = True
+            else:
+                stale = False
+                with self.lock:
+                    del self.row_keys[start:]
+                    self.apply_rows(rows, start)
+                    self.loaded_at = time.monotonic()
+        if stale:
+            self.rebuild()
+        elif pending:
+            self.journal.replay(self, pending)
+
+    # Function to get the position of the first row to read again
+    def refresh_start(self):
+        cutoff = (date.today() - timedelta(days=self.open_days)).isoformat()
+        with self.lock:
+            open_rows = [
+                session["row"] - 2 for session in self.stored_open.values()
+                if session["row"] is not None and session["date"] >= cutoff
+            ]
+            return refresh_start(min(open_rows, default=len(self.row_keys)), len(self.row_keys), self.window)
+
+    # Function to index rows of values read from storage, starting at data position `start`
+    def apply_rows(self, rows, start):
+        for i, values in enumerate(rows):
+            values = list(values) + [""] * (len(config.ATTENDANCE_COLUMNS) - len(values))
+            key = row_key(values)
+            out_time = str(values[OUT_TIME_COL - 1])
+            session = {
+                "date": key[1],
+                "row": start + i + 2,
+                "out_time": out_time,
+                "status_out": str(values[STATUS_OUT_COL - 1]),
+                "stored_out": out_time,
+            }
+            previous = self.sessions.get(key)
+            self.sessions[key] = session
+            self.row_keys.append(key)
+            for open_map in (self.open_sessions, self.stored_open):
+                if out_time == "":
+                    open_map[key[0]] = session
+                elif previous is not None and open_map.get(key[0]) is previous:
+                    # Signed out since it was read
+                    del open_map[key[0]]
+
+    def ensure_fresh(self):
+        if self.loaded_at is None:
+            self.rebuild()
+        elif time.monotonic() - self.loaded_at > self.max_age:
+            self.refresh()
+
+    def is_signed_in(self, employee_id, date):
+        self.ensure_fresh()
+        return (employee_id, date) in self.sessions
+
+    def is_signed_out(self, employee_id, date):
+        self.ensure_fresh()
+        session = self.sessions.get((employee_id, date))
+        return session is not None and session["out_time"] != ""
+
+    def has_open_session(self, employee_id):
+        self.ensure_fresh()
+        return employee_id in self.open_sessions
+
+    # Function to get the row of a session already written to storage, or None
+    def stored_row(self, employee_id, date):
+        session = self.sessions.get((employee_id, date))
+        return session["row"] if session is not None else None
+
+    # Function to check whether a session's sign-out has reached storage
+    def is_stored_signed_out(self, employee_id, date):
+        session = self.sessions.get((employee_id, date))
+        return session is not None and session["stored_out"] != ""
+
+    # Function to get the rows of several employees' most recent sign-ins
+    # still open in storage as {employee_id: row or None}. The rows are
+    # checked against storage with one ranged read and the index is rebuilt
+    # if rows have shifted since it was loaded.
+    def open_rows(self, employee_ids):
+        self.ensure_fresh()
+        rows = dict.fromkeys(employee_ids)
+        candidates = {}
+        for employee_id in rows:
+            session = self.stored_open.get(employee_id)
+            if session is not None and session["row"] is not None:
+                candidates[employee_id] = (session["row"], session["date"])
+        if not candidates:
+            return rows
+
+        first = min(row for row, _ in candidates.values())
+        last = max(row for row, _ in candidates.values())
+        # The Sheets API drops trailing empty rows, so the range may come back short
+        values = self.storage.get_rows(config.ATTENDANCE_SHEET, first, last)
+        stale = False
+        for employee_id, (row, date) in candidates.items():
+            row_values = values[row - first] if row - first < len(values) else []
+            if self._row_matches(row_values, employee_id, date):
+                rows[employee_id] = row
+            else:
+                stale = True
+        if stale:
+            self.rebuild()
+            for employee_id, row in rows.items():
+                session = self.stored_open.get(employee_id)
+                if row is None and session is not None:
+                    rows[employee_id] = session["row"]
+        return rows
+
+    # Rows shift up when closed months are archived, so the date is checked too
+    @staticmethod
+    def _row_matches(values, employee_id, date):
+        if len(values) < DATE_COL or str(values[EMPLOYEE_ID_COL - 1]) != employee_id:
+            return False
+        if str(values[DATE_COL - 1]) != date:
+            return False
+        # Trailing empty cells are not returned by the Sheets API
+        return len(values) < OUT_TIME_COL or values[OUT_TIME_COL - 1] == ""
+
+    # Function to record a sign-in; `row` is None while it is only in the journal
+    def record_sign_in(self, employee_id, date, row):
+        with self.lock:
+            stored = self.sessions.get((employee_id, date))
+            if row is None and stored is not None and stored["row"] is not None:
+                # Already in storage, e.g. synced since the journal was read
+                return
+            session = {"date": date, "row": row, "out_time": "", "status_out": "", "stored_out": ""}
+            self.sessions[(employee_id, date)] = session
+            self.open_sessions[employee_id] = session
+
+    def record_sign_out(self, employee_id, out_time, status_out):
+        with self.lock:
+            session = self.open_sessions.pop(employee_id, None)
+            if session is not None:
+                session["out_time"] = out_time
+                session["status_out"] = status_out
+
+    # Function to record a sign-in the sync worker has appended to storage at `row`
+    def record_stored_sign_in(self, employee_id, date, row):
+        with self.lock:
+            session = self.sessions.get((employee_id, date))
+            if session is None:
+                session = {"date": date, "row": row, "out_time": "", "status_out": "", "stored_out": ""}
+                self.sessions[(employee_id, date)] = session
+                self.open_sessions[employee_id] = session
+            session["row"] = row
+            self.stored_open[employee_id] = session
+            # Rows appended by other kiosks in between are read on the next refresh
+            if row - 2 == len(self.row_keys):
+                self.row_keys.append((employee_id, date))
+
+    # Function to record a sign-out the sync worker has written to storage
+    def record_stored_sign_out(self, employee_id, out_time, status_out):
+        with self.lock:
+            session = self.stored_open.pop(employee_id, None)
+            if session is None:
+                return
+            session["stored_out"] = out_time
+            if self.open_sessions.get(employee_id) is session:
+                # Not signed out through this index (e.g. a worker of its own)
+                del self.open_sessions[employee_id]
+                session["out_time"] = out_time
+                session["status_out"] = status_out
@@ -0,0 +1,77 @@
+import os
+import pickle
+import threading
+import config
+
+# Process-wide Google Sheets client and handle cache.
+# The client is authorized once and shared by every session and thread of
+# the process, so its HTTP session (and connection pool) is reused. Access
+# tokens are refreshed by the client when they expire, not up front.
+# Nothing happens at import: the Google libraries are imported, and the
+# credentials loaded, by the first request.
+_lock = threading.Lock()
+_client = None
+_spreadsheets = {}
+_worksheets = {}
+
+
+# Function to load the OAuth credentials, running the consent flow only when
+# there is no usable refresh token
+def load_credentials():
+    creds = None
+
+    # Token file stores the user's access and refresh tokens
+    if os.path.exists(config.TOKEN_FILE):
+        with open(config.TOKEN_FILE, 'rb') as token:
+            creds = pickle.load(token)
+
+    # An expired token with a refresh token is refreshed lazily on first request
+    if not creds or not (creds.valid or creds.refresh_token):
+        from google_auth_oauthlib.flow import InstalledAppFlow
+
+        flow = InstalledAppFlow.from_client_secrets_file(config.CREDENTIALS_FILE, config.SCOPES)
+        creds = flow.run_local_server(port=0)
+
+        # Save the credentials for the next run
+        with open(config.TOKEN_FILE, 'wb') as token:
+            pickle.dump(creds, token)
+
+    return creds
+
+
+def get_client():
+    global _client
+    with _lock:
+        if _client is None:
+            import gspread
+
+            _client = gspread.authorize(load_credentials())
+        return _client
+
+
+# Spreadsheets are opened outside the lock, so the sites' spreadsheets open
+# in parallel; when two threads open the same one, the first handle is kept
+def get_spreadsheet(spreadsheet_name=config.SPREADSHEET_NAME):
+    if spreadsheet_name not in _spreadsheets:
+        spreadsheet = get_client().open(spreadsheet_name)
+        with _lock:
+            _spreadsheets.setdefault(spreadsheet_name, spreadsheet)
+    return _spreadsheets[spreadsheet_name]
+
+
+def get_worksheet(title, spreadsheet_name=config.SPREADSHEET_NAME):
+    key = (spreadsheet_name, title)
+    if key not in _worksheets:
+        worksheet = get_spreadsheet(spreadsheet_name).worksheet(title)
+        with _lock:
+            _worksheets.setdefault(key, worksheet)
+    return _worksheets[key]
+
+
+# Function to drop the cached client and handles (e.g. after revoking a token)
+def reset():
+    global _client
+    with _lock:
+        _client = None
+        _spreadsheets.clear()
+        _worksheets.clear()
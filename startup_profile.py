@@ -0,0 +1,133 @@
+import sys
+import threading
+import time
+from contextlib import contextmanager
+import config
+
+# Startup profiling (STARTUP_PROFILE=1): the time each module takes to
+# import, with and without the imports it triggers, and the time of named
+# initialization phases, reported once the first page has been rendered.
+# Only this module and config have been imported when start() runs, so the
+# app's own imports are all measured.
+imports = {}
+phases = {}
+_state = threading.local()
+_lock = threading.Lock()
+_started_at = None
+_reported = False
+
+# Modules listed in the report
+REPORT_LINES = 25
+
+
+def _stack():
+    if not hasattr(_state, "stack"):
+        _state.stack = []
+    return _state.stack
+
+
+# Loader wrapper timing the execution of a module. The original loader is
+# put back on the module before it runs, so the module never sees the wrapper.
+class _TimedLoader:
+
+    def __init__(self, loader):
+        self.loader = loader
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        module.__loader__ = self.loader
+        if module.__spec__ is not None:
+            module.__spec__.loader = self.loader
+        stack = _stack()
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            total = time.perf_counter() - start
+            nested = stack.pop()
+            if stack:
+                stack[-1] += total
+            with _lock:
+                imports[module.__name__] = (total, total - nested)
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+
+# Meta path finder that lets the other finders locate a module and wraps its loader
+class _TimingFinder:
+
+    def find_spec(self, name, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _TimedLoader(spec.loader)
+                return spec
+        return None
+
+
+def enabled():
+    return bool(config.STARTUP_PROFILE)
+
+
+# Function to start profiling, once per process; call it before any other import
+def start():
+    global _started_at
+    if not enabled() or _started_at is not None:
+        return
+    _started_at = time.perf_counter()
+    sys.meta_path.insert(0, _TimingFinder())
+
+
+# Context manager timing an initialization phase, e.g. loading the kiosk state
+@contextmanager
+def phase(name):
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        if _started_at is not None:
+            with _lock:
+                phases.setdefault(name, time.perf_counter() - start_time)
+
+
+# Function to format the report: slowest imports by their own time, then the phases
+def report(app_name, elapsed):
+    with _lock:
+        ranked = sorted(imports.items(), key=lambda item: -item[1][1])
+        phase_items = list(phases.items())
+    lines = [
+        f"Startup profile ({app_name}): first page after {elapsed:.2f} s, "
+        f"{sum(own for _, own in imports.values()):.2f} s in {len(imports)} imports",
+        f"{'module':<50} {'self s':>8} {'total s':>8}",
+    ]
+    lines += [f"{name:<50} {own:>8.3f} {total:>8.3f}" for name, (total, own) in ranked[:REPORT_LINES]]
+    lines += [f"phase {name:<44} {seconds:>8.3f}" for name, seconds in phase_items]
+    return "\n".join(lines)
+
+
+# Function to report the profile once the first page is rendered: written to
+# stderr and recorded in the metrics (startup.import / startup.phase)
+def finish(app_name):
+    global _reported
+    with _lock:
+        if _started_at is None or _reported:
+            return
+        _reported = True
+    elapsed = time.perf_counter() - _started_at
+    sys.meta_path[:] = [finder for finder in sys.meta_path if not isinstance(finder, _TimingFinder)]
+    sys.stderr.write(report(app_name, elapsed) + "\n")
+
+    from metrics import metrics
+
+    metrics.record("startup.first_page", app_name, elapsed)
+    for name, (_, own) in sorted(imports.items(), key=lambda item: -item[1][1])[:REPORT_LINES]:
+        metrics.record("startup.import", name, own)
+    for name, seconds in phases.items():
+        metrics.record("startup.phase", name, seconds)
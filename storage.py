@@ -0,0 +1,362 @@
+import bisect
+import os
+import re
+import sqlite3
+import threading
+import config
+import sheets_client
+from metrics import measured
+from scheduler import sheets_scheduler
+from write_batcher import merge_cell_updates
+
+# Tables known to the storage layer, keyed by worksheet name
+TABLES = {
+    config.EMPLOYEE_SHEET: ("employees", config.EMPLOYEE_COLUMNS),
+    config.ATTENDANCE_SHEET: ("attendance", config.ATTENDANCE_COLUMNS),
+}
+
+# Callbacks to run after a table has been written through the storage layer
+_listeners = {}
+
+
+# Function to register a callback for writes to a table (e.g. to invalidate a cache)
+def on_change(table, callback):
+    _listeners.setdefault(table, []).append(callback)
+
+
+def notify_change(table):
+    for callback in _listeners.get(table, []):
+        callback()
+
+
+# Storage interface shared by every backend.
+# Rows are numbered the way Google Sheets numbers them: row 1 holds the
+# header, so the first record lives in row 2. Columns are 1-based.
+class Storage:
+
+    # All records of a table as a list of dicts keyed by column name
+    def get_all_records(self, table):
+        raise NotImplementedError
+
+    # Row number of the first record whose column `col` equals `value`, or None
+    def find_row(self, table, value, col=1):
+        raise NotImplementedError
+
+    # Values of a single row, in column order
+    def row_values(self, table, row):
+        raise NotImplementedError
+
+    # Values of every row from `start_row` to `end_row` (or the end of the
+    # table), header included when starting at row 1. Values are returned as text.
+    def get_rows(self, table, start_row=1, end_row=None):
+        raise NotImplementedError
+
+    # Append a row and return the row number it was written to
+    def append_row(self, table, row):
+        raise NotImplementedError
+
+    def update_cell(self, table, row, col, value):
+        raise NotImplementedError
+
+    # Append several rows in one request; returns their row numbers
+    def append_rows(self, table, rows):
+        return [self.append_row(table, row) for row in rows]
+
+    # Write several cells in one request; `updates` is a list of (row, col, value).
+    # Values are stored as given ("RAW"); "USER_ENTERED" lets Sheets parse
+    # them like typed input (dates, numbers, formulas) where the backend supports it.
+    def update_cells(self, table, updates, value_input_option="RAW"):
+        for row, col, value in updates:
+            self.update_cell(table, row, col, value)
+
+    # Delete rows; the rows below move up, like in the sheet
+    def delete_rows(self, table, rows):
+        raise NotImplementedError
+
+
+# Google Sheets backend, one worksheet per table.
+# Worksheet handles come from the shared client in sheets_client, so creating
+# a SheetsStorage does not authorize or open anything by itself. Requests go
+# through the shared scheduler (rate limit, coalesced reads, retries).
+class SheetsStorage(Storage):
+
+    def __init__(self, spreadsheet_name=config.SPREADSHEET_NAME, scheduler=sheets_scheduler):
+        self.spreadsheet_name = spreadsheet_name
+        self.scheduler = scheduler
+
+    def worksheet(self, table):
+        return sheets_client.get_worksheet(table, self.spreadsheet_name)
+
+    # Function to run a worksheet read, e.g. read(table, "row_values", 5);
+    # identical concurrent reads share one request
+    def read(self, table, method, *args):
+        return self.scheduler.read(
+            (self.spreadsheet_name, table), (method,) + args, lambda: getattr(self.worksheet(table), method)(*args)
+        )
+
+    def write(self, table, method, *args, **kwargs):
+        return self.scheduler.write((self.spreadsheet_name, table), lambda: getattr(self.worksheet(table), method)(*args, **kwargs))
+
+    # Values are kept as text (no number conversion), like the other backends
+    @measured
+    def get_all_records(self, table):
+        return self.scheduler.read(
+            (self.spreadsheet_name, table), ("get_all_records",),
+            lambda: self.worksheet(table).get_all_records(numericise_ignore=["all"])
+        )
+
+    @measured
+    def find_row(self, table, value, col=1):
+        cell = self.scheduler.read(
+            (self.spreadsheet_name, table), ("find", value, col), lambda: self.worksheet(table).find(value, in_column=col)
+        )
+        return cell.row if cell else None
+
+    @measured
+    def row_values(self, table, row):
+        return self.read(table, "row_values", row)
+
+    @measured
+    def get_rows(self, table, start_row=1, end_row=None):
+        worksheet = self.worksheet(table)
+        last_column = rowcol_to_a1(1, worksheet.col_count).rstrip("0123456789")
+        return self.read(table, "get", f"A{start_row}:{last_column}{end_row or ''}")
+
+    @measured
+    def append_row(self, table, row):
+        response = self.write(table, "append_row", row)
+        notify_change(table)
+        return _first_updated_row(response)
+
+    @measured
+    def update_cell(self, table, row, col, value):
+        self.write(table, "update_cell", row, col, value)
+        notify_change(table)
+
+    @measured
+    def append_rows(self, table, rows):
+        if not rows:
+            return []
+        response = self.write(table, "append_rows", rows)
+        notify_change(table)
+        first_row = _first_updated_row(response)
+        return list(range(first_row, first_row + len(rows)))
+
+    # Adjacent cells are merged into ranges and sent as a single batch_update
+    @measured
+    def update_cells(self, table, updates, value_input_option="RAW"):
+        if not updates:
+            return
+        data = [
+            {"range": f"{rowcol_to_a1(row, col)}:{rowcol_to_a1(row, col + len(values) - 1)}", "values": [values]}
+            for row, col, values in merge_cell_updates(updates)
+        ]
+        self.write(table, "batch_update", data, value_input_option=value_input_option)
+        notify_change(table)
+
+    # Each run of adjacent rows is one request, bottom run first so row numbers stay valid
+    @measured
+    def delete_rows(self, table, rows):
+        for first, last in reversed(_row_runs(rows)):
+            self.write(table, "delete_rows", first, last)
+        if rows:
+            notify_change(table)
+
+
+# Local SQLite backend (WAL mode), with the sheet row number as primary key
+class SQLiteStorage(Storage):
+
+    def __init__(self, path=config.SQLITE_PATH):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.create_tables()
+
+    def create_tables(self):
+        with self.lock, self.conn:
+            for name, columns in TABLES.values():
+                column_sql = ", ".join(f'"{column}" TEXT DEFAULT \'\'' for column in columns)
+                self.conn.execute(f"CREATE TABLE IF NOT EXISTS {name} (row_num INTEGER PRIMARY KEY, {column_sql})")
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_employees_id ON employees ("Employee ID")')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_attendance_id_date ON attendance ("Employee ID", "Date")')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_attendance_date ON attendance ("Date")')
+
+    @measured
+    def get_all_records(self, table):
+        name, columns = TABLES[table]
+        with self.lock:
+            rows = self.conn.execute(f"SELECT {_column_list(columns)} FROM {name} ORDER BY row_num").fetchall()
+        return [dict(zip(columns, row)) for row in rows]
+
+    @measured
+    def find_row(self, table, value, col=1):
+        name, columns = TABLES[table]
+        with self.lock:
+            result = self.conn.execute(
+                f'SELECT row_num FROM {name} WHERE "{columns[col - 1]}" = ? ORDER BY row_num LIMIT 1', (value,)
+            ).fetchone()
+        return result[0] if result else None
+
+    @measured
+    def row_values(self, table, row):
+        name, columns = TABLES[table]
+        with self.lock:
+            result = self.conn.execute(f"SELECT {_column_list(columns)} FROM {name} WHERE row_num = ?", (row,)).fetchone()
+        return list(result) if result else []
+
+    @measured
+    def get_rows(self, table, start_row=1, end_row=None):
+        name, columns = TABLES[table]
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT {_column_list(columns)} FROM {name} WHERE row_num >= ? AND row_num <= ? ORDER BY row_num",
+                (start_row, end_row if end_row is not None else 2 ** 62)
+            ).fetchall()
+        rows = [list(row) for row in rows]
+        return [list(columns)] + rows if start_row <= 1 else rows
+
+    @measured
+    def append_row(self, table, row):
+        name, columns = TABLES[table]
+        values = _pad(row, columns)
+        with self.lock, self.conn:
+            row_num = self.conn.execute(f"SELECT COALESCE(MAX(row_num), 1) + 1 FROM {name}").fetchone()[0]
+            self.conn.execute(
+                f"INSERT INTO {name} (row_num, {_column_list(columns)}) VALUES (?, {', '.join('?' * len(columns))})",
+                [row_num] + values
+            )
+        notify_change(table)
+        return row_num
+
+    @measured
+    def update_cell(self, table, row, col, value):
+        name, columns = TABLES[table]
+        with self.lock, self.conn:
+            self.conn.execute(f'UPDATE {name} SET "{columns[col - 1]}" = ? WHERE row_num = ?', (str(value), row))
+        notify_change(table)
+
+    @measured
+    def append_rows(self, table, rows):
+        if not rows:
+            return []
+        name, columns = TABLES[table]
+        with self.lock, self.conn:
+            first_row = self.conn.execute(f"SELECT COALESCE(MAX(row_num), 1) + 1 FROM {name}").fetchone()[0]
+            self.conn.executemany(
+                f"INSERT INTO {name} (row_num, {_column_list(columns)}) VALUES (?, {', '.join('?' * len(columns))})",
+                [[first_row + i] + _pad(row, columns) for i, row in enumerate(rows)]
+            )
+        notify_change(table)
+        return list(range(first_row, first_row + len(rows)))
+
+    # All cells are written in one transaction
+    @measured
+    def update_cells(self, table, updates, value_input_option="RAW"):
+        if not updates:
+            return
+        name, columns = TABLES[table]
+        with self.lock, self.conn:
+            for row, col, values in merge_cell_updates(updates):
+                assignments = ", ".join(f'"{column}" = ?' for column in columns[col - 1:col - 1 + len(values)])
+                self.conn.execute(
+                    f"UPDATE {name} SET {assignments} WHERE row_num = ?", [str(value) for value in values] + [row]
+                )
+        notify_change(table)
+
+    # Rows below move up by the number of deleted rows above them, in one
+    # transaction. Row numbers go through negative values so the primary key
+    # never collides.
+    @measured
+    def delete_rows(self, table, rows):
+        if not rows:
+            return
+        name, _ = TABLES[table]
+        deleted = sorted(set(rows))
+        with self.lock, self.conn:
+            self.conn.executemany(f"DELETE FROM {name} WHERE row_num = ?", [(row,) for row in deleted])
+            below = [row for (row,) in self.conn.execute(f"SELECT row_num FROM {name} WHERE row_num > ?", (deleted[0],))]
+            self.conn.executemany(
+                f"UPDATE {name} SET row_num = ? WHERE row_num = ?",
+                [(-(row - bisect.bisect_left(deleted, row)), row) for row in below]
+            )
+            self.conn.execute(f"UPDATE {name} SET row_num = -row_num WHERE row_num < 0")
+        notify_change(table)
+
+
+# Row number of the first row written by an append, e.g. "'Attendance Data'!A42:K44" -> 42
+def _first_updated_row(response):
+    updated_range = response["updates"]["updatedRange"]
+    return int(re.search(r"!\D+(\d+)", updated_range).group(1))
+
+
+# Function to group row numbers into runs of adjacent rows, e.g. [2, 3, 7] -> [(2, 3), (7, 7)]
+def _row_runs(rows):
+    runs = []
+    for row in sorted(set(rows)):
+        if runs and runs[-1][1] == row - 1:
+            runs[-1] = (runs[-1][0], row)
+        else:
+            runs.append((row, row))
+    return runs
+
+
+def _column_list(columns):
+    return ", ".join(f'"{column}"' for column in columns)
+
+
+# Pad or trim a row to the table width; values are stored as text like in the sheet
+def _pad(row, columns):
+    values = ["" if value is None else str(value) for value in row][:len(columns)]
+    return values + [""] * (len(columns) - len(values))
+
+
+# gspread's A1 notation helper; gspread is slow to import, so only the
+# Sheets backend imports it, on first use
+def rowcol_to_a1(row, col):
+    from gspread.utils import rowcol_to_a1 as to_a1
+
+    return to_a1(row, col)
+
+
+# One storage instance per backend and site, shared by the whole process
+_storages = {}
+_storages_lock = threading.Lock()
+
+
+# Function to get the SQLite file of a site, e.g. attendance.db -> attendance_North.db
+def site_sqlite_path(site):
+    root, ext = os.path.splitext(config.SQLITE_PATH)
+    return f"{root}_{site}{ext}"
+
+
+# Function to get the storage backend selected in the config, for the
+# default spreadsheet or for one of the sites in config.SITES
+def get_storage(backend=None, site=None):
+    backend = backend or config.STORAGE_BACKEND
+    key = (backend, site)
+    with _storages_lock:
+        if key not in _storages:
+            if site is not None and site not in config.SITES:
+                raise ValueError(f"Unknown site: {site}")
+            if backend == "sheets":
+                _storages[key] = SheetsStorage(config.SITES[site]) if site else SheetsStorage()
+            elif backend == "sqlite":
+                _storages[key] = SQLiteStorage(site_sqlite_path(site)) if site else SQLiteStorage()
+            else:
+                raise ValueError(f"Unknown storage backend: {backend}")
+        return _storages[key]
+
+
+# Function to install a storage instance under a backend name (e.g. an
+# in-process fake for benchmarks), replacing any existing one
+def register_storage(backend, storage, site=None):
+    with _storages_lock:
+        _storages[(backend, site)] = storage
+
+
+# Function to copy every table from one backend to another (e.g. Sheets -> SQLite)
+def copy_storage(source, target):
+    for table, (_, columns) in TABLES.items():
+        records = source.get_all_records(table)
+        target.append_rows(table, [[record.get(column, "") for column in columns] for record in records])
@@ -0,0 +1,8 @@
+# Function to get the data position of the first row an incremental reader
+# of the attendance sheet fetches again: the last `window` of the
+# `rows_held` rows it holds, and every row from `open_from`, the first one
+# that can still get a sign-out. Shared by the dashboard's loader
+# (data_ingestion.IncrementalTable) and the kiosk's session index, and kept
+# free of pandas so the kiosk does not import it.
+def refresh_start(open_from, rows_held, window):
+    return max(min(open_from, rows_held - max(window, 1)), 0)
@@ -0,0 +1,28 @@
+import os
+import sys
+import pytest
+
+# The modules live at the top of the repository, next to the apps
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from storage import SQLiteStorage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return SQLiteStorage(str(tmp_path / "attendance.db"))
+
+
+# Function to build an attendance row from column values, the others left empty
+def attendance_row(employee_id, date, in_time="09:00 AM", out_time="", status_out=""):
+    values = {
+        "Employee ID": employee_id, "Employee Name": f"Employee {employee_id}", "Department": "Ops",
+        "Date": date, "In-Time": in_time, "Out-Time": out_time, "Attendance Status Out": status_out,
+    }
+    return [values.get(column, "") for column in config.ATTENDANCE_COLUMNS]
+
+
+def employee_row(employee_id, name=None, department="Ops"):
+    values = {"Employee ID": employee_id, "Employee Name": name or f"Employee {employee_id}", "Department": department}
+    return [values.get(column, "") for column in config.EMPLOYEE_COLUMNS]
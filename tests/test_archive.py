@@ -0,0 +1,103 @@
+import pandas as pd
+import pytest
+import config
+from archive import ArchiveConflictError, AttendanceArchive
+from conftest import attendance_row
+from session_index import SessionIndex
+
+TABLE = config.ATTENDANCE_SHEET
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return AttendanceArchive(str(tmp_path / "archive"))
+
+
+@pytest.fixture
+def live(storage):
+    storage.append_rows(TABLE, [
+        attendance_row("sbx000", "2026-01-05", out_time="05:00 PM"),
+        attendance_row("sbx001", "2026-01-20", out_time="05:00 PM"),
+        attendance_row("sbx000", "2026-02-27", out_time="05:00 PM"),
+        attendance_row("sbx001", "2026-02-28"),
+        attendance_row("sbx000", "2026-03-02"),
+        attendance_row("sbx002", "2026-03-02", out_time="06:00 PM"),
+    ])
+    return storage
+
+
+def live_rows(storage):
+    return [(record["Employee ID"], record["Date"]) for record in storage.get_all_records(TABLE)]
+
+
+def test_rollover_moves_closed_months_and_renumbers_live_rows(live, archive):
+    moved = archive.rollover(live, today="2026-03-10", keep_months=1, grace_days=3)
+    assert moved == {"2026-01": 2, "2026-02": 2}
+    assert archive.months() == [pd.Period("2026-01", "M"), pd.Period("2026-02", "M")]
+
+    # The rows left in the sheet move up to the first data row
+    assert live_rows(live) == [("sbx000", "2026-03-02"), ("sbx002", "2026-03-02")]
+    assert live.row_values(TABLE, 2)[:1] == ["sbx000"]
+
+    archived = archive.read()
+    assert len(archived) == 4
+    assert archived["Date"].dt.strftime("%Y-%m-%d").tolist() == ["2026-01-05", "2026-01-20", "2026-02-27", "2026-02-28"]
+    assert int(archive.counts().sum()) == 4
+
+
+def test_month_stays_live_during_grace_days(live, archive):
+    moved = archive.rollover(live, today="2026-03-02", keep_months=1, grace_days=3)
+    assert moved == {"2026-01": 2}
+    assert len(live_rows(live)) == 4
+
+
+def test_rollover_again_moves_nothing(live, archive):
+    archive.rollover(live, today="2026-03-10", keep_months=1, grace_days=3)
+    assert archive.rollover(live, today="2026-03-10", keep_months=1, grace_days=3) == {}
+    assert len(archive.files()) == 2
+
+
+def test_rollover_retried_after_a_failed_delete_keeps_one_copy(live, archive):
+    delete_rows = live.delete_rows
+
+    def failing_delete(table, rows):
+        raise ConnectionError("delete failed")
+
+    live.delete_rows = failing_delete
+    with pytest.raises(ConnectionError):
+        archive.rollover(live, today="2026-03-10", keep_months=1, grace_days=3)
+    # The rows are in both tiers until the retry
+    assert len(live_rows(live)) == 6
+    files = archive.files()
+
+    live.delete_rows = delete_rows
+    assert archive.rollover(live, today="2026-03-10", keep_months=1, grace_days=3) == {"2026-01": 2, "2026-02": 2}
+    assert archive.files() == files
+    assert len(archive.read()) == 4
+    assert len(live_rows(live)) == 2
+
+
+def test_rollover_from_a_stale_read_deletes_nothing(live, archive):
+    # A second rollover (another admin, or cron) read the sheet before the
+    # first one deleted its rows
+    stale = live.get_rows(TABLE, 1)
+    archive.rollover(live, today="2026-03-10", keep_months=1, grace_days=3)
+    get_rows = live.get_rows
+    reads = iter([stale])
+    live.get_rows = lambda table, start_row=1, end_row=None: next(reads, None) or get_rows(table, start_row, end_row)
+
+    with pytest.raises(ArchiveConflictError):
+        archive.rollover(live, today="2026-03-10", keep_months=1, grace_days=3)
+    assert live_rows(live) == [("sbx000", "2026-03-02"), ("sbx002", "2026-03-02")]
+    assert len(archive.read()) == 4
+
+
+def test_session_index_follows_renumbered_rows(live, archive):
+    index = SessionIndex(live)
+    index.rebuild()
+    assert index.open_rows(["sbx000"]) == {"sbx000": 6}
+
+    archive.rollover(live, today="2026-03-10", keep_months=1, grace_days=3)
+    # The open row now lives in row 2; the index notices the shift and rebuilds
+    assert index.open_rows(["sbx000"]) == {"sbx000": 2}
+    assert index.open_rows(["sbx001"]) == {"sbx001": None}
@@ -0,0 +1,82 @@
+import pytest
+import config
+import data_ingestion
+from cache import SnapshotCache, value_size
+from conftest import attendance_row
+from data_ingestion import IncrementalTable, attendance_changes
+from schema import concat_typed, typed_attendance
+from storage import register_storage
+
+TABLE = config.ATTENDANCE_SHEET
+
+
+@pytest.fixture
+def live(storage, monkeypatch):
+    register_storage("test", storage)
+    monkeypatch.setattr(config, "STORAGE_BACKEND", "test")
+    monkeypatch.setattr(config, "SITES", {})
+    monkeypatch.setattr(config, "ATTENDANCE_SYNC", "incremental")
+    storage.append_rows(TABLE, [
+        attendance_row(f"sbx00{i}", f"2026-01-0{i + 1}", out_time="05:00 PM") for i in range(4)
+    ])
+    return storage
+
+
+def incremental_table(**options):
+    return IncrementalTable(TABLE, window=1, convert=typed_attendance, concat=concat_typed, **options)
+
+
+def test_last_changes_spans_every_refresh_since_a_version(live):
+    table = incremental_table()
+    frame = table.refresh()
+    assert table.last_changes(frame) == (None, 1)
+
+    live.append_row(TABLE, attendance_row("sbx004", "2026-01-05", out_time="05:00 PM"))
+    table.refresh()
+    live.append_row(TABLE, attendance_row("sbx005", "2026-01-06", out_time="05:00 PM"))
+    latest = table.refresh()
+
+    # Each refresh re-read the last row it held: positions 3, then 4
+    assert table.last_changes(latest, 1) == (3, 3)
+    assert table.last_changes(latest, 2) == (4, 3)
+    assert table.last_changes(latest, 3) == (6, 3)
+    # An older frame cannot be related to the recorded refreshes
+    assert table.last_changes(frame, 1) == (None, None)
+
+    # Rows deleted: the table is loaded in full again
+    live.delete_rows(TABLE, [2])
+    assert table.last_changes(table.refresh(), 3) == (None, 4)
+
+
+def test_evicted_frame_counts_against_the_cache_and_is_reloaded(live):
+    cache = SnapshotCache()
+    table = incremental_table(cache=cache)
+    frame = table.refresh()
+    assert cache.stats()["bytes"] == value_size(frame) > 0
+
+    # Room for one frame, and the same frame put under another key is counted once
+    cache.max_bytes = value_size(frame)
+    cache.put(config.ATTENDANCE_SHEET, frame)
+    assert cache.stats()["evictions"] == 0
+
+    # Another frame over the cap evicts the loader's, which lets go of it
+    cache.put(config.EMPLOYEE_SHEET, frame.copy())
+    assert table.frame is None
+    table.refresh()
+    assert table.generation == 2
+
+
+def test_attendance_changes_follow_the_loader(live, monkeypatch):
+    table = incremental_table()
+    monkeypatch.setattr(data_ingestion, "attendance_sync", table)
+    start, seen = attendance_changes(table.refresh())
+    assert start == 0
+
+    live.append_row(TABLE, attendance_row("sbx004", "2026-01-05", out_time="05:00 PM"))
+    frame = table.refresh()
+    start, seen = attendance_changes(frame, seen)
+    assert start == 3
+    # Nothing changed since
+    assert attendance_changes(frame, seen)[0] == len(frame)
+    # A frame the loader did not produce is new every time
+    assert attendance_changes(frame.copy(), seen)[0] == 0
@@ -0,0 +1,102 @@
+import pandas as pd
+import pytest
+import config
+from conftest import employee_row
+from employee_writes import EmployeeConflictError, EmployeeWriter, read_versions
+
+TABLE = config.EMPLOYEE_SHEET
+
+
+@pytest.fixture
+def writer(storage):
+    storage.append_rows(TABLE, [employee_row(f"sbx00{i}") for i in range(4)])
+    return EmployeeWriter(storage)
+
+
+def snapshot(storage):
+    return pd.DataFrame(storage.get_all_records(TABLE), columns=config.EMPLOYEE_COLUMNS)
+
+
+def column(name):
+    return config.EMPLOYEE_COLUMNS.index(name) + 1
+
+
+def test_read_versions_records_rows_and_checksums(storage, writer):
+    versions = read_versions(snapshot(storage), ["sbx002"])
+    assert list(versions) == ["sbx002"]
+    assert versions["sbx002"]["row"] == 4
+    assert versions["sbx002"]["values"] == storage.row_values(TABLE, 4)
+
+
+def test_diff_writes_only_changed_cells(storage, writer):
+    versions = read_versions(snapshot(storage))
+    changes = {
+        "sbx001": {"Employee Name": "Employee sbx001", "Department": "Sales"},
+        "sbx003": {"Job Title": "Lead", "Department": "Ops"},
+    }
+    assert EmployeeWriter.diff(versions, changes) == [(3, column("Department"), "Sales"), (5, column("Job Title"), "Lead")]
+
+    assert writer.update_employees(versions, changes) == 2
+    assert storage.row_values(TABLE, 3)[column("Department") - 1] == "Sales"
+    assert storage.row_values(TABLE, 5)[column("Job Title") - 1] == "Lead"
+
+
+def test_unchanged_edit_writes_nothing(storage, writer):
+    versions = read_versions(snapshot(storage))
+    writes = []
+    storage.update_cells = lambda *args, **kwargs: writes.append(args)
+    assert writer.update_employees(versions, {"sbx000": {"Department": "Ops"}}) == 0
+    assert writes == []
+
+
+def test_concurrent_edit_is_reported_not_overwritten(storage, writer):
+    versions = read_versions(snapshot(storage))
+    # Another admin changes the row after it was loaded
+    storage.update_cells(TABLE, [(3, column("Department"), "Finance")])
+
+    with pytest.raises(EmployeeConflictError) as conflict:
+        writer.update_employees(versions, {"sbx001": {"Department": "Sales"}, "sbx002": {"Department": "Sales"}})
+    assert conflict.value.employee_ids == ["sbx001"]
+    # Nothing is written when any employee conflicts
+    assert storage.row_values(TABLE, 3)[column("Department") - 1] == "Finance"
+    assert storage.row_values(TABLE, 4)[column("Department") - 1] == "Ops"
+
+
+def test_rows_shifted_by_a_deletion_conflict(storage, writer):
+    versions = read_versions(snapshot(storage))
+    storage.delete_rows(TABLE, [2])
+
+    with pytest.raises(EmployeeConflictError):
+        writer.update_employees(versions, {"sbx002": {"Department": "Sales"}})
+    # Versions read again after the reload point at the moved rows
+    fresh = read_versions(snapshot(storage))
+    assert writer.update_employees(fresh, {"sbx002": {"Department": "Sales"}}) == 1
+    assert storage.row_values(TABLE, 3)[:1] == ["sbx002"]
+
+
+def test_remove_checks_versions_before_deleting(storage, writer):
+    versions = read_versions(snapshot(storage), ["sbx000", "sbx002"])
+    writer.remove_employees(versions)
+    assert [record["Employee ID"] for record in storage.get_all_records(TABLE)] == ["sbx001", "sbx003"]
+
+    stale = read_versions(snapshot(storage), ["sbx003"])
+    storage.update_cells(TABLE, [(3, column("Employee Name"), "Renamed")])
+    with pytest.raises(EmployeeConflictError):
+        writer.remove_employees(stale)
+    assert len(storage.get_all_records(TABLE)) == 2
+
+
+def test_add_rejects_existing_and_duplicate_ids(storage, writer):
+    with pytest.raises(ValueError, match="already exists"):
+        writer.add_employees([{"Employee ID": "sbx001", "Employee Name": "Again"}])
+    with pytest.raises(ValueError, match="Duplicate"):
+        writer.add_employees([{"Employee ID": "sbx009"}, {"Employee ID": "sbx009"}])
+    assert writer.add_employees([{"Employee ID": "sbx009", "Employee Name": "New"}]) == [6]
+
+
+def test_unknown_columns_and_ids_are_rejected(storage, writer):
+    versions = read_versions(snapshot(storage))
+    with pytest.raises(ValueError, match="columns"):
+        writer.update_employees(versions, {"sbx000": {"Salary": "1"}})
+    with pytest.raises(ValueError, match="Employee IDs"):
+        writer.update_employees(versions, {"sbx404": {"Department": "Ops"}})
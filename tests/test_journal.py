@@ -0,0 +1,167 @@
+from datetime import datetime
+import pytest
+import config
+from conftest import attendance_row, employee_row
+from journal import Journal, SyncWorker
+from kiosk import Kiosk
+from session_index import OUT_TIME_COL, STATUS_OUT_COL, SessionIndex
+
+NOW = datetime(2026, 3, 2, 9, 0)
+TODAY = NOW.strftime("%Y-%m-%d")
+LATER = datetime(2026, 3, 2, 17, 30)
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return Journal(str(tmp_path / "journal.db"))
+
+
+@pytest.fixture
+def kiosk(storage, journal):
+    storage.append_rows(config.EMPLOYEE_SHEET, [employee_row(f"sbx00{i}") for i in range(4)])
+    return Kiosk(storage, journal, SessionIndex(storage, journal=journal))
+
+
+@pytest.fixture
+def worker(storage, journal, kiosk):
+    return SyncWorker(journal, storage, session_index=kiosk.session_index)
+
+
+def attendance(storage):
+    return storage.get_all_records(config.ATTENDANCE_SHEET)
+
+
+# Storage failing the next batched cell update after writing it, like a
+# request that reached the sheet but whose response was lost
+class LostResponseStorage:
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.fail_next_update = False
+
+    def __getattr__(self, name):
+        return getattr(self.storage, name)
+
+    def update_cells(self, table, updates, value_input_option="RAW"):
+        self.storage.update_cells(table, updates, value_input_option)
+        if self.fail_next_update:
+            self.fail_next_update = False
+            raise ConnectionError("response lost")
+
+
+def test_punches_sync_to_storage(storage, journal, kiosk, worker):
+    assert kiosk.sign_in("sbx000", "Early", NOW)[0]
+    assert kiosk.sign_in("sbx001", "Early", NOW)[0]
+    assert kiosk.sign_out("sbx000", "On Time", LATER)[0]
+
+    assert worker.flush() == 3
+    rows = attendance(storage)
+    assert [(row["Employee ID"], row["Out-Time"]) for row in rows] == [("sbx000", "05:30 PM"), ("sbx001", "")]
+    assert journal.stats()["pending"] == 0
+
+
+def test_replay_applies_pending_punches_on_rebuild(storage, journal, kiosk):
+    storage.append_row(config.ATTENDANCE_SHEET, attendance_row("sbx002", TODAY))
+    kiosk.sign_in("sbx000", "Early", NOW)
+    kiosk.sign_out("sbx002", "On Time", LATER)
+
+    # A fresh index sees storage plus the punches still in the journal
+    index = SessionIndex(storage, journal=journal)
+    index.rebuild()
+    assert index.is_signed_in("sbx000", TODAY)
+    assert index.stored_row("sbx000", TODAY) is None
+    assert index.is_signed_out("sbx002", TODAY)
+    assert not index.is_stored_signed_out("sbx002", TODAY)
+    assert index.open_rows(["sbx002"]) == {"sbx002": 2}
+
+
+def test_retried_batch_does_not_duplicate_rows(storage, journal, kiosk):
+    flaky = LostResponseStorage(storage)
+    worker = SyncWorker(journal, flaky, session_index=kiosk.session_index)
+    kiosk.sign_in("sbx000", "Early", NOW)
+    worker.flush()
+    kiosk.sign_out("sbx000", "On Time", LATER)
+    kiosk.sign_in("sbx001", "Early", NOW)
+
+    flaky.fail_next_update = True
+    with pytest.raises(ConnectionError):
+        worker.flush()
+    assert journal.stats()["pending"] == 1
+
+    # The retry finds the sign-out already written and only marks it synced
+    assert worker.flush() == 1
+    rows = attendance(storage)
+    assert [row["Employee ID"] for row in rows] == ["sbx000", "sbx001"]
+    assert rows[0]["Out-Time"] == "05:30 PM"
+    stats = journal.stats()
+    assert (stats["pending"], stats["synced"], stats["failed"]) == (0, 3, 0)
+
+
+def test_sign_in_already_in_storage_is_not_appended_again(storage, journal, kiosk):
+    kiosk.sign_in("sbx000", "Early", NOW)
+    # Synced by an earlier run whose journal update was lost
+    storage.append_row(config.ATTENDANCE_SHEET, journal.pending()[0]["payload"]["row"])
+
+    worker = SyncWorker(journal, storage)
+    assert worker.flush() == 1
+    assert len(attendance(storage)) == 1
+    assert journal.stats()["synced"] == 1
+
+
+def test_sign_outs_of_a_segment_are_checked_with_one_read(storage, journal, kiosk, worker):
+    for i in range(4):
+        kiosk.sign_in(f"sbx00{i}", "Early", NOW)
+    worker.flush()
+    for i in range(4):
+        kiosk.sign_out(f"sbx00{i}", "On Time", LATER)
+
+    reads = []
+    get_rows = storage.get_rows
+
+    def counted_get_rows(table, start_row=1, end_row=None):
+        reads.append((start_row, end_row))
+        return get_rows(table, start_row, end_row)
+
+    storage.get_rows = counted_get_rows
+    worker.flush()
+    assert reads == [(2, 5)]
+    assert {row["Out-Time"] for row in attendance(storage)} == {"05:30 PM"}
+
+
+def test_sign_out_follows_rows_shifted_by_another_writer(storage, journal, kiosk, worker):
+    storage.append_row(config.ATTENDANCE_SHEET, attendance_row("sbx003", "2026-01-05", out_time="05:00 PM"))
+    kiosk.sign_in("sbx000", "Early", NOW)
+    worker.flush()
+    assert kiosk.session_index.stored_row("sbx000", TODAY) == 3
+
+    # The old row is archived meanwhile, so the open row moves up
+    storage.delete_rows(config.ATTENDANCE_SHEET, [2])
+    kiosk.sign_out("sbx000", "Left Early", LATER)
+    worker.flush()
+
+    row = storage.row_values(config.ATTENDANCE_SHEET, 2)
+    assert (row[0], row[OUT_TIME_COL - 1], row[STATUS_OUT_COL - 1]) == ("sbx000", "05:30 PM", "Left Early")
+
+
+def test_sign_out_without_sign_in_fails(storage, journal, worker):
+    journal.append("sign_out", "sbx000", TODAY, {"out_time": "05:30 PM", "status": "On Time"})
+    worker.flush()
+    stats = journal.stats()
+    assert (stats["pending"], stats["failed"]) == (0, 1)
+
+
+def test_flush_prunes_old_synced_entries(storage, journal, kiosk, worker):
+    kiosk.sign_in("sbx000", "Early", NOW)
+    kiosk.sign_in("sbx001", "Early", NOW)
+    worker.flush()
+    # One entry synced long ago, the other just now
+    with journal.conn:
+        journal.conn.execute("UPDATE journal SET synced_at = '2020-01-01T00:00:00' WHERE employee_id = 'sbx000'")
+
+    # Pruned at most once per interval
+    worker.flush()
+    assert journal.stats()["synced"] == 2
+    worker.last_prune = None
+    worker.flush()
+    assert journal.stats()["synced"] == 1
+    assert len(attendance(storage)) == 2
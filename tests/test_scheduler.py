@@ -0,0 +1,160 @@
+import threading
+import pytest
+import scheduler
+from scheduler import RequestScheduler, TokenBucket
+
+
+# Clock for the token bucket: sleeping moves it forward instead of waiting
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(scheduler.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(scheduler.time, "sleep", clock.sleep)
+    return clock
+
+
+def test_token_bucket_allows_a_burst_then_waits_for_the_rate(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert bucket.acquire() == pytest.approx(0.5)
+
+    # Idle time refills the bucket, up to its capacity
+    clock.now += 60
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(0.5)
+
+
+def test_token_bucket_rate_zero_is_unlimited(clock):
+    bucket = TokenBucket(rate=0, capacity=1)
+    assert all(bucket.acquire() == 0.0 for _ in range(100))
+    assert clock.slept == []
+
+
+def test_concurrent_reads_share_one_request():
+    requests = RequestScheduler(requests_per_minute=0)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def request():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return ["row"]
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(requests.read("sheet", ("get",), request)))
+    leader.start()
+    started.wait(5)
+    followers = [
+        threading.Thread(target=lambda: results.append(requests.read("sheet", ("get",), request)))
+        for _ in range(3)
+    ]
+    for follower in followers:
+        follower.start()
+    # Followers block on the leader's request until it completes
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == [["row"]] * 4
+
+
+def test_read_after_a_write_does_not_join_an_earlier_request():
+    requests = RequestScheduler(requests_per_minute=0)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow_request():
+        calls.append("before write")
+        started.set()
+        release.wait(5)
+        return "old"
+
+    earlier = threading.Thread(target=requests.read, args=("sheet", ("get",), slow_request))
+    earlier.start()
+    started.wait(5)
+    requests.write("sheet", lambda: None)
+    result = requests.read("sheet", ("get",), lambda: calls.append("after write") or "new")
+    release.set()
+    earlier.join(5)
+
+    assert result == "new"
+    assert calls == ["before write", "after write"]
+
+
+def test_failed_read_is_shared_and_not_cached():
+    requests = RequestScheduler(requests_per_minute=0)
+
+    def failing():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        requests.read("sheet", ("get",), failing)
+    assert requests.read("sheet", ("get",), lambda: "ok") == "ok"
+
+
+class FakeResponse:
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {}
+        self.text = ""
+
+    def json(self):
+        return {"error": {"code": self.status_code, "message": "quota", "status": "RESOURCE_EXHAUSTED"}}
+
+
+def api_error(status_code):
+    from gspread.exceptions import APIError
+
+    return APIError(FakeResponse(status_code))
+
+
+def failing_then(result, errors):
+    calls = []
+
+    def request():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+
+    return request, calls
+
+
+def test_rate_limited_read_is_retried_with_backoff(clock):
+    pytest.importorskip("gspread")
+    requests = RequestScheduler(requests_per_minute=0, max_retries=3, base_delay=1.0, max_delay=8.0)
+    request, calls = failing_then("rows", [api_error(429), api_error(503)])
+    assert requests.read("sheet", ("get",), request) == "rows"
+    assert len(calls) == 3
+    assert len(clock.slept) == 2 and clock.slept[0] <= 1.0 and clock.slept[1] <= 2.0
+
+
+def test_write_is_not_retried_on_server_error(clock):
+    pytest.importorskip("gspread")
+    from gspread.exceptions import APIError
+
+    requests = RequestScheduler(requests_per_minute=0, max_retries=3)
+    request, calls = failing_then(None, [api_error(500)])
+    with pytest.raises(APIError):
+        requests.write("sheet", request)
+    assert len(calls) == 1
@@ -0,0 +1,41 @@
+import pandas as pd
+import config
+from conftest import attendance_row
+from worked_hours import WorkedHoursEngine, load_work_hours, save_work_hours
+
+
+def attendance(*rows):
+    df = pd.DataFrame([attendance_row(*row) for row in rows], columns=config.ATTENDANCE_COLUMNS)
+    return df.assign(Date=pd.to_datetime(df["Date"]))
+
+
+FRAME = attendance(
+    ("sbx000", "2026-03-02", "09:00 AM", "05:00 PM"),
+    ("sbx000", "2026-03-10", "09:30 AM", "06:00 PM"),
+    ("sbx000", "2026-03-20", "09:00 AM", "05:00 PM"),
+    ("sbx000", "2026-04-01", "09:00 AM", "05:00 PM"),
+)
+
+
+def test_summary_counts_only_rows_within_the_range():
+    engine = WorkedHoursEngine("09:00", "17:00").update(FRAME)
+    summary = engine.summary("Monthly", "2026-03-05", "2026-03-31")
+    assert summary[["Days Recorded", "Worked Hours", "Days Late", "Overtime Hours"]].values.tolist() == [
+        [2, 16.5, 1, 1.0],
+    ]
+
+    # Whole periods still come from the cached totals
+    summary = engine.summary("Monthly", "2026-03-01", "2026-04-30")
+    assert summary["Period"].astype(str).tolist() == ["2026-03", "2026-04"]
+    assert summary["Days Recorded"].tolist() == [3, 1]
+
+
+def test_changed_hours_recompute_every_row(tmp_path):
+    path = str(tmp_path / "work_hours.json")
+    assert load_work_hours(path) == (config.WORK_START, config.WORK_END)
+    save_work_hours("10:00", "16:00", path)
+
+    engine = WorkedHoursEngine("09:00", "17:00").update(FRAME)
+    engine.set_hours(*load_work_hours(path))
+    summary = engine.update(FRAME).summary("Monthly", "2026-03-01", "2026-03-31")
+    assert summary[["Days Late", "Overtime Hours"]].values.tolist() == [[0, 4.0]]
@@ -0,0 +1,197 @@
+import json
+import logging
+import os
+import threading
+import pandas as pd
+import config
+from data_ingestion import attendance_changes
+from schema import TIME_FORMAT
+
+logger = logging.getLogger(__name__)
+
+FREQUENCIES = {"Weekly": "W-SUN", "Monthly": "M"}
+
+
+# Function to read the working hours saved from the Settings page as (start, end)
+def load_work_hours(path=config.WORK_HOURS_FILE):
+    hours = {"start": config.WORK_START, "end": config.WORK_END}
+    try:
+        with open(path) as hours_file:
+            hours.update(json.load(hours_file))
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as error:
+        logger.warning("Could not read working hours from %s: %s", path, error)
+    return hours["start"], hours["end"]
+
+
+def save_work_hours(work_start, work_end, path=config.WORK_HOURS_FILE):
+    with open(path + ".tmp", "w") as hours_file:
+        json.dump({"start": work_start, "end": work_end}, hours_file, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+# Function to parse a time column ("%I:%M %p") into timestamps on the given
+# dates. Categorical columns are parsed once per distinct value.
+def times_on_dates(column, dates, time_format=TIME_FORMAT):
+    if pd.api.types.is_datetime64_any_dtype(column):
+        return column
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        categories = pd.to_datetime(pd.Series(column.cat.categories.astype(str)), format=time_format, errors="coerce")
+        offsets = (categories - categories.dt.normalize()).to_numpy()
+        codes = column.cat.codes.to_numpy()
+        values = pd.Series(offsets[codes], index=column.index)
+        values[codes < 0] = pd.NaT
+        return dates + values
+    parsed = pd.to_datetime(column.astype(str), format=time_format, errors="coerce")
+    return dates + (parsed - parsed.dt.normalize())
+
+
+# Function to turn a clock time from the config ("09:00" or "09:00:00") into an offset from midnight
+def clock_offset(clock):
+    return pd.Timedelta(clock if clock.count(":") == 2 else clock + ":00")
+
+
+# Function to compute per-row minutes for a typed attendance frame:
+# net worked minutes (Out - In minus the part of the break inside that span),
+# lateness against the configured start time and overtime after the
+# configured end time. Rows without an Out-Time get no worked or overtime minutes.
+def row_minutes(attendance_df, work_start=config.WORK_START, work_end=config.WORK_END):
+    dates = attendance_df["Date"]
+    in_time = times_on_dates(attendance_df["In-Time"], dates)
+    out_time = times_on_dates(attendance_df["Out-Time"], dates)
+    break_start = times_on_dates(attendance_df["Break Start"], dates)
+    break_end = times_on_dates(attendance_df["Break End"], dates)
+
+    # A missing break time leaves the overlap NaT (no break), not the whole span
+    overlap_start = in_time.where(in_time > break_start, break_start)
+    overlap_end = out_time.where(out_time < break_end, break_end)
+    break_minutes = ((overlap_end - overlap_start).dt.total_seconds() / 60).clip(lower=0).fillna(0)
+    net_minutes = ((out_time - in_time).dt.total_seconds() / 60 - break_minutes).clip(lower=0)
+
+    scheduled_start = dates + clock_offset(work_start)
+    scheduled_end = dates + clock_offset(work_end)
+    late_minutes = ((in_time - scheduled_start).dt.total_seconds() / 60).clip(lower=0)
+    overtime_start = pd.concat([in_time, scheduled_end], axis=1).max(axis=1)
+    overtime_minutes = ((out_time - overtime_start).dt.total_seconds() / 60).clip(lower=0)
+
+    return pd.DataFrame({
+        "Employee ID": attendance_df["Employee ID"].astype(str),
+        "Employee Name": attendance_df["Employee Name"].astype(str),
+        "Department": attendance_df["Department"].astype(str),
+        "Date": dates,
+        "Worked Minutes": net_minutes,
+        "Late Minutes": late_minutes,
+        "Late Days": (late_minutes > 0).astype(int),
+        "Overtime Minutes": overtime_minutes,
+    })
+
+
+# Function to total row minutes per employee per period
+def summarize(minutes, period):
+    summary = minutes.groupby(["Employee ID", period.rename("Period")]).agg(**{
+        "Employee Name": ("Employee Name", "last"),
+        "Department": ("Department", "last"),
+        "Days Recorded": ("Date", "count"),
+        "Worked Hours": ("Worked Minutes", "sum"),
+        "Days Late": ("Late Days", "sum"),
+        "Late Minutes": ("Late Minutes", "sum"),
+        "Overtime Hours": ("Overtime Minutes", "sum"),
+    }).reset_index()
+    summary["Worked Hours"] = (summary["Worked Hours"] / 60).round(2)
+    summary["Overtime Hours"] = (summary["Overtime Hours"] / 60).round(2)
+    return summary
+
+
+# Worked-hours engine kept up to date with the attendance frame.
+# Per-row minutes are recomputed only for the rows the incremental loader
+# added or updated since the last update (see
+# data_ingestion.attendance_changes); period totals are recomputed only for
+# the periods those rows fall in. Everything is rebuilt when the attendance
+# frame has been reloaded from scratch or the working hours change.
+class WorkedHoursEngine:
+
+    def __init__(self, work_start=config.WORK_START, work_end=config.WORK_END):
+        self.work_start = work_start
+        self.work_end = work_end
+        self.minutes = None
+        # What attendance_changes returned for the last frame
+        self.seen = None
+        # Period of every row and totals per period, per frequency
+        self.periods = {}
+        self.summaries = {}
+        self.lock = threading.Lock()
+
+    # Function to change the scheduled hours; the next update recomputes every row
+    def set_hours(self, work_start, work_end):
+        with self.lock:
+            if (work_start, work_end) != (self.work_start, self.work_end):
+                self.work_start, self.work_end = work_start, work_end
+                self.minutes = None
+
+    def update(self, attendance_df):
+        with self.lock:
+            start, self.seen = attendance_changes(attendance_df, self.seen)
+            if self.minutes is None or start == 0 or start > len(self.minutes):
+                self.minutes = row_minutes(attendance_df, self.work_start, self.work_end)
+                self.periods = {}
+                self.summaries = {}
+                return self
+            if start == len(attendance_df) == len(self.minutes):
+                return self
+
+            changed = row_minutes(attendance_df.iloc[start:], self.work_start, self.work_end)
+            self.minutes = pd.concat([self.minutes.iloc[:start], changed])
+            for freq, period in self.periods.items():
+                changed_period = changed["Date"].dt.to_period(freq)
+                self.periods[freq] = pd.concat([period.iloc[:start], changed_period])
+                for touched in changed_period.dropna().unique():
+                    self.summaries[freq].pop(touched, None)
+            return self
+
+    # Function to get per employee totals for each week ("Weekly") or month
+    # ("Monthly") of the rows dated from `start_date` to `end_date`. Periods
+    # inside the range come from the cached totals; the periods cut by either
+    # end of the range are totalled from their rows within it.
+    def summary(self, frequency="Monthly", start_date=None, end_date=None):
+        freq = FREQUENCIES[frequency]
+        start = pd.Timestamp(start_date) if start_date is not None else None
+        # The whole end day is included
+        end = pd.Timestamp(end_date) + pd.Timedelta(days=1) if end_date is not None else None
+        with self.lock:
+            if freq not in self.periods:
+                self.periods[freq] = self.minutes["Date"].dt.to_period(freq)
+                self.summaries[freq] = {}
+            row_periods = self.periods[freq]
+            periods = self.summaries[freq]
+            missing = set(row_periods.dropna().unique()) - set(periods)
+            if missing:
+                mask = row_periods.isin(missing).to_numpy()
+                for period, totals in summarize(self.minutes[mask], row_periods[mask]).groupby("Period"):
+                    periods[period] = totals
+            selected = []
+            partial = []
+            for period, totals in sorted(periods.items()):
+                if (start is not None and period.end_time < start) or (end is not None and period.start_time >= end):
+                    continue
+                if (start is not None and period.start_time < start) or (end is not None and period.end_time >= end):
+                    partial.append(period)
+                else:
+                    selected.append(totals)
+            if partial:
+                dates = self.minutes["Date"]
+                mask = row_periods.isin(partial)
+                if start is not None:
+                    mask &= dates >= start
+                if end is not None:
+                    mask &= dates < end
+                mask = mask.to_numpy()
+                selected.append(summarize(self.minutes[mask], row_periods[mask]))
+            empty = summarize(self.minutes.iloc[:0], row_periods.iloc[:0])
+        if not selected:
+            return empty
+        summary = pd.concat(selected, ignore_index=True)
+        return summary.sort_values("Period", kind="stable", ignore_index=True)
+
+
+worked_hours_engine = WorkedHoursEngine()
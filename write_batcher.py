@@ -0,0 +1,61 @@
+import threading
+
+
+# Function to merge cell updates into row ranges.
+# `updates` is a list of (row, col, value); a later write to the same cell
+# wins, and adjacent columns of a row are merged into a single range.
+# Returns a list of (row, first_col, [values]) sorted by row and column.
+def merge_cell_updates(updates):
+    cells = {}
+    for row, col, value in updates:
+        cells[(row, col)] = value
+
+    ranges = []
+    for (row, col) in sorted(cells):
+        if ranges and ranges[-1][0] == row and ranges[-1][1] + len(ranges[-1][2]) == col:
+            ranges[-1][2].append(cells[(row, col)])
+        else:
+            ranges.append((row, col, [cells[(row, col)]]))
+    return ranges
+
+
+# Collects row appends and cell updates and sends them to storage as one
+# append_rows and one update_cells request per table when flushed.
+class WriteBatcher:
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.lock = threading.Lock()
+        self.appends = {}
+        self.updates = {}
+
+    def append_row(self, table, row):
+        with self.lock:
+            self.appends.setdefault(table, []).append(row)
+
+    def update_cell(self, table, row, col, value):
+        with self.lock:
+            self.updates.setdefault(table, []).append((row, col, value))
+
+    # Function to queue a run of cells in one row, starting at `col`
+    def update_row(self, table, row, col, values):
+        with self.lock:
+            self.updates.setdefault(table, []).extend(
+                (row, col + offset, value) for offset, value in enumerate(values)
+            )
+
+    def pending(self):
+        return sum(len(rows) for rows in self.appends.values()) + sum(len(cells) for cells in self.updates.values())
+
+    # Function to send the queued writes; appends go first so that updates may
+    # target the rows they create. Returns the appended row numbers per table.
+    def flush(self):
+        with self.lock:
+            appends, self.appends = self.appends, {}
+            updates, self.updates = self.updates, {}
+        appended = {}
+        for table, rows in appends.items():
+            appended[table] = self.storage.append_rows(table, rows)
+        for table, cells in updates.items():
+            self.storage.update_cells(table, cells, value_input_option="RAW")
+        return appended